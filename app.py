@@ -3,7 +3,7 @@ Azure 0rphans
 Azure App Service Plans cost optimization analyzer
 """
 
-from flask import Flask, render_template, jsonify, request, redirect, url_for, session
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for, session, has_request_context
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import pandas as pd
@@ -11,7 +11,7 @@ import numpy as np
 import re
 import os
 from werkzeug.utils import secure_filename
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from azure.identity import AzureCliCredential
 from azure.mgmt.resource import ResourceManagementClient
 from azure.mgmt.network import NetworkManagementClient
@@ -20,21 +20,59 @@ from azure.mgmt.web import WebSiteManagementClient
 from azure.mgmt.sql import SqlManagementClient
 from azure.mgmt.frontdoor import FrontDoorManagementClient
 import subprocess
-import json
+import hashlib
+from functools import wraps
+import scan_store
+import history_store
+import retention
+import scan_io
+import latest_scan
+import scan_diff
+import trend_store
+import scan_analysis
+import scan_export
+import json_codec
+import compression
+import resource_query
+import orphan_rules
+import resource_graph
+import resource_ids
+import limiter_storage  # registers the sqlite:// rate limit storage
 
 app = Flask(__name__)
+app.json = json_codec.FastJSONProvider(app)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['ENVIRONMENT_FOLDER'] = 'data/environment'
+app.config['SCAN_DB_PATH'] = os.environ.get('SCAN_DB_PATH', 'data/environment/scans.db')
+app.config['HISTORY_DB_PATH'] = os.environ.get('HISTORY_DB_PATH', 'data/environment/history.db')
+app.config['TREND_DB_PATH'] = os.environ.get('TREND_DB_PATH', 'data/environment/trends.db')
+app.config['SCAN_RETENTION_ENABLED'] = os.environ.get('SCAN_RETENTION_ENABLED', 'true').lower() == 'true'
+app.config['SCAN_RETENTION_TIERS'] = os.environ.get('SCAN_RETENTION_TIERS', retention.DEFAULT_RETENTION_TIERS)
+app.config['SCAN_RETENTION_INTERVAL_MINUTES'] = int(os.environ.get('SCAN_RETENTION_INTERVAL_MINUTES', '60'))
+app.config['COMPRESSION_ENABLED'] = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+app.config['COMPRESSION_MIN_SIZE'] = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+app.config['COMPRESSION_GZIP_LEVEL'] = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+app.config['COMPRESSION_BROTLI_QUALITY'] = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+app.config['COMPRESSION_CACHE_SIZE'] = int(os.environ.get('COMPRESSION_CACHE_SIZE', '64'))
+app.config['COMPRESSION_MIMETYPES'] = compression.DEFAULT_MIMETYPES
 
 # Initialize rate limiter
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["10000 per day", "1000 per hour"],
-    storage_uri="memory://",
+    # memory:// is per process; multi-worker servers need shared storage such as sqlite:// or redis://
+    storage_uri=os.environ.get('RATELIMIT_STORAGE_URI', 'memory://'),
     strategy="fixed-window"
 )
 
+@app.after_request
+def compress_response(response):
+    """Compress JSON and export responses for clients that accept gzip or brotli"""
+    if not app.config['COMPRESSION_ENABLED']:
+        return response
+    return compression.compress_response(response, request.accept_encodings, app.config)
+
 # Demo mode - controlled via UI toggle stored in session
 # Demo mode:
 #   - Scan files are saved with 'azure_scan_demo_' prefix
@@ -47,6 +85,259 @@ PROD_FILE_PREFIX = 'azure_scan_production_'
 def is_demo_mode():
     return session.get('demo_mode', False)
 
+def get_scan_mode(filename):
+    """Get the mode ('demo' or 'production') a scan file belongs to"""
+    return 'demo' if filename.startswith(DEV_FILE_PREFIX) else 'production'
+
+def get_latest_scan_path(subscription_id=None):
+    """
+    Get the path of the latest scan for the current mode (optionally for one subscription),
+    or None if there are no scans. Resolved through the latest-scan pointer, so the folder
+    is not listed and every endpoint agrees on which scan is the latest.
+    """
+    data_dir = app.config['ENVIRONMENT_FOLDER']
+    if subscription_id is None and has_request_context():
+        subscription_id = request.args.get('subscription_id')
+    
+    if is_demo_mode():
+        scan_id = latest_scan.resolve_latest(data_dir, 'demo', DEV_FILE_PREFIX, subscription_id)
+    else:
+        scan_id = latest_scan.resolve_latest(data_dir, 'production', PROD_FILE_PREFIX, subscription_id)
+    
+    return os.path.join(data_dir, scan_id) if scan_id else None
+
+def get_scan_etag(scan_path):
+    """
+    Strong ETag for a response that is a pure function of a scan, the mode and the request.
+    Built from the scan identity (name, size, mtime) and the endpoint parameters; the scan
+    is stat'ed but never opened.
+    """
+    stat = os.stat(scan_path)
+    identity = '|'.join([
+        os.path.basename(scan_path), str(stat.st_size), str(stat.st_mtime_ns),
+        'demo' if is_demo_mode() else 'production',
+        request.path,
+        '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    ])
+    return hashlib.blake2b(identity.encode('utf-8'), digest_size=16).hexdigest()
+
+def conditional_on_latest_scan(applies=None):
+    """
+    Decorator for GET endpoints that only depend on the latest scan. Answers 304 when the
+    client's If-None-Match matches, before the view runs, and tags successful responses.
+    `applies(**view_args)` can opt requests out (e.g. ones that are not served from a scan).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if applies is not None and not applies(**kwargs):
+                return view(*args, **kwargs)
+            
+            scan_path = get_latest_scan_path()
+            try:
+                etag = get_scan_etag(scan_path) if scan_path else None
+            except OSError:
+                etag = None
+            if etag is None:
+                return view(*args, **kwargs)
+            
+            # Compressed responses carry a variant of the ETag for their encoding
+            matched = next((tag for tag in compression.etag_variants(etag, request.accept_encodings) if request.if_none_match.contains(tag)), None)
+            if matched:
+                response = Response(status=304)
+                etag = matched
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def remove_scan(filepath, keep_history=False):
+    """
+    Delete a scan file and drop it from the store, the history and the latest-scan pointers.
+    With keep_history, the snapshot stays in the deduplicated history (retention compaction).
+    """
+    data_dir = app.config['ENVIRONMENT_FOLDER']
+    filename = os.path.basename(filepath)
+    mode = get_scan_mode(filename)
+    
+    try:
+        subscription_id = scan_io.read_scan_metadata(filepath).get('subscription_id')
+    except (OSError, ValueError):
+        subscription_id = None
+    
+    scan_io.delete_scan_file(filepath)
+    scan_analysis.invalidate(filename)
+    scan_diff.invalidate(filename)
+    scan_store.delete_scan(app.config['SCAN_DB_PATH'], filename)
+    if not keep_history:
+        history_store.delete_snapshot(app.config['HISTORY_DB_PATH'], filename)
+    latest_scan.on_scan_deleted(data_dir, mode, DEV_FILE_PREFIX if mode == 'demo' else PROD_FILE_PREFIX,
+                                filename, subscription_id)
+
+def load_scan_data(filepath):
+    """Load a scan from its file, falling back to the snapshot history if the file is gone"""
+    if os.path.exists(filepath):
+        with open(filepath, 'rb') as f:
+            return json_codec.loads(f.read())
+    
+    scan_data = history_store.load_snapshot(app.config['HISTORY_DB_PATH'], os.path.basename(filepath))
+    if scan_data is None:
+        raise FileNotFoundError(f'Scan {os.path.basename(filepath)} not found')
+    return scan_data
+
+def ensure_scan_ingested(filepath):
+    """Make sure a scan file is in the SQLite store, ingesting older scans on first use"""
+    db_path = app.config['SCAN_DB_PATH']
+    scan_id = os.path.basename(filepath)
+    
+    scan = scan_store.get_scan(db_path, scan_id)
+    if scan is None:
+        if os.path.exists(filepath):
+            # Stream one resource type at a time instead of loading the whole scan
+            metadata = scan_io.read_scan_metadata(filepath)
+            resources = scan_io.iter_resource_types(filepath)
+        else:
+            metadata = load_scan_data(filepath)
+            resources = metadata.pop('resources').items()
+        scan_store.ingest_scan(db_path, scan_id, metadata, resources, get_scan_mode(scan_id))
+        scan = scan_store.get_scan(db_path, scan_id)
+    return scan
+
+def build_search_index(scan_id):
+    """Build the search index of a newly saved scan, dropping the indexes of older scans of its mode"""
+    try:
+        scan_store.build_search_index(app.config['SCAN_DB_PATH'], scan_id, get_scan_mode(scan_id))
+    except Exception as e:
+        print(f"Warning: Could not build search index for {scan_id}: {e}")
+
+def get_scan_resources(filepath, resource_key):
+    """
+    Get one resource type from a scan along with the scan's metadata. Uses the SQLite store
+    when the scan is ingested, otherwise decodes only that type's array from the file.
+    """
+    db_path = app.config['SCAN_DB_PATH']
+    scan_id = os.path.basename(filepath)
+    
+    scan = scan_store.get_scan(db_path, scan_id)
+    if scan is not None:
+        return scan, scan_store.get_resources(db_path, scan_id, resource_key)
+    
+    if os.path.exists(filepath):
+        metadata = scan_io.read_scan_metadata(filepath)
+        resources = scan_io.read_resource_type(filepath, resource_key)
+    else:
+        metadata = history_store.load_snapshot(app.config['HISTORY_DB_PATH'], scan_id, {resource_key})
+        if metadata is None:
+            raise FileNotFoundError(f'Scan {scan_id} not found')
+        resources = metadata.pop('resources').get(resource_key, [])
+    
+    return {'scan_id': scan_id, 'timestamp': metadata.get('timestamp')}, resources
+
+def get_scan_identity(filepath):
+    """Identify one version of a scan, so cached analyses of a rewritten scan are not reused"""
+    try:
+        stat = os.stat(filepath)
+        return os.path.basename(filepath), stat.st_size, stat.st_mtime_ns
+    except FileNotFoundError:
+        # Only left in the snapshot history, which never changes
+        return os.path.basename(filepath), None, None
+
+def load_scan_hashes(filepath):
+    """(timestamp, {type: content hash}) of a scan file, from its index"""
+    index = scan_io.get_scan_index(filepath)
+    return index['meta'].get('timestamp'), scan_io.get_type_hashes(filepath)
+
+def get_scan_analysis(filepath):
+    """
+    Get the memoized single-pass analysis of every type in a scan. Types whose content is
+    unchanged since an earlier scan reuse its analysis; only the others are read from the file.
+    """
+    if not os.path.exists(filepath):
+        return scan_analysis.get_scan_analysis(get_scan_identity(filepath), lambda: load_scan_data(filepath))
+    return scan_analysis.get_scan_analysis(
+        get_scan_identity(filepath), lambda: load_scan_data(filepath),
+        load_index=lambda: load_scan_hashes(filepath),
+        load_type=lambda resource_key: scan_io.read_resource_type(filepath, resource_key)
+    )
+
+def get_scan_graph(filepath):
+    """Get the memoized dependency graph of a scan as (graph, {node: depth} of propagated orphans)"""
+    return scan_analysis.get_scan_graph(get_scan_identity(filepath), lambda: load_scan_data(filepath))
+
+def get_type_analysis(filepath, resource_key):
+    """
+    Get the memoized analysis of one type in a scan as (timestamp, type analysis). Reads just
+    that type unless the whole scan, or the same content in an earlier scan, has already been
+    analyzed.
+    """
+    identity = get_scan_identity(filepath)
+    if not os.path.exists(filepath):
+        def load_type():
+            scan, resources = get_scan_resources(filepath, resource_key)
+            return scan.get('timestamp'), resources
+        return scan_analysis.get_type_analysis(identity, resource_key, load_type)
+    
+    def load_hash():
+        timestamp, hashes = load_scan_hashes(filepath)
+        return timestamp, hashes.get(resource_key)
+    
+    def load_type():
+        # Read the hashed bytes themselves, so analyses cached by content hash match the file
+        return scan_io.read_scan_metadata(filepath).get('timestamp'), scan_io.read_resource_type(filepath, resource_key)
+    
+    return scan_analysis.get_type_analysis(identity, resource_key, load_type, load_hash)
+
+# Query parameters that switch orphan listings to paged, index-backed results
+ORPHAN_PAGE_PARAMS = ('limit', 'cursor', 'sort', 'resource_group', 'location', 'name_prefix')
+DEFAULT_ORPHAN_PAGE_SIZE = 100
+MAX_ORPHAN_PAGE_SIZE = 1000
+
+# Per-type keys of orphan detail listings
+ORPHAN_DETAIL_SECTIONS = ('count', 'resources')
+
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+def wants_orphan_page():
+    return any(param in request.args for param in ORPHAN_PAGE_PARAMS)
+
+def select_fields(record, fields):
+    return record if len(fields) == len(record) else {field: record[field] for field in fields}
+
+def get_orphan_listing_page(scan_id, resource_key, resource_type, fields=scan_analysis.ORPHAN_LISTING_FIELDS):
+    """
+    Get one page of orphaned resources of a type from the scan store, using the paging and
+    filter parameters of the current request. Resources use the orphan listing shape,
+    limited to `fields`.
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_ORPHAN_PAGE_SIZE, type=int), 1), MAX_ORPHAN_PAGE_SIZE)
+    page = scan_store.get_orphan_page(
+        app.config['SCAN_DB_PATH'], scan_id, resource_key,
+        resource_group=request.args.get('resource_group'),
+        location=request.args.get('location'),
+        name_prefix=request.args.get('name_prefix'),
+        sort=request.args.get('sort', 'name'),
+        cursor=request.args.get('cursor'),
+        limit=limit
+    )
+    page['resources'] = [
+        select_fields({
+            'name': format_resource_display_name(r, resource_type),
+            'resource_group': r.get('resource_group', 'N/A'),
+            'location': r.get('location', 'N/A'),
+            'id': r.get('id', '')
+        }, fields)
+        for r in page['resources']
+    ]
+    page['limit'] = limit
+    return page
+
 # Ensure data directories exist
 os.makedirs(app.config['ENVIRONMENT_FOLDER'], exist_ok=True)
 
@@ -230,19 +521,8 @@ RESOURCE_TYPES = {
     }
 }
 
-def convert_to_serializable(obj):
-    """Convert numpy/pandas types to Python native types for JSON serialization"""
-    if isinstance(obj, (np.integer, np.int64)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64)):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {key: convert_to_serializable(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_to_serializable(item) for item in obj]
-    return obj
+# Map resource type (URL slug) to its key in the scan JSON
+RESOURCE_JSON_KEYS = scan_analysis.SLUG_KEYS
 
 
 # ============================================================================
@@ -312,9 +592,15 @@ APP_SERVICE_RECOMMENDATIONS = {
     }
 }
 
+# e.g. "Premium V3 (P1v3: 3)" -> tier name, SKU, instance count
+PRICING_TIER_PATTERN = re.compile(r'(.*?)\s*\((.*?):\s*(\d+)\)')
+
+# Low-cardinality App Service columns kept as categoricals for grouping
+APP_SERVICE_CATEGORICAL_COLUMNS = ('SKU', 'OPERATING SYSTEM', 'LOCATION')
+
 def parse_pricing_tier(tier_string):
     """Extract tier name and instance count from pricing tier string"""
-    match = re.search(r'(.*?)\s*\((.*?):\s*(\d+)\)', tier_string)
+    match = PRICING_TIER_PATTERN.search(tier_string)
     if match:
         tier_name = match.group(1).strip()
         sku = match.group(2).strip()
@@ -322,6 +608,32 @@ def parse_pricing_tier(tier_string):
         return tier_name, sku, instances
     return tier_string, 'Unknown', 1
 
+def _categorical_take(values, codes):
+    """Categorical of values[codes], with sorted categories so groupby order matches plain strings"""
+    value_codes, categories = pd.factorize(values, sort=True)
+    return pd.Categorical.from_codes(value_codes[codes], categories=categories)
+
+def parse_pricing_tiers(df):
+    """Add TIER_NAME, SKU and INSTANCES columns parsed from PRICING TIER, as parse_pricing_tier does per row"""
+    tiers = df['PRICING TIER'].astype('category')
+    # Plans share a handful of tiers: parse each distinct string once, then take by code.
+    # The trailing entry is what a missing tier (code -1) resolves to.
+    distinct = pd.Series(tiers.cat.categories, dtype=object)
+    parts = distinct.str.extract(PRICING_TIER_PATTERN)
+    matched = parts[2].notna()
+    tier_names = np.append(parts[0].str.strip().where(matched, distinct).to_numpy(), None)
+    skus = np.append(parts[1].str.strip().where(matched, 'Unknown').to_numpy(), 'Unknown')
+    instances = np.append(pd.to_numeric(parts[2]).fillna(1).to_numpy(dtype='int64'), 1)
+    
+    codes = tiers.cat.codes.to_numpy()
+    df['TIER_NAME'] = _categorical_take(tier_names, codes)
+    df['SKU'] = _categorical_take(skus, codes)
+    df['INSTANCES'] = instances[codes]
+    for column in APP_SERVICE_CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
 def convert_json_to_app_service_dataframe(plans_data):
     """Convert JSON App Service Plans data to DataFrame format for analysis"""
     records = []
@@ -355,16 +667,14 @@ def analyze_app_service_plans(csv_path):
     """Load and analyze App Service Plans data"""
     df = pd.read_csv(csv_path)
     
-    df[['TIER_NAME', 'SKU', 'INSTANCES']] = df['PRICING TIER'].apply(
-        lambda x: pd.Series(parse_pricing_tier(x))
-    )
+    parse_pricing_tiers(df)
     
     total_instances = df['INSTANCES'].sum()
     total_apps = df['APPS'].sum()
     total_plans = len(df)
     
     # Group by SKU and OS for detailed breakdown
-    tier_stats = df.groupby(['SKU', 'OPERATING SYSTEM']).agg({
+    tier_stats = df.groupby(['SKU', 'OPERATING SYSTEM'], observed=True).agg({
         'NAME': 'count',
         'APPS': 'sum',
         'INSTANCES': 'sum'
@@ -372,14 +682,14 @@ def analyze_app_service_plans(csv_path):
     tier_stats.columns = ['Tier', 'OS', 'Plans', 'Apps', 'Instances']
     tier_stats = tier_stats.sort_values(['Tier', 'OS'], ascending=[False, True])
     
-    location_stats = df.groupby('LOCATION').agg({
+    location_stats = df.groupby('LOCATION', observed=True).agg({
         'NAME': 'count',
         'APPS': 'sum',
         'INSTANCES': 'sum'
     }).reset_index()
     location_stats.columns = ['Location', 'Plans', 'Apps', 'Instances']
     
-    os_stats = df.groupby('OPERATING SYSTEM').agg({
+    os_stats = df.groupby('OPERATING SYSTEM', observed=True).agg({
         'NAME': 'count',
         'APPS': 'sum'
     }).reset_index()
@@ -477,7 +787,7 @@ def generate_app_service_recommendations(df):
     
     oversized = df[(df['INSTANCES'] >= 5) & (df['APPS'] <= 2)]
     if not oversized.empty:
-        for _, row in oversized.iterrows():
+        for row in oversized[['NAME', 'INSTANCES', 'APPS', 'TIER_NAME']].to_dict('records'):
             recommendations.append({
                 'type': 'oversized_plans',
                 'resource': row['NAME'],
@@ -493,7 +803,7 @@ def generate_app_service_recommendations(df):
         (df['INSTANCES'] <= 2)
     ]
     if not premium_underutilized.empty:
-        for _, row in premium_underutilized.iterrows():
+        for row in premium_underutilized[['NAME', 'APPS', 'TIER_NAME']].to_dict('records'):
             recommendations.append({
                 'type': 'premium_underutilized',
                 'resource': row['NAME'],
@@ -516,7 +826,8 @@ def generate_app_service_recommendations(df):
     
     locations = df['LOCATION'].unique()
     if len(locations) > 1:
-        location_counts = df['LOCATION'].value_counts().to_dict()
+        # Counted on the plain values: categorical counts break ties by category, not first seen
+        location_counts = df['LOCATION'].astype(object).value_counts().to_dict()
         recommendations.append({
             'type': 'mixed_locations',
             'resource': f"{len(locations)} different regions",
@@ -554,36 +865,21 @@ def generate_app_service_recommendations(df):
 
 def calculate_app_service_density(df):
     """Calculate app density metrics"""
-    density_data = []
-    
-    for _, row in df.iterrows():
-        apps_per_instance = row['APPS'] / row['INSTANCES'] if row['INSTANCES'] > 0 else 0
-        
-        if apps_per_instance < 1:
-            status = 'Underutilized'
-            color = 'danger'
-        elif apps_per_instance < 2:
-            status = 'Low Density'
-            color = 'warning'
-        elif apps_per_instance < 4:
-            status = 'Good'
-            color = 'info'
-        else:
-            status = 'Optimal'
-            color = 'success'
-        
-        density_data.append({
-            'plan_name': row['NAME'],
-            'apps': row['APPS'],
-            'instances': row['INSTANCES'],
-            'density': round(apps_per_instance, 2),
-            'tier': row['TIER_NAME'],
-            'status': status,
-            'color': color,
-            'location': row['LOCATION']
-        })
-    
-    return sorted(density_data, key=lambda x: x['density'])
+    apps_per_instance = (df['APPS'] / df['INSTANCES'].where(df['INSTANCES'] > 0)).fillna(0)
+    thresholds = [apps_per_instance < 1, apps_per_instance < 2, apps_per_instance < 4]
+    
+    density_data = pd.DataFrame({
+        'plan_name': df['NAME'],
+        'apps': df['APPS'],
+        'instances': df['INSTANCES'],
+        'density': apps_per_instance.round(2),
+        'tier': df['TIER_NAME'],
+        'status': np.select(thresholds, ['Underutilized', 'Low Density', 'Good'], 'Optimal'),
+        'color': np.select(thresholds, ['danger', 'warning', 'info'], 'success'),
+        'location': df['LOCATION'].astype(object)
+    })
+    
+    return density_data.sort_values('density', kind='stable').to_dict('records')
 
 def generate_apps_only_recommendations(apps_df):
     """Generate recommendations based on Apps CSV only"""
@@ -644,9 +940,7 @@ def analyze_combined_app_services(plans_csv_path, apps_csv_path):
     apps_df = pd.read_csv(apps_csv_path)
     
     # Parse plan tier information
-    plans_df[['TIER_NAME', 'SKU', 'INSTANCES']] = plans_df['PRICING TIER'].apply(
-        lambda x: pd.Series(parse_pricing_tier(x))
-    )
+    parse_pricing_tiers(plans_df)
     
     # Basic stats
     total_plans = len(plans_df)
@@ -747,6 +1041,125 @@ def generate_combined_recommendations(plans_df, apps_df):
     
     return recommendations
 
+def analyze_app_service_scan(plans_data, sections=None):
+    """
+    Analyze App Service Plans from a JSON scan into the generic dashboard format.
+    `sections` limits the result to those TYPE_ANALYSIS_SECTIONS; the work behind the others is skipped.
+    """
+    wanted = set(TYPE_ANALYSIS_SECTIONS if sections is None else sections)
+    
+    # Convert JSON to DataFrame format
+    df = convert_json_to_app_service_dataframe(plans_data)
+    total_plans = len(df)
+    
+    # Identify orphaned plans (plans with 0 apps)
+    orphaned_count = int((df['APPS'] == 0).sum())
+    orphan_rate = round((orphaned_count / total_plans * 100) if total_plans > 0 else 0, 1)
+    
+    # Cost calculations disabled - requires Azure Cost Management integration
+    monthly_waste = 0
+    annual_savings = 0
+    
+    result = {}
+    
+    if 'summary' in wanted:
+        result['summary'] = {
+            'total_resources': int(total_plans),
+            'orphaned_count': orphaned_count,
+            'active_count': int((df['APPS'] > 0).sum()),
+            'orphaned_percentage': orphan_rate
+        }
+    
+    if 'cost_impact' in wanted:
+        result['cost_impact'] = {
+            'monthly_waste': round(monthly_waste, 2),
+            'annual_savings': round(annual_savings, 2),
+            'quick_wins': [
+                {
+                    'action': f'Delete {orphaned_count} orphaned App Service Plans',
+                    'savings': f'${monthly_waste:.0f}/month'
+                }
+            ] if orphaned_count > 0 else []
+        }
+    
+    if 'risk_assessment' in wanted:
+        result['risk_assessment'] = {
+            'level': 'Low',
+            'items': []
+        }
+    
+    if 'action_priorities' in wanted:
+        result['action_priorities'] = {
+            'urgent': [],
+            'high': [],
+            'low': []
+        }
+    
+    if 'resource_group_stats' in wanted or 'benchmarks' in wanted:
+        rg_stats = df.groupby('RESOURCE GROUP').agg({'NAME': 'count'}).reset_index()
+        rg_stats.columns = ['ResourceGroup', 'Plans']
+        rg_stats = rg_stats.sort_values('Plans', ascending=False).head(10)
+        
+        if 'benchmarks' in wanted:
+            result['benchmarks'] = {
+                'your_orphan_rate': orphan_rate,
+                'avg_rg_orphan_rate': 0,
+                'best_rg': None,
+                'worst_rg': None,
+                'total_rg_count': len(rg_stats)
+            }
+    
+    if 'recommendations' in wanted:
+        # Pricing tiers are only needed by the recommendations
+        parse_pricing_tiers(df)
+        result['recommendations'] = [
+            {
+                'type': rec.get('type', 'optimization'),
+                'resource': rec.get('resource', 'App Service Plan'),
+                'current_state': rec.get('current_state', 'Needs review'),
+                'suggestion': rec.get('suggestion', 'Review configuration'),
+                'potential_saving': rec.get('potential_saving', 'N/A'),
+                'priority': rec.get('priority', 'Medium'),
+                'impact': rec.get('impact', 'Cost optimization')
+            }
+            for rec in generate_app_service_recommendations(df)
+        ]
+    
+    if 'location_stats' in wanted:
+        location_stats = df.groupby('LOCATION', observed=True).agg({'NAME': 'count'}).reset_index()
+        location_stats.columns = ['Location', 'Plans']
+        location_stats = location_stats.sort_values('Plans', ascending=False)
+        result['location_stats'] = pd.DataFrame({
+            'Location': location_stats['Location'].astype(object),
+            'Total': location_stats['Plans'],
+            'Orphaned': 0,  # Will be calculated if needed
+            'Active': location_stats['Plans']
+        }).to_dict('records')
+    
+    if 'resource_group_stats' in wanted:
+        result['resource_group_stats'] = pd.DataFrame({
+            'ResourceGroup': rg_stats['ResourceGroup'],
+            'Total': rg_stats['Plans'],
+            'Orphaned': 0,  # Will be calculated if needed
+            'Active': rg_stats['Plans'],
+            'OrphanRate': '0%'
+        }).to_dict('records')
+    
+    if 'orphaned_resources' in wanted:
+        # Missing locations stay None rather than the categorical's NaN
+        orphaned_plans = df[df['APPS'] == 0]
+        result['orphaned_resources'] = pd.DataFrame({
+            'name': orphaned_plans['NAME'],
+            'resource_group': orphaned_plans['RESOURCE GROUP'],
+            'location': orphaned_plans['LOCATION'].astype(object).where(orphaned_plans['LOCATION'].notna(), None),
+            'id': orphaned_plans['ID'] if 'ID' in orphaned_plans.columns else ''
+        }).to_dict('records')
+    
+    if 'resource_details' in wanted:
+        result['resource_details'] = []
+    
+    return result
+
 
 # ============================================================================
 # AZURE ORPHANED RESOURCES DETECTION
@@ -818,95 +1231,71 @@ def download_azure_environment():
                 'nat_gateways': [],
                 'app_service_plans': [],
                 'sql_servers': [],
+                'virtual_machines': [],
                 'resource_groups': []
             }
         }
         
         print("Fetching Azure resources with detailed properties...")
         
-        # Disks - Unattached state and not related to ASR
+        # Each record keeps the raw properties its orphan rule reads (see orphan_rules.py);
+        # is_orphaned is set by evaluating the rules once everything is fetched
+        
+        # Disks - Unattached state and not related to ASR (names and tags)
         print("  - Fetching disks...")
         for disk in compute_client.disks.list():
-            disk_name = disk.name.lower()
-            tags_str = str(disk.tags).lower() if disk.tags else ""
-            
-            # Exclude ASR disks (naming patterns)
-            is_asr = disk_name.endswith("-asrreplica") or disk_name.startswith("ms-asr-") or disk_name.startswith("asrseeddisk-")
-            
-            # Exclude AKS PVC and backup disks (tags)
-            is_excluded = ("kubernetes.io-created-for-pvc" in tags_str or 
-                          "asr-replicadisk" in tags_str or 
-                          "asrseeddisk" in tags_str or 
-                          "rsvaultbackup" in tags_str)
-            
-            # Orphaned criteria: (managedBy empty AND not ActiveSAS) OR (Unattached AND not ActiveSAS)
-            is_orphaned = False
-            if not is_asr and not is_excluded:
-                managed_by_empty = not disk.managed_by or disk.managed_by == ""
-                is_unattached = disk.disk_state == 'Unattached'
-                is_active_sas = disk.disk_state == 'ActiveSAS'
-                
-                is_orphaned = (managed_by_empty and not is_active_sas) or (is_unattached and not is_active_sas)
-            
             environment_data['resources']['disks'].append({
                 'id': disk.id,
                 'name': disk.name,
-                'resource_group': disk.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(disk.id),
                 'location': disk.location,
                 'disk_state': disk.disk_state,
                 'managed_by': disk.managed_by if disk.managed_by else None,
-                'is_orphaned': is_orphaned
+                'tags': disk.tags or None
             })
         
         # Public IPs - check associations (ip_configuration, nat_gateway, public_ip_prefix)
         print("  - Fetching public IPs...")
         for pip in network_client.public_ip_addresses.list_all():
-            has_ip_config = pip.ip_configuration is not None
-            has_nat = pip.nat_gateway is not None
-            has_prefix = pip.public_ip_prefix is not None
-            
             environment_data['resources']['public_ips'].append({
                 'id': pip.id,
                 'name': pip.name,
-                'resource_group': pip.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(pip.id),
                 'location': pip.location,
                 'sku': pip.sku.name if pip.sku else None,
                 'allocation_method': pip.public_ip_allocation_method,
-                'is_orphaned': not has_ip_config and not has_nat and not has_prefix
+                'ip_configuration_id': pip.ip_configuration.id if pip.ip_configuration else None,
+                'nat_gateway_id': pip.nat_gateway.id if pip.nat_gateway else None,
+                'public_ip_prefix_id': pip.public_ip_prefix.id if pip.public_ip_prefix else None
             })
         
         # Network Interfaces - check VM attachment (exclude NetApp, private endpoints, private link)
         print("  - Fetching network interfaces...")
         for nic in network_client.network_interfaces.list_all():
-            # Exclude NetApp volumes, private endpoints, private link services
-            has_private_endpoint = nic.private_endpoint is not None
-            has_private_link = nic.private_link_service is not None
-            has_hosted_workloads = nic.hosted_workloads and len(nic.hosted_workloads) > 0
-            has_vm = nic.virtual_machine is not None
-            
-            is_orphaned = not has_private_endpoint and not has_private_link and not has_hosted_workloads and not has_vm
-            
+            subnet_ids = sorted({ip_config.subnet.id for ip_config in nic.ip_configurations or [] if ip_config.subnet})
             environment_data['resources']['network_interfaces'].append({
                 'id': nic.id,
                 'name': nic.name,
-                'resource_group': nic.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(nic.id),
                 'location': nic.location,
-                'is_orphaned': is_orphaned
+                'virtual_machine_id': nic.virtual_machine.id if nic.virtual_machine else None,
+                'private_endpoint_id': nic.private_endpoint.id if nic.private_endpoint else None,
+                'private_link_service_id': nic.private_link_service.id if nic.private_link_service else None,
+                'hosted_workloads_count': len(nic.hosted_workloads) if nic.hosted_workloads else 0,
+                'network_security_group_id': nic.network_security_group.id if nic.network_security_group else None,
+                'subnet_ids': subnet_ids
             })
         
         # Network Security Groups - check associations
         print("  - Fetching NSGs...")
         for nsg in network_client.network_security_groups.list_all():
-            has_association = (nsg.network_interfaces and len(nsg.network_interfaces) > 0) or \
-                            (nsg.subnets and len(nsg.subnets) > 0)
             environment_data['resources']['network_security_groups'].append({
                 'id': nsg.id,
                 'name': nsg.name,
-                'resource_group': nsg.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(nsg.id),
                 'location': nsg.location,
                 'network_interfaces_count': len(nsg.network_interfaces) if nsg.network_interfaces else 0,
-                'subnets_count': len(nsg.subnets) if nsg.subnets else 0,
-                'is_orphaned': not has_association
+                'subnets_count': len(nsg.subnets) if nsg.subnets else 0
             })
         
         # Route Tables - check subnet associations
@@ -915,25 +1304,22 @@ def download_azure_environment():
             environment_data['resources']['route_tables'].append({
                 'id': rt.id,
                 'name': rt.name,
-                'resource_group': rt.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(rt.id),
                 'location': rt.location,
-                'subnets_count': len(rt.subnets) if rt.subnets else 0,
-                'is_orphaned': not rt.subnets or len(rt.subnets) == 0
+                'subnets_count': len(rt.subnets) if rt.subnets else 0
             })
         
         # Load Balancers - check backend pools AND inbound NAT rules
         print("  - Fetching load balancers...")
         for lb in network_client.load_balancers.list_all():
-            has_backend_pools = lb.backend_address_pools and len(lb.backend_address_pools) > 0
-            has_nat_rules = lb.inbound_nat_rules and len(lb.inbound_nat_rules) > 0
-            
             environment_data['resources']['load_balancers'].append({
                 'id': lb.id,
                 'name': lb.name,
-                'resource_group': lb.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(lb.id),
                 'location': lb.location,
                 'sku': lb.sku.name if lb.sku else None,
-                'is_orphaned': not has_backend_pools and not has_nat_rules
+                'backend_pools_count': len(lb.backend_address_pools) if lb.backend_address_pools else 0,
+                'inbound_nat_rules_count': len(lb.inbound_nat_rules) if lb.inbound_nat_rules else 0
             })
         
         # Front Door WAF Policies - without Security Policy Links
@@ -941,16 +1327,14 @@ def download_azure_environment():
         for rg in resource_client.resource_groups.list():
             try:
                 for waf in frontdoor_client.policies.list(rg.name):
-                    # Check if the policy has security policy links (attached to Front Door profiles)
-                    has_security_links = waf.security_policy_links and len(waf.security_policy_links) > 0
-                    
+                    # Security policy links attach the policy to Front Door profiles
                     environment_data['resources']['frontdoor_waf_policies'].append({
                         'id': waf.id,
                         'name': waf.name,
                         'resource_group': rg.name,
                         'location': waf.location,
                         'sku': waf.sku.name if waf.sku else None,
-                        'is_orphaned': not has_security_links
+                        'security_policy_links_count': len(waf.security_policy_links) if waf.security_policy_links else 0
                     })
             except:
                 pass
@@ -962,14 +1346,12 @@ def download_azure_environment():
             tm_client = TrafficManagerManagementClient(credential, subscription_id)
             
             for tm in tm_client.profiles.list_by_subscription():
-                has_endpoints = tm.endpoints and len(tm.endpoints) > 0
-                
                 environment_data['resources']['traffic_manager_profiles'].append({
                     'id': tm.id,
                     'name': tm.name,
-                    'resource_group': tm.id.split('/')[4],
+                    'resource_group': resource_ids.resource_group(tm.id),
                     'location': tm.location,
-                    'is_orphaned': not has_endpoints
+                    'endpoints_count': len(tm.endpoints) if tm.endpoints else 0
                 })
         except ImportError:
             print("    Warning: azure-mgmt-trafficmanager not installed, skipping Traffic Manager Profiles")
@@ -979,73 +1361,62 @@ def download_azure_environment():
         # Application Gateways - check for backend targets (IPs or addresses)
         print("  - Fetching application gateways...")
         for ag in network_client.application_gateways.list_all():
-            # Check if any backend pool has backend IP configurations or addresses
-            has_targets = False
-            if ag.backend_address_pools:
-                for pool in ag.backend_address_pools:
-                    backend_ips = pool.backend_ip_configurations and len(pool.backend_ip_configurations) > 0
-                    backend_addrs = pool.backend_addresses and len(pool.backend_addresses) > 0
-                    if backend_ips or backend_addrs:
-                        has_targets = True
-                        break
+            # Backend IP configurations and addresses across all backend pools
+            backend_targets = sum(
+                len(pool.backend_ip_configurations or []) + len(pool.backend_addresses or [])
+                for pool in ag.backend_address_pools or []
+            )
             
             environment_data['resources']['application_gateways'].append({
                 'id': ag.id,
                 'name': ag.name,
-                'resource_group': ag.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(ag.id),
                 'location': ag.location,
                 'sku': f"{ag.sku.name}/{ag.sku.tier}" if ag.sku else None,
-                'is_orphaned': not has_targets
+                'backend_targets_count': backend_targets
             })
         
         # Virtual Networks - VNets without subnets
         print("  - Fetching virtual networks...")
         for vnet in network_client.virtual_networks.list_all():
-            has_subnets = vnet.subnets and len(vnet.subnets) > 0
-            
             environment_data['resources']['virtual_networks'].append({
                 'id': vnet.id,
                 'name': vnet.name,
-                'resource_group': vnet.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(vnet.id),
                 'location': vnet.location,
-                'is_orphaned': not has_subnets
+                'subnets_count': len(vnet.subnets) if vnet.subnets else 0
             })
             
-            # Process subnets within this VNet
+            # Process subnets within this VNet: connected devices (NICs, private endpoints)
+            # and delegations to Azure services
             if vnet.subnets:
                 for subnet in vnet.subnets:
-                    # Check for connected devices (NICs, private endpoints, etc.)
-                    has_devices = (
-                        (subnet.ip_configurations and len(subnet.ip_configurations) > 0) or
-                        (subnet.private_endpoints and len(subnet.private_endpoints) > 0)
-                    )
-                    
-                    # Check for delegation to Azure services
-                    has_delegation = subnet.delegations and len(subnet.delegations) > 0
-                    
                     environment_data['resources']['subnets'].append({
                         'id': subnet.id,
                         'name': subnet.name,
                         'vnet_name': vnet.name,
-                        'resource_group': vnet.id.split('/')[4],
+                        'resource_group': resource_ids.resource_group(vnet.id),
                         'location': vnet.location,  # Subnets inherit location from parent VNet
                         'address_prefix': subnet.address_prefix,
-                        'is_orphaned': not has_devices and not has_delegation
+                        'ip_configurations_count': len(subnet.ip_configurations) if subnet.ip_configurations else 0,
+                        'private_endpoints_count': len(subnet.private_endpoints) if subnet.private_endpoints else 0,
+                        'delegations_count': len(subnet.delegations) if subnet.delegations else 0,
+                        'network_security_group_id': subnet.network_security_group.id if subnet.network_security_group else None,
+                        'route_table_id': subnet.route_table.id if subnet.route_table else None,
+                        'nat_gateway_id': subnet.nat_gateway.id if subnet.nat_gateway else None
                     })
         
         # IP Groups - not attached to any Azure Firewall
         print("  - Fetching IP groups...")
         for ip_group in network_client.ip_groups.list():
-            # Check if attached to any firewall or firewall policy
-            has_firewalls = ip_group.firewalls and len(ip_group.firewalls) > 0
-            has_firewall_policies = ip_group.firewall_policies and len(ip_group.firewall_policies) > 0
-            
+            # Firewalls and firewall policies using the group
             environment_data['resources']['ip_groups'].append({
                 'id': ip_group.id,
                 'name': ip_group.name,
-                'resource_group': ip_group.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(ip_group.id),
                 'location': ip_group.location,
-                'is_orphaned': not has_firewalls and not has_firewall_policies
+                'firewalls_count': len(ip_group.firewalls) if ip_group.firewalls else 0,
+                'firewall_policies_count': len(ip_group.firewall_policies) if ip_group.firewall_policies else 0
             })
         
         # Private DNS Zones - without Virtual Network Links
@@ -1056,16 +1427,15 @@ def download_azure_environment():
             
             for zone in privatedns_client.private_zones.list():
                 # Check for virtual network links
-                rg_name = zone.id.split('/')[4]
+                rg_name = resource_ids.resource_group(zone.id)
                 vnet_links = list(privatedns_client.virtual_network_links.list(rg_name, zone.name))
-                has_links = len(vnet_links) > 0
                 
                 environment_data['resources']['private_dns_zones'].append({
                     'id': zone.id,
                     'name': zone.name,
                     'resource_group': rg_name,
                     'location': zone.location,
-                    'is_orphaned': not has_links
+                    'virtual_network_links_count': len(vnet_links)
                 })
         except ImportError:
             print("    Warning: azure-mgmt-privatedns not installed, skipping Private DNS Zones")
@@ -1075,28 +1445,20 @@ def download_azure_environment():
         # Private Endpoints - not connected to any resource
         print("  - Fetching private endpoints...")
         for pe in network_client.private_endpoints.list_by_subscription():
-            # Check if connected to a resource via private link service connection
-            has_connection = False
-            if pe.private_link_service_connections:
-                for conn in pe.private_link_service_connections:
-                    if conn.private_link_service_connection_state and \
-                       conn.private_link_service_connection_state.status == 'Approved':
-                        has_connection = True
-                        break
-            
-            if not has_connection and pe.manual_private_link_service_connections:
-                for conn in pe.manual_private_link_service_connections:
-                    if conn.private_link_service_connection_state and \
-                       conn.private_link_service_connection_state.status == 'Approved':
-                        has_connection = True
-                        break
+            # States of the (automatic and manual) private link service connections;
+            # an approved one means the endpoint is connected to a resource
+            connections = (pe.private_link_service_connections or []) + (pe.manual_private_link_service_connections or [])
+            connection_states = [
+                conn.private_link_service_connection_state.status
+                for conn in connections if conn.private_link_service_connection_state
+            ]
             
             environment_data['resources']['private_endpoints'].append({
                 'id': pe.id,
                 'name': pe.name,
-                'resource_group': pe.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(pe.id),
                 'location': pe.location,
-                'is_orphaned': not has_connection
+                'connection_states': connection_states
             })
         
         # Virtual Network Gateways - without P2S configuration or connections
@@ -1104,15 +1466,12 @@ def download_azure_environment():
         for rg in resource_client.resource_groups.list():
             try:
                 for vng in network_client.virtual_network_gateways.list(rg.name):
-                    # Check for Point-to-Site configuration
-                    has_p2s = vng.vpn_client_configuration is not None
-                    
-                    # Check for connections (Site-to-Site, VNet-to-VNet, ExpressRoute)
+                    # Connections (Site-to-Site, VNet-to-VNet, ExpressRoute) using this gateway
                     connections = list(network_client.virtual_network_gateway_connections.list(rg.name))
-                    has_connections = any(
-                        conn.virtual_network_gateway1 and conn.virtual_network_gateway1.id == vng.id or
+                    connections_count = sum(
+                        1 for conn in connections
+                        if conn.virtual_network_gateway1 and conn.virtual_network_gateway1.id == vng.id or
                         conn.virtual_network_gateway2 and conn.virtual_network_gateway2.id == vng.id
-                        for conn in connections
                     )
                     
                     environment_data['resources']['virtual_network_gateways'].append({
@@ -1122,7 +1481,8 @@ def download_azure_environment():
                         'location': vng.location,
                         'gateway_type': vng.gateway_type,
                         'vpn_type': vng.vpn_type if hasattr(vng, 'vpn_type') else None,
-                        'is_orphaned': not has_p2s and not has_connections
+                        'vpn_client_configured': vng.vpn_client_configuration is not None,  # Point-to-Site
+                        'connections_count': connections_count
                     })
             except:
                 pass
@@ -1130,15 +1490,13 @@ def download_azure_environment():
         # DDoS Protection Plans - without associated Virtual Networks
         print("  - Fetching DDoS protection plans...")
         for ddos in network_client.ddos_protection_plans.list():
-            # Check if any VNets are associated with this DDoS plan
-            has_vnets = ddos.virtual_networks and len(ddos.virtual_networks) > 0
-            
+            # VNets associated with this DDoS plan
             environment_data['resources']['ddos_protection_plans'].append({
                 'id': ddos.id,
                 'name': ddos.name,
-                'resource_group': ddos.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(ddos.id),
                 'location': ddos.location,
-                'is_orphaned': not has_vnets
+                'virtual_networks_count': len(ddos.virtual_networks) if ddos.virtual_networks else 0
             })
         
         # API Connections - not related to any Logic App
@@ -1149,11 +1507,11 @@ def download_azure_environment():
                              if r.type == 'Microsoft.Web/connections']
             
             for conn in api_connections:
-                rg_name = conn.id.split('/')[4]
+                rg_name = resource_ids.resource_group(conn.id)
                 
                 # Check if connection is referenced by any Logic App
                 # Logic Apps reference connections via their properties
-                has_logic_app = False
+                logic_apps_count = 0
                 try:
                     # Get all Logic Apps in the same resource group
                     logic_apps = [r for r in resource_client.resources.list_by_resource_group(rg_name)
@@ -1161,8 +1519,8 @@ def download_azure_environment():
                     
                     # Check if this connection is referenced (simplified check)
                     # Full check would require getting Logic App definition and parsing parameters/connections
-                    # For now, we'll check if there are any Logic Apps in the same resource group
-                    has_logic_app = len(logic_apps) > 0
+                    # For now, we'll count the Logic Apps in the same resource group
+                    logic_apps_count = len(logic_apps)
                 except:
                     pass
                 
@@ -1171,7 +1529,7 @@ def download_azure_environment():
                     'name': conn.name,
                     'resource_group': rg_name,
                     'location': conn.location,
-                    'is_orphaned': not has_logic_app
+                    'logic_apps_count': logic_apps_count
                 })
         except Exception as e:
             print(f"    Warning: Could not fetch API Connections: {e}")
@@ -1184,25 +1542,21 @@ def download_azure_environment():
                           if r.type == 'Microsoft.Web/certificates']
             
             for cert in certificates:
-                rg_name = cert.id.split('/')[4]
+                rg_name = resource_ids.resource_group(cert.id)
                 
                 try:
-                    # Get certificate details to check expiration
+                    # Get certificate details; expired ones are orphaned as of the scan time
                     cert_details = web_client.certificates.get(rg_name, cert.name)
                     
-                    is_expired = False
-                    if cert_details.expiration_date:
-                        # Check if certificate is expired
-                        is_expired = cert_details.expiration_date < datetime.now(cert_details.expiration_date.tzinfo)
-                    
                     environment_data['resources']['certificates'].append({
                         'id': cert.id,
                         'name': cert.name,
                         'resource_group': rg_name,
                         'location': cert.location,
-                        'expiration_date': cert_details.expiration_date.isoformat() if cert_details.expiration_date else None,
-                        'issuer': cert_details.issuer if hasattr(cert_details, 'issuer') else None,
-                        'is_orphaned': is_expired
+                        # In UTC, to compare as a string with the scan time (see orphan_rules)
+                        'expiration_date': (cert_details.expiration_date.astimezone(timezone.utc).isoformat()
+                                            if cert_details.expiration_date else None),
+                        'issuer': cert_details.issuer if hasattr(cert_details, 'issuer') else None
                     })
                 except Exception as e:
                     print(f"    Warning: Could not get details for certificate {cert.name}: {e}")
@@ -1222,16 +1576,13 @@ def download_azure_environment():
         for rg in resource_client.resource_groups.list():
             try:
                 for avset in compute_client.availability_sets.list(rg.name):
-                    # Exclude ASR availability sets (end with "-asr")
-                    is_asr = avset.name.lower().endswith("-asr")
-                    has_vms = avset.virtual_machines and len(avset.virtual_machines) > 0
-                    
+                    # ASR availability sets (ending with "-asr") are excluded by name
                     environment_data['resources']['availability_sets'].append({
                         'id': avset.id,
                         'name': avset.name,
-                        'resource_group': avset.id.split('/')[4],
+                        'resource_group': resource_ids.resource_group(avset.id),
                         'location': avset.location,
-                        'is_orphaned': not is_asr and not has_vms
+                        'virtual_machines_count': len(avset.virtual_machines) if avset.virtual_machines else 0
                     })
             except:
                 pass
@@ -1239,41 +1590,38 @@ def download_azure_environment():
         # NAT Gateways - not attached to any subnet
         print("  - Fetching NAT gateways...")
         for nat in network_client.nat_gateways.list_all():
-            has_subnets = nat.subnets and len(nat.subnets) > 0
-            
             environment_data['resources']['nat_gateways'].append({
                 'id': nat.id,
                 'name': nat.name,
-                'resource_group': nat.id.split('/')[4],
+                'resource_group': resource_ids.resource_group(nat.id),
                 'location': nat.location,
                 'sku': f"{nat.sku.name}/{nat.sku.tier}" if nat.sku else None,
-                'is_orphaned': not has_subnets
+                'subnets_count': len(nat.subnets) if nat.subnets else 0
             })
         
         # App Service Plans - without hosting Apps
         # Note: number_of_sites property is unreliable, so we count apps manually
         print("  - Fetching App Service plans...")
         
-        # First, get all web apps and group by plan ID
+        # First, get all web apps and group them by plan, joining on compact plan ID keys
         print("    Fetching all web apps...")
         all_apps = list(web_client.web_apps.list())
+        plan_ids = resource_ids.IdCodec()
         apps_by_plan = {}
         for app in all_apps:
             if app.server_farm_id:
-                plan_id = app.server_farm_id.lower()
-                apps_by_plan[plan_id] = apps_by_plan.get(plan_id, 0) + 1
+                apps_by_plan.setdefault(plan_ids.encode(app.server_farm_id), []).append(app.id)
         
         # Now check each plan
         print("    Analyzing App Service plans...")
         try:
             for plan in web_client.app_service_plans.list():
-                plan_id_lower = plan.id.lower()
-                num_apps = apps_by_plan.get(plan_id_lower, 0)
+                app_ids = apps_by_plan.get(plan_ids.find(plan.id), [])
                 
                 environment_data['resources']['app_service_plans'].append({
                     'id': plan.id,
                     'name': plan.name,
-                    'resource_group': plan.id.split('/')[4],
+                    'resource_group': resource_ids.resource_group(plan.id),
                     'location': plan.location,
                     'sku_name': plan.sku.name if plan.sku else None,
                     'sku_tier': plan.sku.tier if plan.sku else None,
@@ -1282,8 +1630,8 @@ def download_azure_environment():
                     'sku_capacity': plan.sku.capacity if plan.sku else 1,
                     'kind': plan.kind if plan.kind else 'app',
                     'reserved': plan.reserved if hasattr(plan, 'reserved') else False,
-                    'num_apps': num_apps,
-                    'is_orphaned': num_apps == 0
+                    'num_apps': len(app_ids),
+                    'app_ids': app_ids
                 })
         except Exception as e:
             print(f"    Error fetching App Service Plans: {e}")
@@ -1292,7 +1640,7 @@ def download_azure_environment():
         # SQL Servers and Elastic Pools
         print("  - Fetching SQL servers...")
         for server in sql_client.servers.list():
-            rg = server.id.split('/')[4]
+            rg = resource_ids.resource_group(server.id)
             try:
                 pools = list(sql_client.elastic_pools.list_by_server(rg, server.name))
                 for pool in pools:
@@ -1303,12 +1651,27 @@ def download_azure_environment():
                         'type': 'elastic_pool',
                         'resource_group': rg,
                         'location': pool.location,
-                        'databases_count': len(databases),
-                        'is_orphaned': len(databases) == 0
+                        'databases_count': len(databases)
                     })
             except:
                 pass
         
+        # Virtual Machines - stopped or deallocated; status_only includes each VM's instance view
+        print("  - Fetching virtual machines...")
+        for vm in compute_client.virtual_machines.list_all(status_only='true'):
+            statuses = vm.instance_view.statuses if vm.instance_view and vm.instance_view.statuses else []
+            power_state = next((status.display_status for status in statuses
+                                if status.code and status.code.startswith('PowerState/')), None)
+            environment_data['resources']['virtual_machines'].append({
+                'id': vm.id,
+                'name': vm.name,
+                'resource_group': resource_ids.resource_group(vm.id),
+                'location': vm.location,
+                'vm_size': vm.hardware_profile.vm_size if vm.hardware_profile else None,
+                'os_type': vm.storage_profile.os_disk.os_type if vm.storage_profile and vm.storage_profile.os_disk else None,
+                'power_state': power_state
+            })
+        
         # Resource Groups - check if empty
         print("  - Fetching resource groups...")
         for rg in resource_client.resource_groups.list():
@@ -1317,10 +1680,11 @@ def download_azure_environment():
                 'id': rg.id,
                 'name': rg.name,
                 'location': rg.location,
-                'resources_count': len(rg_resources),
-                'is_orphaned': len(rg_resources) == 0
+                'resources_count': len(rg_resources)
             })
         
+        orphan_rules.apply_rules(environment_data)
+        
         print("Download complete!")
         return environment_data
         
@@ -1336,40 +1700,8 @@ def detect_orphaned_resources(environment_file=None):
         if not environment_file:
             return {'error': 'Environment JSON file is required'}
             
-        # Load from JSON file
-        with open(environment_file, 'r') as f:
-            env_data = json.load(f)
-        
-        resources = env_data['resources']
-        
-        # Count orphaned resources using the is_orphaned flag from detailed download
-        orphaned_counts = {
-            'app_service_plans': sum(1 for r in resources.get('app_service_plans', []) if r.get('is_orphaned')),
-            'availability_sets': sum(1 for r in resources.get('availability_sets', []) if r.get('is_orphaned')),
-            'disks': sum(1 for r in resources.get('disks', []) if r.get('is_orphaned')),
-            'sql_elastic_pools': sum(1 for r in resources.get('sql_servers', []) if r.get('is_orphaned')),
-            'public_ips': sum(1 for r in resources.get('public_ips', []) if r.get('is_orphaned')),
-            'network_interfaces': sum(1 for r in resources.get('network_interfaces', []) if r.get('is_orphaned')),
-            'network_security_groups': sum(1 for r in resources.get('network_security_groups', []) if r.get('is_orphaned')),
-            'route_tables': sum(1 for r in resources.get('route_tables', []) if r.get('is_orphaned')),
-            'load_balancers': sum(1 for r in resources.get('load_balancers', []) if r.get('is_orphaned')),
-            'frontdoor_waf_policies': sum(1 for r in resources.get('frontdoor_waf_policies', []) if r.get('is_orphaned')),
-            'traffic_manager_profiles': sum(1 for r in resources.get('traffic_manager_profiles', []) if r.get('is_orphaned')),
-            'application_gateways': sum(1 for r in resources.get('application_gateways', []) if r.get('is_orphaned')),
-            'virtual_networks': sum(1 for r in resources.get('virtual_networks', []) if r.get('is_orphaned')),
-            'subnets': sum(1 for r in resources.get('subnets', []) if r.get('is_orphaned')),
-            'ip_groups': sum(1 for r in resources.get('ip_groups', []) if r.get('is_orphaned')),
-            'private_dns_zones': sum(1 for r in resources.get('private_dns_zones', []) if r.get('is_orphaned')),
-            'private_endpoints': sum(1 for r in resources.get('private_endpoints', []) if r.get('is_orphaned')),
-            'virtual_network_gateways': sum(1 for r in resources.get('virtual_network_gateways', []) if r.get('is_orphaned')),
-            'ddos_protection_plans': sum(1 for r in resources.get('ddos_protection_plans', []) if r.get('is_orphaned')),
-            'api_connections': sum(1 for r in resources.get('api_connections', []) if r.get('is_orphaned')),
-            'certificates': sum(1 for r in resources.get('certificates', []) if r.get('is_orphaned')),
-            'nat_gateways': sum(1 for r in resources.get('nat_gateways', []) if r.get('is_orphaned')),
-            'resource_groups': sum(1 for r in resources.get('resource_groups', []) if r.get('is_orphaned'))
-        }
-        
-        return orphaned_counts
+        # Projection of the shared, memoized analysis of the scan
+        return scan_analysis.orphan_counts(get_scan_analysis(environment_file)['types'])
         
     except Exception as e:
         return {'error': str(e)}
@@ -1424,19 +1756,43 @@ def api_download_environment():
         
         filepath = os.path.join(data_dir, filename)
         
-        with open(filepath, 'w') as f:
-            json.dump(env_data, f, indent=2)
+        # Also writes the per-type offset index used for single-type reads
+        scan_io.write_scan_file(filepath, env_data)
+        
+        # Ingest into the SQLite store so dashboards can run indexed queries
+        try:
+            scan_store.ingest_scan(app.config['SCAN_DB_PATH'], filename, env_data,
+                                   env_data['resources'].items(), get_scan_mode(filename))
+        except Exception as e:
+            print(f"Warning: Could not ingest scan into store: {e}")
+        
+        # Record in the deduplicated history (only changed records are stored)
+        try:
+            history_store.record_snapshot(app.config['HISTORY_DB_PATH'], filename, env_data, get_scan_mode(filename))
+        except Exception as e:
+            print(f"Warning: Could not record scan history: {e}")
+        
+        # Append the per-type/RG/location counts to the trend series (kept after retention)
+        try:
+            trend_store.record_scan(app.config['TREND_DB_PATH'], filename, env_data, get_scan_mode(filename))
+        except Exception as e:
+            print(f"Warning: Could not record scan trends: {e}")
+        
+        latest_scan.update_latest(data_dir, get_scan_mode(filename), filename, env_data.get('subscription_id'))
         
         # Count total resources across all types
         total_resources = sum(len(v) for v in env_data['resources'].values() if isinstance(v, list))
         
-        return jsonify({
+        response = jsonify({
             'success': True,
             'filename': filename,
             'filepath': filepath,
             'resource_count': total_resources,
             'demo_mode': demo_mode
         })
+        # Index the new latest scan for search once the response is out, not inside the ingest
+        response.call_on_close(lambda: build_search_index(filename))
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1472,12 +1828,15 @@ def get_scan_files():
             file_stats = os.stat(filepath)
             file_size = file_stats.st_size
             
-            # Try to read resource count from file
+            # Read resource count from the scan's offset index instead of parsing the file
             try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    resource_count = sum(len(v) for v in data.get('resources', {}).values() if isinstance(v, list))
-                    scan_date = data.get('timestamp', 'Unknown')
+                index = scan_io.get_scan_index(filepath)
+                counts = [t['count'] for t in index['types'].values()]
+                if None in counts:
+                    data = load_scan_data(filepath)
+                    counts = [len(v) for v in data.get('resources', {}).values() if isinstance(v, list)]
+                resource_count = sum(c for c in counts if c is not None)
+                scan_date = index['meta'].get('timestamp', 'Unknown')
             except:
                 resource_count = 0
                 scan_date = 'Unknown'
@@ -1530,7 +1889,7 @@ def delete_scan_file(filename):
         if not os.path.exists(filepath):
             return jsonify({'error': 'File not found'}), 404
         
-        os.remove(filepath)
+        remove_scan(filepath)
         
         return jsonify({
             'success': True,
@@ -1557,7 +1916,7 @@ def delete_all_scans():
         deleted_count = 0
         for filename in json_files:
             filepath = os.path.join(data_dir, filename)
-            os.remove(filepath)
+            remove_scan(filepath)
             deleted_count += 1
         
         return jsonify({
@@ -1568,28 +1927,217 @@ def delete_all_scans():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history')
+def get_history():
+    """API endpoint to list snapshots in the deduplicated scan history"""
+    try:
+        db_path = app.config['HISTORY_DB_PATH']
+        mode = 'demo' if is_demo_mode() else 'production'
+        
+        return jsonify({
+            'snapshots': history_store.list_snapshots(db_path, mode=mode),
+            'storage': history_store.get_storage_stats(db_path)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/history/<scan_id>')
+def get_history_snapshot(scan_id):
+    """API endpoint to reconstruct a full snapshot from the history"""
+    try:
+        # Only snapshots of the current mode, like every other scan-addressed endpoint
+        prefix = DEV_FILE_PREFIX if is_demo_mode() else PROD_FILE_PREFIX
+        if not scan_id.startswith(prefix):
+            return jsonify({'error': 'Snapshot not found'}), 404
+        
+        types = request.args.get('types')
+        resource_types = set(types.split(',')) if types else None
+        
+        scan_data = history_store.load_snapshot(app.config['HISTORY_DB_PATH'], scan_id, resource_types)
+        if scan_data is None:
+            return jsonify({'error': 'Snapshot not found'}), 404
+        
+        return jsonify(scan_data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/trends')
+def get_trends():
+    """
+    API endpoint for orphan trends over time, downsampled to hourly, daily or weekly buckets.
+    Optional filters: type (slug or scan key), dimension (type, resource_group, location), key, days.
+    """
+    try:
+        mode = 'demo' if is_demo_mode() else 'production'
+        bucket = request.args.get('bucket', 'daily')
+        dimension = request.args.get('dimension', 'type')
+        days = request.args.get('days', 365, type=int)
+        resource_type = request.args.get('type')
+        if resource_type:
+            resource_type = RESOURCE_JSON_KEYS.get(resource_type, resource_type)
+        
+        since = (datetime.now() - timedelta(days=days)).isoformat(timespec='seconds')
+        series = trend_store.get_trend(app.config['TREND_DB_PATH'], mode, bucket=bucket, since=since,
+                                       resource_type=resource_type, dimension=dimension,
+                                       key=request.args.get('key'))
+        
+        return jsonify({
+            'bucket': bucket,
+            'dimension': dimension,
+            'resource_type': resource_type,
+            'since': since,
+            'series': series
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def compact_scan(mode, scan):
+    """
+    Fold an expired scan into its period rollup, then remove its file and store rows. The
+    snapshot stays in the deduplicated history, where unchanged records cost nothing.
+    """
+    filepath = os.path.join(app.config['ENVIRONMENT_FOLDER'], scan['scan_id'])
+    
+    # Scans saved before the trend or history stores existed still get their points and snapshot
+    scan_data = None
+    if not trend_store.has_scan(app.config['TREND_DB_PATH'], scan['scan_id']):
+        scan_data = load_scan_data(filepath)
+        trend_store.record_scan(app.config['TREND_DB_PATH'], scan['scan_id'], scan_data, mode)
+    if not history_store.has_snapshot(app.config['HISTORY_DB_PATH'], scan['scan_id']):
+        scan_data = scan_data or load_scan_data(filepath)
+        history_store.record_snapshot(app.config['HISTORY_DB_PATH'], scan['scan_id'], scan_data, mode)
+    
+    # The type counts come from the trend points, so the scan is never ingested just to count it
+    type_counts = trend_store.get_type_counts(app.config['TREND_DB_PATH'], scan['scan_id'])
+    # A scan already folded in (by an interrupted earlier run) is not counted again
+    scan_store.add_rollup(app.config['SCAN_DB_PATH'], mode, scan['scan_id'],
+                          scan['period_start'].isoformat(), scan['period_hours'], type_counts)
+    
+    remove_scan(filepath, keep_history=True)
+
+def apply_scan_retention():
+    """
+    Apply the retention tiers to demo and production scans, compacting the expired ones.
+    Returns None, doing nothing, while another thread or worker process is already running it.
+    """
+    data_dir = app.config['ENVIRONMENT_FOLDER']
+    with retention.run_lock(os.path.join(data_dir, retention.RUN_LOCK_NAME)) as acquired:
+        if not acquired:
+            return None
+        
+        tiers = retention.parse_retention_tiers(app.config['SCAN_RETENTION_TIERS'])
+        filenames = [f for f in os.listdir(data_dir) if f.endswith('.json')]
+        
+        results = {}
+        for mode, prefix in (('demo', DEV_FILE_PREFIX), ('production', PROD_FILE_PREFIX)):
+            scans = []
+            for filename in filenames:
+                timestamp = retention.parse_scan_timestamp(filename) if filename.startswith(prefix) else None
+                if timestamp:
+                    scans.append({'scan_id': filename, 'timestamp': timestamp})
+            
+            keep, expire = retention.plan_retention(scans, tiers)
+            for scan in expire:
+                compact_scan(mode, scan)
+            
+            results[mode] = {'kept': len(keep), 'compacted': len(expire)}
+        return results
+
+@app.route('/api/retention', methods=['GET', 'POST'])
+@limiter.limit("5 per hour", methods=['POST'])  # A run compacts every expired scan
+def scan_retention():
+    """Get the retention policy and rollups, or run retention now (POST)"""
+    try:
+        if request.method == 'POST':
+            results = apply_scan_retention()
+            if results is None:
+                return jsonify({'error': 'Scan retention is already running'}), 409
+            return jsonify({'success': True, 'results': results})
+        
+        mode = 'demo' if is_demo_mode() else 'production'
+        return jsonify({
+            'enabled': app.config['SCAN_RETENTION_ENABLED'],
+            'tiers': retention.parse_retention_tiers(app.config['SCAN_RETENTION_TIERS']),
+            'rollups': scan_store.get_rollups(app.config['SCAN_DB_PATH'], mode)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def reevaluate_scan(filepath, write=True):
+    """
+    Re-apply the orphan rules to a saved scan from its stored raw properties. When verdicts
+    or the ruleset version change, the scan is rewritten in every store that holds it.
+    """
+    scan_id = os.path.basename(filepath)
+    scan_data = load_scan_data(filepath)
+    previous_version = scan_data.get('ruleset_version')
+    types = orphan_rules.apply_rules(scan_data)
+    changed = sum(counts['changed'] for counts in types.values())
+    
+    updated = write and (changed > 0 or previous_version != orphan_rules.RULESET_VERSION)
+    if updated:
+        mode = get_scan_mode(scan_id)
+        if os.path.exists(filepath):
+            scan_io.replace_scan_file(filepath, scan_data)
+        if scan_store.get_scan(app.config['SCAN_DB_PATH'], scan_id) is not None:
+            scan_store.ingest_scan(app.config['SCAN_DB_PATH'], scan_id, scan_data,
+                                   scan_data['resources'].items(), mode)
+        if history_store.has_snapshot(app.config['HISTORY_DB_PATH'], scan_id):
+            history_store.record_snapshot(app.config['HISTORY_DB_PATH'], scan_id, scan_data, mode)
+        if trend_store.has_scan(app.config['TREND_DB_PATH'], scan_id):
+            trend_store.record_scan(app.config['TREND_DB_PATH'], scan_id, scan_data, mode)
+        scan_analysis.invalidate(scan_id)
+        scan_diff.invalidate(scan_id)
+    
+    return {
+        'scan_id': scan_id,
+        'previous_ruleset_version': previous_version,
+        'changed': changed,
+        'updated': updated,
+        'types': types
+    }
+
+def reevaluate_scans(mode=None, write=True):
+    """Re-apply the orphan rules to every saved scan (files and history-only snapshots) of a mode"""
+    data_dir = app.config['ENVIRONMENT_FOLDER']
+    prefixes = {'demo': (DEV_FILE_PREFIX,), 'production': (PROD_FILE_PREFIX,)}.get(mode, (DEV_FILE_PREFIX, PROD_FILE_PREFIX))
+    
+    scan_ids = {f for f in os.listdir(data_dir) if f.endswith('.json') and f.startswith(prefixes)}
+    scan_ids.update(s['scan_id'] for s in history_store.list_snapshots(app.config['HISTORY_DB_PATH'], mode=mode))
+    return [reevaluate_scan(os.path.join(data_dir, scan_id), write) for scan_id in sorted(scan_ids)]
+
+@app.route('/api/orphan-rules', methods=['GET', 'POST'])
+@limiter.limit("5 per hour", methods=['POST'])  # A dry run re-evaluates every saved scan of the mode
+def orphan_rules_endpoint():
+    """
+    Get the orphan ruleset, or report what re-evaluating the saved scans of the current mode
+    with it would change (POST). Nothing is written; apply the changes offline with
+    scripts/reevaluate_orphans.py.
+    """
+    try:
+        mode = 'demo' if is_demo_mode() else 'production'
+        if request.method == 'POST':
+            return jsonify({'success': True, 'version': orphan_rules.RULESET_VERSION, 'dry_run': True,
+                            'results': reevaluate_scans(mode, write=False)})
+        
+        return jsonify({'version': orphan_rules.RULESET_VERSION, 'rules': orphan_rules.ORPHAN_RULES})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/orphaned-resources')
 @limiter.limit("30 per minute")  # Limit analysis requests
+@conditional_on_latest_scan()
 def get_orphaned_resources():
     """API endpoint to get orphaned resources count from local JSON file"""
     try:
         # Find the latest environment JSON file
-        data_dir = app.config['ENVIRONMENT_FOLDER']
+        latest_file = get_latest_scan_path()
         
-        # Filter files based on environment
-        if is_demo_mode():
-            json_files = [f for f in os.listdir(data_dir) if f.startswith(DEV_FILE_PREFIX) and f.endswith('.json')]
-        else:
-            json_files = [f for f in os.listdir(data_dir) 
-                         if f.startswith(PROD_FILE_PREFIX) and f.endswith('.json') 
-                         and not f.startswith(DEV_FILE_PREFIX)]
-        
-        if not json_files:
+        if not latest_file:
             return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
         
-        # Get the most recent file
-        latest_file = max([os.path.join(data_dir, f) for f in json_files], key=os.path.getmtime)
-        
         orphaned_data = detect_orphaned_resources(environment_file=latest_file)
         return jsonify(orphaned_data)
     except Exception as e:
@@ -1597,194 +2145,89 @@ def get_orphaned_resources():
 
 @app.route('/api/complete-resources')
 @limiter.limit("30 per minute")  # Limit analysis requests
+@conditional_on_latest_scan()
 def get_complete_resources():
     """API endpoint to get complete resource counts (total, active, orphaned) from local JSON file"""
     try:
         # Find the latest environment JSON file
-        data_dir = app.config['ENVIRONMENT_FOLDER']
+        latest_file = get_latest_scan_path()
         
-        # Filter files based on environment
-        if is_demo_mode():
-            json_files = [f for f in os.listdir(data_dir) if f.startswith(DEV_FILE_PREFIX) and f.endswith('.json')]
-        else:
-            json_files = [f for f in os.listdir(data_dir) 
-                         if f.startswith(PROD_FILE_PREFIX) and f.endswith('.json') 
-                         and not f.startswith(DEV_FILE_PREFIX)]
-        
-        if not json_files:
+        if not latest_file:
             return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
         
-        # Get the most recent file
-        latest_file = max([os.path.join(data_dir, f) for f in json_files], key=os.path.getmtime)
-        
-        with open(latest_file, 'r') as f:
-            scan_data = json.load(f)
-        
-        # Get the resources object from scan data
-        resources = scan_data.get('resources', {})
-        
-        # Get orphaned counts
-        orphaned_data = detect_orphaned_resources(environment_file=latest_file)
-        
-        # Build complete resource view data
-        complete_view = {}
-        
-        resource_mapping = {
-            'app_service_plans': 'app_service_plans',
-            'availability_sets': 'availability_sets',
-            'disks': 'disks',
-            'sql_elastic_pools': 'sql_servers',  # SQL elastic pools are tracked under sql_servers
-            'public_ips': 'public_ips',
-            'network_interfaces': 'network_interfaces',
-            'network_security_groups': 'network_security_groups',
-            'route_tables': 'route_tables',
-            'load_balancers': 'load_balancers',
-            'frontdoor_waf_policies': 'frontdoor_waf_policies',
-            'traffic_manager_profiles': 'traffic_manager_profiles',
-            'application_gateways': 'application_gateways',
-            'virtual_networks': 'virtual_networks',
-            'subnets': 'subnets',
-            'nat_gateways': 'nat_gateways',
-            'ip_groups': 'ip_groups',
-            'private_dns_zones': 'private_dns_zones',
-            'private_endpoints': 'private_endpoints',
-            'virtual_network_gateways': 'virtual_network_gateways',
-            'ddos_protection_plans': 'ddos_protection_plans',
-            'storage_accounts': 'resource_groups',  # Using resource_groups as proxy
-            'certificates': 'certificates'
-        }
-        
-        for key, scan_key in resource_mapping.items():
-            # Get total count from scan data resources
-            total = len(resources.get(scan_key, []))
-            
-            complete_view[key] = {
-                'total': total
-            }
-        
-        return jsonify(complete_view)
+        return jsonify(scan_analysis.complete_resources(get_scan_analysis(latest_file)['types']))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/resource-availability')
+@conditional_on_latest_scan()
 def get_resource_availability():
     """API endpoint to check which resource types have data in the latest scan"""
     try:
         # Find the latest environment JSON file
-        data_dir = app.config['ENVIRONMENT_FOLDER']
+        latest_file = get_latest_scan_path()
         
-        # Filter files based on environment
-        if is_demo_mode():
-            json_files = [f for f in os.listdir(data_dir) if f.startswith(DEV_FILE_PREFIX) and f.endswith('.json')]
-        else:
-            json_files = [f for f in os.listdir(data_dir) 
-                         if f.startswith(PROD_FILE_PREFIX) and f.endswith('.json') 
-                         and not f.startswith(DEV_FILE_PREFIX)]
-        
-        if not json_files:
+        if not latest_file:
             return jsonify({'error': 'No scan data', 'availability': {}})
         
-        # Load latest JSON scan
-        latest_file = max([os.path.join(data_dir, f) for f in json_files], key=os.path.getmtime)
-        
-        with open(latest_file, 'r') as f:
-            scan_data = json.load(f)
-        
-        # Map resource type to JSON key
-        resource_key_mapping = {
-            'app-service': 'app_service_plans',
-            'sql-databases': 'sql_servers',
-            'virtual-machines': 'virtual_machines',
-            'public-ips': 'public_ips',
-            'disks': 'disks',
-            'nics': 'network_interfaces',
-            'load-balancers': 'load_balancers',
-            'availability-sets': 'availability_sets',
-            'route-tables': 'route_tables',
-            'nat-gateways': 'nat_gateways',
-            'frontdoor-waf': 'frontdoor_waf_policies',
-            'traffic-manager': 'traffic_manager_profiles',
-            'subnets': 'subnets',
-            'ip-groups': 'ip_groups',
-            'private-dns': 'private_dns_zones',
-            'private-endpoints': 'private_endpoints',
-            'vnet-gateways': 'virtual_network_gateways',
-            'ddos-plans': 'ddos_protection_plans',
-            'api-connections': 'api_connections',
-            'certificates': 'certificates',
-            'storage-accounts': 'storage_accounts',
-            'nsgs': 'network_security_groups'
-        }
-        
-        availability = {}
-        resources = scan_data.get('resources', {})
-        
-        for resource_type, json_key in resource_key_mapping.items():
-            data = resources.get(json_key, [])
-            availability[resource_type] = {
-                'has_data': len(data) > 0,
-                'count': len(data),
-                'orphaned_count': len([r for r in data if r.get('is_orphaned', False)])
-            }
+        analysis = get_scan_analysis(latest_file)
         
         return jsonify({
             'scan_file': os.path.basename(latest_file),
-            'scan_date': scan_data.get('timestamp', 'Unknown'),
-            'availability': availability
+            'scan_date': analysis['timestamp'] or 'Unknown',
+            'availability': scan_analysis.availability(analysis['types'])
         })
     except Exception as e:
         return jsonify({'error': str(e), 'availability': {}}), 500
 
 @app.route('/api/orphaned-resources/details')
+@conditional_on_latest_scan()
 def get_orphaned_resources_details():
     """API endpoint to get detailed orphaned resources with names, resource groups, and locations"""
     try:
         # Find the latest environment JSON file
-        data_dir = app.config['ENVIRONMENT_FOLDER']
+        latest_file = get_latest_scan_path()
         
-        # Filter files based on environment
-        if is_demo_mode():
-            json_files = [f for f in os.listdir(data_dir) if f.startswith(DEV_FILE_PREFIX) and f.endswith('.json')]
-        else:
-            json_files = [f for f in os.listdir(data_dir) 
-                         if f.startswith(PROD_FILE_PREFIX) and f.endswith('.json') 
-                         and not f.startswith(DEV_FILE_PREFIX)]
-        
-        if not json_files:
+        if not latest_file:
             return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
         
-        # Get the most recent file
-        latest_file = max([os.path.join(data_dir, f) for f in json_files], key=os.path.getmtime)
-        
-        # Load from JSON file
-        with open(latest_file, 'r') as f:
-            env_data = json.load(f)
-        
-        resources = env_data['resources']
-        
-        # Get detailed orphaned resources
-        detailed_orphaned = {}
-        
-        # NOTE: Cost calculations require Azure Cost Management API integration
-        # Fictional cost estimates have been removed to maintain data integrity
-        
-        for resource_type, resources_list in resources.items():
-            orphaned = [r for r in resources_list if r.get('is_orphaned')]
-            if orphaned:
-                detailed_orphaned[resource_type] = {
-                    'count': len(orphaned),
-                    'resources': [
-                        {
-                            'name': r.get('name', 'N/A'),
-                            'resource_group': r.get('resource_group', 'N/A'),
-                            'location': r.get('location', 'N/A'),
-                            'id': r.get('id', '')
-                        }
-                        for r in orphaned
-                    ]
-                }
-        
-        return jsonify(detailed_orphaned)
+        # Sparse fieldsets: ?types=disks,nics&sections=count&fields=name,id
+        resource_types = parse_sections(set(RESOURCE_JSON_KEYS) | set(RESOURCE_JSON_KEYS.values()), 'types')
+        if resource_types is not None:
+            resource_types = {RESOURCE_JSON_KEYS.get(t, t) for t in resource_types}
+        sections = parse_sections(ORPHAN_DETAIL_SECTIONS) or ORPHAN_DETAIL_SECTIONS
+        fields = parse_sections(scan_analysis.ORPHAN_LISTING_FIELDS, 'fields') or scan_analysis.ORPHAN_LISTING_FIELDS
+        
+        if wants_orphan_page():
+            # Paged and filtered through the store indexes, one page per type
+            scan = ensure_scan_ingested(latest_file)
+            requested_type = request.args.get('type')
+            if requested_type:
+                resource_keys = [RESOURCE_JSON_KEYS.get(requested_type, requested_type)]
+            elif 'cursor' in request.args:
+                return jsonify({'error': 'A cursor needs the type it was issued for'}), 400
+            else:
+                resource_keys = [
+                    key for key, counts in scan_store.get_type_counts(app.config['SCAN_DB_PATH'], scan['scan_id']).items()
+                    if counts['orphaned'] and (resource_types is None or key in resource_types)
+                ]
+            
+            detailed_orphaned = {}
+            for resource_key in resource_keys:
+                page = get_orphan_listing_page(scan['scan_id'], resource_key, resource_key, fields)
+                if page['count']:
+                    if 'count' not in sections:
+                        del page['count']
+                    if 'resources' not in sections:
+                        del page['resources']
+                    detailed_orphaned[resource_key] = page
+            return jsonify(detailed_orphaned)
+        
+        return jsonify(scan_analysis.orphan_details(
+            get_scan_analysis(latest_file)['types'], resource_types=resource_types, sections=sections, fields=fields
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1814,13 +2257,37 @@ def format_resource_display_name(resource, resource_type):
     
     return name
 
-def analyze_generic_resource_type(resource_type, resources_data):
-    """Generic analyzer for any resource type from JSON data with enhanced insights"""
+# Sections of one type's dashboard analysis
+TYPE_ANALYSIS_SECTIONS = (
+    'summary', 'cost_impact', 'risk_assessment', 'action_priorities', 'benchmarks', 'recommendations',
+    'location_stats', 'resource_group_stats', 'orphaned_resources', 'resource_details'
+)
+
+def parse_sections(allowed, param='sections'):
+    """
+    Read a comma-separated selection (e.g. ?sections=summary,benchmarks) from the request.
+    Returns None when the parameter is absent; raises ValueError for unknown names.
+    """
+    if not request.args.get(param):
+        return None
+    selected = [s for s in request.args[param].split(',') if s]
+    unknown = [s for s in selected if s not in allowed]
+    if unknown:
+        raise ValueError(f'Invalid {param}: {", ".join(unknown)}')
+    return selected
+
+def analyze_generic_resource_type(resource_type, resources_data, type_analysis=None, sections=None):
+    """
+    Generic analyzer for any resource type from JSON data with enhanced insights.
+    `type_analysis` is the single-pass scan_analysis result for the same resources (computed here if not given).
+    `sections` limits the result to those TYPE_ANALYSIS_SECTIONS; the work behind the others is skipped.
+    """
+    wanted = set(TYPE_ANALYSIS_SECTIONS if sections is None else sections)
     
     if not resources_data:
         # Return empty but valid response instead of error
         resource_name = RESOURCE_TYPES.get(resource_type, {}).get("name", "resources")
-        return {
+        empty_result = {
             'summary': {
                 'total_resources': 0,
                 'orphaned_count': 0,
@@ -1838,143 +2305,79 @@ def analyze_generic_resource_type(resource_type, resources_data):
             'location_stats': [],
             'resource_group_stats': [],
             'orphaned_resources': [],
-            'resource_details': [],
-            'info_message': f'No {resource_name} found in your Azure environment. This is normal if you don\'t use this resource type.'
+            'resource_details': []
         }
+        result = {section: value for section, value in empty_result.items() if section in wanted}
+        result['info_message'] = f'No {resource_name} found in your Azure environment. This is normal if you don\'t use this resource type.'
+        return result
     
     # NOTE: Actual costs require Azure Cost Management API integration
     # Cost calculations are disabled to avoid showing fictional data
     cost_per_resource = 0
     
-    total_resources = len(resources_data)
-    orphaned_resources = [r for r in resources_data if r.get('is_orphaned', False)]
-    active_resources = [r for r in resources_data if not r.get('is_orphaned', False)]
-    
-    # Cost calculations disabled - requires Azure Cost Management integration
-    monthly_waste = 0
-    annual_savings = 0
-    
-    # Quick wins (based on resource count, not fictional costs)
-    quick_wins = []
-    if len(orphaned_resources) > 5:
-        quick_wins.append({
-            'action': f'Delete {len(orphaned_resources)} orphaned {RESOURCE_TYPES.get(resource_type, {}).get("name", "resources")}',
-            'savings': 'Cost data requires Azure Cost Management integration'
-        })
-    
-    # Risk Assessment
-    risk_level = 'Low'
-    risk_items = []
-    
-    if resource_type in ['nsgs', 'route-tables'] and len(orphaned_resources) > 5:
-        risk_level = 'High'
-        risk_items.append(f'{len(orphaned_resources)} orphaned network security resources could impact security posture')
-    elif resource_type == 'nics' and len(orphaned_resources) > 10:
-        risk_level = 'Medium'
-        risk_items.append(f'{len(orphaned_resources)} orphaned NICs indicate potential VM cleanup needed')
-    elif cost_per_resource == 0 and len(orphaned_resources) > 15:
-        risk_level = 'Low'
-        risk_items.append(f'{len(orphaned_resources)} orphaned resources (no direct cost, hygiene improvement)')
+    if type_analysis is None:
+        type_analysis = scan_analysis.analyze_type(resources_data)
     
-    # Group by location
-    location_stats = {}
-    for resource in resources_data:
-        loc = resource.get('location', 'Unknown')
-        if loc not in location_stats:
-            location_stats[loc] = {'total': 0, 'orphaned': 0, 'active': 0, 'cost': 0}
-        location_stats[loc]['total'] += 1
-        if resource.get('is_orphaned'):
-            location_stats[loc]['orphaned'] += 1
-            location_stats[loc]['cost'] += cost_per_resource
-        else:
-            location_stats[loc]['active'] += 1
-    
-    # Group by resource group with performance metrics
-    rg_stats = {}
-    for resource in resources_data:
-        rg = resource.get('resource_group', 'Unknown')
-        if rg not in rg_stats:
-            rg_stats[rg] = {'total': 0, 'orphaned': 0, 'active': 0, 'orphan_rate': 0}
-        rg_stats[rg]['total'] += 1
-        if resource.get('is_orphaned'):
-            rg_stats[rg]['orphaned'] += 1
-        else:
-            rg_stats[rg]['active'] += 1
-    
-    # Calculate orphan rates for benchmarking
-    for rg in rg_stats:
-        if rg_stats[rg]['total'] > 0:
-            rg_stats[rg]['orphan_rate'] = round((rg_stats[rg]['orphaned'] / rg_stats[rg]['total']) * 100, 1)
-    
-    # Identify best and worst performing RGs
-    rg_list = [(rg, stats) for rg, stats in rg_stats.items() if stats['total'] >= 3]
-    best_rg = min(rg_list, key=lambda x: x[1]['orphan_rate']) if rg_list else None
-    worst_rg = max(rg_list, key=lambda x: x[1]['orphan_rate']) if rg_list else None
-    
-    # Generate recommendations with enhanced intelligence
-    recommendations = generate_enhanced_recommendations(
-        resource_type, resources_data, orphaned_resources, 
-        cost_per_resource, rg_stats, worst_rg
-    )
-    
-    # Action Priority Matrix
-    action_priorities = {
-        'urgent': [],  # >$500/month or critical security
-        'high': [],    # $100-$500/month or significant waste
-        'low': []      # <$100/month or hygiene
-    }
-    
-    for rec in recommendations:
-        priority_level = rec.get('priority', 'Low')
-        action_item = {
-            'title': rec['resource'],
-            'action': rec['suggestion'],
-            'savings': rec.get('potential_saving', 'N/A')
-        }
-        
-        if priority_level == 'Critical':
-            action_priorities['urgent'].append(action_item)
-        elif priority_level == 'High':
-            action_priorities['high'].append(action_item)
-        else:
-            action_priorities['low'].append(action_item)
-    
-    # Internal Benchmarks (based on your resource groups)
+    total_resources = len(resources_data)
+    orphaned_resources = type_analysis['orphans']
+    active_count = total_resources - len(orphaned_resources)
     avg_orphan_rate = round((len(orphaned_resources) / total_resources * 100) if total_resources > 0 else 0, 1)
     
-    # Calculate average across all resource groups for internal comparison
-    rg_orphan_rates = [stats['orphan_rate'] for stats in rg_stats.values() if stats['total'] >= 3]
-    avg_rg_orphan_rate = round(sum(rg_orphan_rates) / len(rg_orphan_rates), 1) if rg_orphan_rates else avg_orphan_rate
+    result = {}
     
-    benchmarks = {
-        'your_orphan_rate': avg_orphan_rate,
-        'avg_rg_orphan_rate': avg_rg_orphan_rate,
-        'best_rg': {'name': best_rg[0], 'rate': best_rg[1]['orphan_rate']} if best_rg else None,
-        'worst_rg': {'name': worst_rg[0], 'rate': worst_rg[1]['orphan_rate']} if worst_rg else None,
-        'total_rg_count': len(rg_stats)
-    }
-    
-    # Prepare enhanced response
-    return {
-        'summary': {
+    if 'summary' in wanted:
+        result['summary'] = {
             'total_resources': total_resources,
             'orphaned_count': len(orphaned_resources),
-            'active_count': len(active_resources),
+            'active_count': active_count,
             'orphaned_percentage': avg_orphan_rate
-        },
-        'cost_impact': {
+        }
+    
+    if 'cost_impact' in wanted:
+        # Cost calculations disabled - requires Azure Cost Management integration
+        monthly_waste = 0
+        annual_savings = 0
+        
+        # Quick wins (based on resource count, not fictional costs)
+        quick_wins = []
+        if len(orphaned_resources) > 5:
+            quick_wins.append({
+                'action': f'Delete {len(orphaned_resources)} orphaned {RESOURCE_TYPES.get(resource_type, {}).get("name", "resources")}',
+                'savings': 'Cost data requires Azure Cost Management integration'
+            })
+        
+        result['cost_impact'] = {
             'monthly_waste': round(monthly_waste, 2),
             'annual_savings': round(annual_savings, 2),
             'quick_wins': quick_wins
-        },
-        'risk_assessment': {
+        }
+    
+    if 'risk_assessment' in wanted:
+        risk_level = 'Low'
+        risk_items = []
+        
+        if resource_type in ['nsgs', 'route-tables'] and len(orphaned_resources) > 5:
+            risk_level = 'High'
+            risk_items.append(f'{len(orphaned_resources)} orphaned network security resources could impact security posture')
+        elif resource_type == 'nics' and len(orphaned_resources) > 10:
+            risk_level = 'Medium'
+            risk_items.append(f'{len(orphaned_resources)} orphaned NICs indicate potential VM cleanup needed')
+        elif cost_per_resource == 0 and len(orphaned_resources) > 15:
+            risk_level = 'Low'
+            risk_items.append(f'{len(orphaned_resources)} orphaned resources (no direct cost, hygiene improvement)')
+        
+        result['risk_assessment'] = {
             'level': risk_level,
             'items': risk_items
-        },
-        'action_priorities': action_priorities,
-        'benchmarks': benchmarks,
-        'recommendations': recommendations,
-        'location_stats': [
+        }
+    
+    if 'location_stats' in wanted:
+        # Group by location
+        location_stats = {
+            loc: {'total': total, 'orphaned': orphaned, 'active': total - orphaned, 'cost': orphaned * cost_per_resource}
+            for loc, (total, orphaned) in type_analysis['locations'].items()
+        }
+        result['location_stats'] = [
             {
                 'Location': loc, 
                 'Total': stats['total'], 
@@ -1982,8 +2385,23 @@ def analyze_generic_resource_type(resource_type, resources_data):
                 'Active': stats['active']
             }
             for loc, stats in sorted(location_stats.items(), key=lambda x: x[1]['orphaned'], reverse=True)
-        ],
-        'resource_group_stats': [
+        ]
+    
+    if wanted & {'resource_group_stats', 'benchmarks', 'recommendations', 'action_priorities'}:
+        # Group by resource group with orphan rates for benchmarking
+        rg_stats = {
+            rg: {'total': total, 'orphaned': orphaned, 'active': total - orphaned,
+                 'orphan_rate': round((orphaned / total) * 100, 1)}
+            for rg, (total, orphaned) in type_analysis['resource_groups'].items()
+        }
+        
+        # Identify best and worst performing RGs
+        rg_list = [(rg, stats) for rg, stats in rg_stats.items() if stats['total'] >= 3]
+        best_rg = min(rg_list, key=lambda x: x[1]['orphan_rate']) if rg_list else None
+        worst_rg = max(rg_list, key=lambda x: x[1]['orphan_rate']) if rg_list else None
+    
+    if 'resource_group_stats' in wanted:
+        result['resource_group_stats'] = [
             {
                 'ResourceGroup': rg, 
                 'Total': stats['total'], 
@@ -1992,8 +2410,57 @@ def analyze_generic_resource_type(resource_type, resources_data):
                 'OrphanRate': f"{stats['orphan_rate']}%"
             }
             for rg, stats in sorted(rg_stats.items(), key=lambda x: (x[1]['orphaned'], x[1]['orphan_rate']), reverse=True)[:10]
-        ],
-        'orphaned_resources': [
+        ]
+    
+    if wanted & {'recommendations', 'action_priorities'}:
+        # Generate recommendations with enhanced intelligence
+        recommendations = generate_enhanced_recommendations(
+            resource_type, resources_data, orphaned_resources, 
+            cost_per_resource, rg_stats, worst_rg, type_analysis
+        )
+        if 'recommendations' in wanted:
+            result['recommendations'] = recommendations
+    
+    if 'action_priorities' in wanted:
+        # Action Priority Matrix
+        action_priorities = {
+            'urgent': [],  # >$500/month or critical security
+            'high': [],    # $100-$500/month or significant waste
+            'low': []      # <$100/month or hygiene
+        }
+        
+        for rec in recommendations:
+            priority_level = rec.get('priority', 'Low')
+            action_item = {
+                'title': rec['resource'],
+                'action': rec['suggestion'],
+                'savings': rec.get('potential_saving', 'N/A')
+            }
+            
+            if priority_level == 'Critical':
+                action_priorities['urgent'].append(action_item)
+            elif priority_level == 'High':
+                action_priorities['high'].append(action_item)
+            else:
+                action_priorities['low'].append(action_item)
+        
+        result['action_priorities'] = action_priorities
+    
+    if 'benchmarks' in wanted:
+        # Internal Benchmarks: average across all resource groups for internal comparison
+        rg_orphan_rates = [stats['orphan_rate'] for stats in rg_stats.values() if stats['total'] >= 3]
+        avg_rg_orphan_rate = round(sum(rg_orphan_rates) / len(rg_orphan_rates), 1) if rg_orphan_rates else avg_orphan_rate
+        
+        result['benchmarks'] = {
+            'your_orphan_rate': avg_orphan_rate,
+            'avg_rg_orphan_rate': avg_rg_orphan_rate,
+            'best_rg': {'name': best_rg[0], 'rate': best_rg[1]['orphan_rate']} if best_rg else None,
+            'worst_rg': {'name': worst_rg[0], 'rate': worst_rg[1]['orphan_rate']} if worst_rg else None,
+            'total_rg_count': len(rg_stats)
+        }
+    
+    if 'orphaned_resources' in wanted:
+        result['orphaned_resources'] = [
             {
                 'name': format_resource_display_name(r, resource_type),
                 'resource_group': r.get('resource_group', 'Unknown'),
@@ -2001,13 +2468,24 @@ def analyze_generic_resource_type(resource_type, resources_data):
                 'id': r.get('id', '')
             }
             for r in orphaned_resources  # All orphaned resources
-        ],
-        'resource_details': resources_data[:50]  # Top 50 resources
-    }
+        ]
+    
+    if 'resource_details' in wanted:
+        result['resource_details'] = resources_data[:50]  # Top 50 resources
+    
+    return result
 
-def generate_enhanced_recommendations(resource_type, all_resources, orphaned_resources, cost_per_resource, rg_stats, worst_rg):
-    """Generate recommendations based on resource analysis (without fictional cost estimates)"""
+def generate_enhanced_recommendations(resource_type, all_resources, orphaned_resources, cost_per_resource, rg_stats, worst_rg,
+                                      type_analysis=None):
+    """
+    Generate recommendations based on resource analysis (without fictional cost estimates).
+    Record filters are vectorized over one field column at a time; per-location counts come
+    from `type_analysis`, the scan_analysis result for `all_resources` (computed if not given).
+    """
     recommendations = []
+    field_values = scan_analysis.field_values
+    if type_analysis is None:
+        type_analysis = scan_analysis.analyze_type(all_resources)
     
     if orphaned_resources:
         # Determine priority based on resource type criticality
@@ -2035,11 +2513,12 @@ def generate_enhanced_recommendations(resource_type, all_resources, orphaned_res
     # Resource type-specific recommendations (without fictional costs)
     if resource_type == 'sql-databases':
         # Elastic pool optimization
-        pools = [r for r in all_resources if 'elastic' in r.get('name', '').lower() or 'pool' in r.get('name', '').lower()]
-        if pools:
+        names = field_values(all_resources, 'name', '').str.lower()
+        pool_count = int((names.str.contains('elastic', regex=False, na=False) | names.str.contains('pool', regex=False, na=False)).sum())
+        if pool_count:
             recommendations.append({
                 'type': 'sql_optimization',
-                'resource': f"{len(pools)} SQL Elastic Pools",
+                'resource': f"{pool_count} SQL Elastic Pools",
                 'current_state': "Elastic pools detected",
                 'suggestion': "Review DTU/vCore usage over 30 days using Azure Monitor. Downgrade tier if consistently <50% utilized",
                 'potential_saving': 'Check Azure Cost Management for actual usage costs',
@@ -2048,12 +2527,7 @@ def generate_enhanced_recommendations(resource_type, all_resources, orphaned_res
             })
         
         # Multiple databases in same region
-        by_location = {}
-        for r in all_resources:
-            loc = r.get('location', 'Unknown')
-            by_location[loc] = by_location.get(loc, 0) + 1
-        
-        high_density_locs = [loc for loc, count in by_location.items() if count > 5]
+        high_density_locs = [loc for loc, (count, _) in type_analysis['locations'].items() if count > 5]
         if high_density_locs:
             recommendations.append({
                 'type': 'sql_consolidation',
@@ -2067,11 +2541,11 @@ def generate_enhanced_recommendations(resource_type, all_resources, orphaned_res
     
     elif resource_type == 'virtual-machines':
         # Stopped/deallocated VMs
-        stopped_vms = [r for r in all_resources if r.get('power_state') in ['stopped', 'deallocated', 'Stopped', 'Deallocated']]
-        if stopped_vms:
+        stopped_count = int(field_values(all_resources, 'power_state').isin(['stopped', 'deallocated', 'Stopped', 'Deallocated']).sum())
+        if stopped_count:
             recommendations.append({
                 'type': 'vm_cleanup',
-                'resource': f"{len(stopped_vms)} Stopped/Deallocated VMs",
+                'resource': f"{stopped_count} Stopped/Deallocated VMs",
                 'current_state': "VMs stopped but still incurring storage costs",
                 'suggestion': "Delete VMs not used in 30+ days. Create disk snapshots if needed for recovery",
                 'potential_saving': 'Storage and potential compute costs - check Azure Cost Management',
@@ -2093,11 +2567,12 @@ def generate_enhanced_recommendations(resource_type, all_resources, orphaned_res
     
     elif resource_type == 'disks':
         # Unattached premium disks
-        premium_disks = [r for r in orphaned_resources if 'premium' in str(r.get('sku', '')).lower() or 'Premium' in str(r.get('sku', ''))]
-        if premium_disks:
+        skus = field_values(orphaned_resources, 'sku', '').map(str).str.lower()
+        premium_count = int(skus.str.contains('premium', regex=False).sum())
+        if premium_count:
             recommendations.append({
                 'type': 'premium_disk_cleanup',
-                'resource': f"{len(premium_disks)} Unattached Premium Disks",
+                'resource': f"{premium_count} Unattached Premium Disks",
                 'current_state': f"Premium SSD disks not attached to VMs",
                 'suggestion': "Create snapshots for backup, then delete. Premium disks cost more than Standard",
                 'potential_saving': 'Check actual costs in Azure Cost Management',
@@ -2119,11 +2594,13 @@ def generate_enhanced_recommendations(resource_type, all_resources, orphaned_res
     
     elif resource_type == 'public-ips':
         # Static IP optimization
-        static_ips = [r for r in orphaned_resources if r.get('allocation_method') == 'Static' or r.get('sku') == 'Standard']
-        if static_ips:
+        static_mask = (field_values(orphaned_resources, 'allocation_method') == 'Static') | \
+                      (field_values(orphaned_resources, 'sku') == 'Standard')
+        static_count = int(static_mask.sum())
+        if static_count:
             recommendations.append({
                 'type': 'static_ip_cleanup',
-                'resource': f"{len(static_ips)} Orphaned Static Public IPs",
+                'resource': f"{static_count} Orphaned Static Public IPs",
                 'current_state': f"Reserved IPs not associated with any resource",
                 'suggestion': "Release orphaned static IPs. Re-create as dynamic when needed if applicable",
                 'potential_saving': 'Static IPs incur charges - check Azure Cost Management',
@@ -2229,7 +2706,7 @@ def generate_enhanced_recommendations(resource_type, all_resources, orphaned_res
         })
     
     # Multi-region consolidation
-    unique_locations = len(set(r.get('location', '') for r in all_resources))
+    unique_locations = len({'' if loc is scan_analysis.MISSING else loc for loc in type_analysis['location_values']})
     if unique_locations > 3 and len(all_resources) > 15:
         recommendations.append({
             'type': 'region_consolidation',
@@ -2244,6 +2721,9 @@ def generate_enhanced_recommendations(resource_type, all_resources, orphaned_res
     return recommendations
 
 @app.route('/api/data/<resource_type>')
+@conditional_on_latest_scan(
+    applies=lambda resource_type: resource_type != 'app-service' or request.args.get('source') == 'json'
+)
 def get_data(resource_type):
     """API endpoint to get analyzed data for specific resource type"""
     
@@ -2253,31 +2733,19 @@ def get_data(resource_type):
         
         if use_json:
             # Use latest JSON scan data
-            environment_dir = app.config['ENVIRONMENT_FOLDER']
+            json_path = get_latest_scan_path()
             
-            # Filter files based on environment
-            if is_demo_mode():
-                json_files = sorted([f for f in os.listdir(environment_dir) if f.startswith(DEV_FILE_PREFIX) and f.endswith('.json')])
-            else:
-                json_files = sorted([f for f in os.listdir(environment_dir) 
-                                    if f.startswith(PROD_FILE_PREFIX) and f.endswith('.json') 
-                                    and not f.startswith(DEV_FILE_PREFIX)])
-            
-            if not json_files:
+            if not json_path:
                 return jsonify({
                     'error': 'no_data',
                     'message': 'No Azure scan data found. Please run a scan from the Overview page first.'
                 }), 404
             
-            # Load latest JSON scan
-            latest_json = json_files[-1]
-            json_path = os.path.join(environment_dir, latest_json)
+            latest_json = os.path.basename(json_path)
             
             try:
-                with open(json_path, 'r') as f:
-                    scan_data = json.load(f)
-                
-                plans_data = scan_data.get('resources', {}).get('app_service_plans', [])
+                scan_date, plans_analysis = get_type_analysis(json_path, 'app_service_plans')
+                plans_data = plans_analysis['resources']
                 
                 if not plans_data:
                     return jsonify({
@@ -2285,151 +2753,13 @@ def get_data(resource_type):
                         'message': 'No App Service Plans found in the scan data.'
                     }), 404
                 
-                # Convert JSON to DataFrame format
-                df = convert_json_to_app_service_dataframe(plans_data)
-                
-                # Parse pricing tiers
-                df[['TIER_NAME', 'SKU', 'INSTANCES']] = df['PRICING TIER'].apply(
-                    lambda x: pd.Series(parse_pricing_tier(x))
-                )
-                
-                # Run analysis
-                total_instances = df['INSTANCES'].sum()
-                total_apps = df['APPS'].sum()
-                total_plans = len(df)
-                
-                # Generate all statistics
-                tier_stats = df.groupby(['SKU', 'OPERATING SYSTEM']).agg({
-                    'NAME': 'count',
-                    'APPS': 'sum',
-                    'INSTANCES': 'sum'
-                }).reset_index()
-                tier_stats.columns = ['Tier', 'OS', 'Plans', 'Apps', 'Instances']
-                tier_stats = tier_stats.sort_values(['Tier', 'OS'], ascending=[False, True])
-                
-                location_stats = df.groupby('LOCATION').agg({
-                    'NAME': 'count',
-                    'APPS': 'sum',
-                    'INSTANCES': 'sum'
-                }).reset_index()
-                location_stats.columns = ['Location', 'Plans', 'Apps', 'Instances']
-                location_stats = location_stats.sort_values('Plans', ascending=False)
-                
-                os_stats = df.groupby('OPERATING SYSTEM').agg({
-                    'NAME': 'count',
-                    'APPS': 'sum'
-                }).reset_index()
-                os_stats.columns = ['OS', 'Plans', 'Apps']
-                
-                rg_stats = df.groupby('RESOURCE GROUP').agg({
-                    'NAME': 'count',
-                    'APPS': 'sum',
-                    'INSTANCES': 'sum'
-                }).reset_index()
-                rg_stats.columns = ['ResourceGroup', 'Plans', 'Apps', 'Instances']
-                rg_stats = rg_stats.sort_values('Plans', ascending=False).head(10)
-                
-                # Identify orphaned plans (plans with 0 apps)
-                orphaned_plans = df[df['APPS'] == 0]
-                active_plans = df[df['APPS'] > 0]
-                
-                # Generate recommendations
-                recommendations = generate_app_service_recommendations(df)
-                
-                # Calculate density metrics
-                density_metrics = calculate_app_service_density(df)
-                
-                # Cost calculations disabled - requires Azure Cost Management integration
-                monthly_waste = 0
-                annual_savings = 0
-                
-                # Convert recommendations to generic dashboard format
-                generic_recommendations = []
-                for rec in recommendations:
-                    generic_recommendations.append({
-                        'type': rec.get('type', 'optimization'),
-                        'resource': rec.get('resource', 'App Service Plan'),
-                        'current_state': rec.get('current_state', 'Needs review'),
-                        'suggestion': rec.get('suggestion', 'Review configuration'),
-                        'potential_saving': rec.get('potential_saving', 'N/A'),
-                        'priority': rec.get('priority', 'Medium'),
-                        'impact': rec.get('impact', 'Cost optimization')
-                    })
-                
-                # Prepare location stats in generic format
-                location_stats_list = []
-                for _, row in location_stats.iterrows():
-                    location_stats_list.append({
-                        'Location': row['Location'],
-                        'Total': int(row['Plans']),
-                        'Orphaned': 0,  # Will be calculated if needed
-                        'Active': int(row['Plans'])
-                    })
-                
-                # Prepare resource group stats in generic format
-                rg_stats_list = []
-                for _, row in rg_stats.iterrows():
-                    rg_stats_list.append({
-                        'ResourceGroup': row['ResourceGroup'],
-                        'Total': int(row['Plans']),
-                        'Orphaned': 0,  # Will be calculated if needed
-                        'Active': int(row['Plans']),
-                        'OrphanRate': '0%'
-                    })
-                
-                # Prepare orphaned resources list
-                orphaned_resources_list = []
-                for _, plan in orphaned_plans.iterrows():
-                    orphaned_resources_list.append({
-                        'name': plan['NAME'],
-                        'resource_group': plan['RESOURCE GROUP'],
-                        'location': plan['LOCATION'],
-                        'id': plan.get('ID', '')
-                    })
-                
-                # Return data in generic dashboard format
-                return jsonify({
-                    'summary': {
-                        'total_resources': int(total_plans),
-                        'orphaned_count': len(orphaned_plans),
-                        'active_count': len(active_plans),
-                        'orphaned_percentage': round((len(orphaned_plans) / total_plans * 100) if total_plans > 0 else 0, 1)
-                    },
-                    'cost_impact': {
-                        'monthly_waste': round(monthly_waste, 2),
-                        'annual_savings': round(annual_savings, 2),
-                        'quick_wins': [
-                            {
-                                'action': f'Delete {len(orphaned_plans)} orphaned App Service Plans',
-                                'savings': f'${monthly_waste:.0f}/month'
-                            }
-                        ] if len(orphaned_plans) > 0 else []
-                    },
-                    'risk_assessment': {
-                        'level': 'Low',
-                        'items': []
-                    },
-                    'action_priorities': {
-                        'urgent': [],
-                        'high': [],
-                        'low': []
-                    },
-                    'benchmarks': {
-                        'your_orphan_rate': round((len(orphaned_plans) / total_plans * 100) if total_plans > 0 else 0, 1),
-                        'avg_rg_orphan_rate': 0,
-                        'best_rg': None,
-                        'worst_rg': None,
-                        'total_rg_count': len(rg_stats_list)
-                    },
-                    'recommendations': generic_recommendations,
-                    'location_stats': location_stats_list,
-                    'resource_group_stats': rg_stats_list,
-                    'orphaned_resources': orphaned_resources_list,
-                    'resource_details': [],
-                    'scan_file': latest_json,
-                    'scan_date': scan_data.get('timestamp', 'Unknown')
-                })
+                analysis_result = analyze_app_service_scan(plans_data, parse_sections(TYPE_ANALYSIS_SECTIONS))
+                analysis_result['scan_file'] = latest_json
+                analysis_result['scan_date'] = scan_date or 'Unknown'
+                return jsonify(analysis_result)
                 
+            except ValueError as e:
+                return jsonify({'error': 'invalid_request', 'message': str(e)}), 400
             except Exception as e:
                 return jsonify({
                     'error': 'analysis_error',
@@ -2459,75 +2789,56 @@ def get_generic_resource_data(resource_type):
     """Generic handler for all other resource types"""
     if resource_type in RESOURCE_TYPES:
         # Use JSON data from Azure scan
-        environment_dir = app.config['ENVIRONMENT_FOLDER']
-        
-        # Filter files based on environment
-        if is_demo_mode():
-            json_files = sorted([f for f in os.listdir(environment_dir) if f.startswith(DEV_FILE_PREFIX) and f.endswith('.json')])
-        else:
-            json_files = sorted([f for f in os.listdir(environment_dir) 
-                                if f.startswith(PROD_FILE_PREFIX) and f.endswith('.json') 
-                                and not f.startswith(DEV_FILE_PREFIX)])
+        json_path = get_latest_scan_path()
         
-        if not json_files:
+        if not json_path:
             return jsonify({
                 'error': 'no_data',
                 'message': 'No Azure scan data found. Please run a scan from the Overview page first.'
             }), 404
         
-        # Load latest JSON scan
-        latest_json = json_files[-1]
-        json_path = os.path.join(environment_dir, latest_json)
+        latest_json = os.path.basename(json_path)
         
         try:
-            with open(json_path, 'r') as f:
-                scan_data = json.load(f)
-            
-            # Map resource type to JSON key
-            resource_key_mapping = {
-                'sql-databases': 'sql_servers',
-                'virtual-machines': 'virtual_machines',
-                'public-ips': 'public_ips',
-                'disks': 'disks',
-                'nics': 'network_interfaces',
-                'load-balancers': 'load_balancers',
-                'availability-sets': 'availability_sets',
-                'route-tables': 'route_tables',
-                'nat-gateways': 'nat_gateways',
-                'frontdoor-waf': 'frontdoor_waf_policies',
-                'traffic-manager': 'traffic_manager_profiles',
-                'subnets': 'subnets',
-                'ip-groups': 'ip_groups',
-                'private-dns': 'private_dns_zones',
-                'private-endpoints': 'private_endpoints',
-                'vnet-gateways': 'virtual_network_gateways',
-                'ddos-plans': 'ddos_protection_plans',
-                'api-connections': 'api_connections',
-                'certificates': 'certificates',
-                'storage-accounts': 'storage_accounts',
-                'nsgs': 'network_security_groups'
-            }
-            
-            json_key = resource_key_mapping.get(resource_type)
-            if not json_key:
+            json_key = RESOURCE_JSON_KEYS.get(resource_type)
+            if not json_key or resource_type == 'app-service':
                 return jsonify({'error': 'Invalid resource type'}), 400
             
-            resources_data = scan_data.get('resources', {}).get(json_key, [])
+            # Sparse fieldsets: only the requested sections are computed
+            sections = parse_sections(TYPE_ANALYSIS_SECTIONS)
+            fields = parse_sections(scan_analysis.ORPHAN_LISTING_FIELDS, 'fields') or scan_analysis.ORPHAN_LISTING_FIELDS
+            wants_orphans = sections is None or 'orphaned_resources' in sections
+            
+            # Memoized per-type pass; reads just this type unless the whole scan is already analyzed
+            scan_date, type_analysis = get_type_analysis(json_path, json_key)
             
-            # Analyze resources
-            analysis_result = analyze_generic_resource_type(resource_type, resources_data)
+            # Analyze resources (the orphan list comes from the store when a page was asked for)
+            if wants_orphans and wants_orphan_page():
+                sections = [s for s in sections or TYPE_ANALYSIS_SECTIONS if s != 'orphaned_resources']
+            analysis_result = analyze_generic_resource_type(resource_type, type_analysis['resources'], type_analysis, sections)
             
             if 'error' in analysis_result:
                 return jsonify(analysis_result), 404
             
+            if wants_orphans and wants_orphan_page():
+                # Replace the full orphan list with one indexed page
+                ensure_scan_ingested(json_path)
+                page = get_orphan_listing_page(latest_json, json_key, resource_type, fields)
+                analysis_result['orphaned_resources'] = page.pop('resources')
+                analysis_result['orphaned_resources_page'] = page
+            elif 'orphaned_resources' in analysis_result:
+                analysis_result['orphaned_resources'] = [select_fields(r, fields) for r in analysis_result['orphaned_resources']]
+            
             # Add metadata
             analysis_result['data_source'] = 'azure_scan'
             analysis_result['scan_file'] = latest_json
-            analysis_result['scan_date'] = scan_data.get('timestamp', 'Unknown')
+            analysis_result['scan_date'] = scan_date or 'Unknown'
             analysis_result['resource_type_name'] = RESOURCE_TYPES[resource_type]['name']
             
             return jsonify(analysis_result)
             
+        except ValueError as e:
+            return jsonify({'error': 'invalid_request', 'message': str(e)}), 400
         except Exception as e:
             return jsonify({
                 'error': 'analysis_error',
@@ -2536,12 +2847,456 @@ def get_generic_resource_data(resource_type):
     
     return jsonify({'error': 'Invalid resource type'}), 400
 
-@app.route('/api/export/recommendations/<resource_type>')
-def export_recommendations(resource_type):
-    """Export recommendations as JSON"""
-    # This would be implemented similar to get_data but only return recommendations
-    return jsonify({'status': 'not_implemented'})
+# Scan-wide sections, each projected from the scan's resources
+SCAN_ANALYSIS_SECTIONS = {
+    'orphan_counts': scan_analysis.orphan_counts,
+    'complete_resources': scan_analysis.complete_resources,
+    'availability': scan_analysis.availability,
+    'orphan_details': scan_analysis.orphan_details
+}
 
+def analyze_resource_type(resource_type, type_analysis, sections=None):
+    """Run the dashboard analysis for one resource type (URL slug) from its single-pass analysis"""
+    if resource_type == 'app-service' and type_analysis['resources']:
+        return analyze_app_service_scan(type_analysis['resources'], sections)
+    return analyze_generic_resource_type(resource_type, type_analysis['resources'], type_analysis, sections)
+
+@app.route('/api/analysis')
+@limiter.limit("30 per minute")  # Limit analysis requests
+@conditional_on_latest_scan()
+def get_analysis():
+    """
+    Batch API endpoint: parses the latest scan once and returns the requested sections for
+    every requested type, e.g. /api/analysis?types=disks,nics&sections=summary,resource_group_stats.
+    Scan-wide sections (orphan_counts, complete_resources, availability, orphan_details) can be
+    requested alongside; types default to all dashboards when a per-type section is requested.
+    """
+    types = [t for t in request.args.get('types', '').split(',') if t] or list(RESOURCE_JSON_KEYS)
+    sections = [s for s in request.args.get('sections', '').split(',') if s] or list(TYPE_ANALYSIS_SECTIONS)
+    
+    unknown_types = [t for t in types if t not in RESOURCE_JSON_KEYS]
+    if unknown_types:
+        return jsonify({'error': f'Invalid resource types: {", ".join(unknown_types)}'}), 400
+    unknown_sections = [s for s in sections if s not in TYPE_ANALYSIS_SECTIONS and s not in SCAN_ANALYSIS_SECTIONS]
+    if unknown_sections:
+        return jsonify({'error': f'Invalid sections: {", ".join(unknown_sections)}'}), 400
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({
+                'error': 'no_data',
+                'message': 'No Azure scan data found. Please run a scan from the Overview page first.'
+            }), 404
+        
+        # Every section below is a projection of the one memoized pass over the scan
+        analysis = get_scan_analysis(latest_file)
+        types_analysis = analysis['types']
+        
+        result = {
+            'scan_file': os.path.basename(latest_file),
+            'scan_date': analysis['timestamp'] or 'Unknown'
+        }
+        
+        for section in sections:
+            if section in SCAN_ANALYSIS_SECTIONS:
+                result[section] = SCAN_ANALYSIS_SECTIONS[section](types_analysis)
+        
+        type_sections = [s for s in sections if s in TYPE_ANALYSIS_SECTIONS]
+        if type_sections:
+            result['types'] = {}
+            for resource_type in types:
+                type_analysis = types_analysis.get(RESOURCE_JSON_KEYS[resource_type]) or scan_analysis.analyze_type([])
+                dashboard = analyze_resource_type(resource_type, type_analysis, type_sections)
+                type_result = {section: dashboard.get(section) for section in type_sections}
+                if 'info_message' in dashboard:
+                    type_result['info_message'] = dashboard['info_message']
+                result['types'][resource_type] = type_result
+        
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/<resource_type>/resources')
+@conditional_on_latest_scan()
+def get_data_resources(resource_type):
+    """API endpoint to query resources of one type from the latest scan with indexed filters"""
+    json_key = RESOURCE_JSON_KEYS.get(resource_type)
+    if not json_key:
+        return jsonify({'error': 'Invalid resource type'}), 400
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({
+                'error': 'no_data',
+                'message': 'No Azure scan data found. Please run a scan from the Overview page first.'
+            }), 404
+        
+        scan = ensure_scan_ingested(latest_file)
+        
+        orphaned = request.args.get('orphaned')
+        resources = scan_store.get_resources(
+            app.config['SCAN_DB_PATH'], scan['scan_id'], json_key,
+            is_orphaned=None if orphaned is None else orphaned.lower() == 'true',
+            resource_group=request.args.get('resource_group'),
+            location=request.args.get('location')
+        )
+        
+        return jsonify({
+            'resource_type': resource_type,
+            'count': len(resources),
+            'resources': resources,
+            'scan_file': scan['scan_id'],
+            'scan_date': scan.get('timestamp') or 'Unknown'
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/resource')
+def get_resource():
+    """API endpoint to look up a single resource in the latest scan by its Azure resource ID"""
+    resource_id = request.args.get('id')
+    if not resource_id:
+        return jsonify({'error': 'Missing id parameter'}), 400
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
+        
+        scan = ensure_scan_ingested(latest_file)
+        match = scan_store.get_resource_by_id(app.config['SCAN_DB_PATH'], scan['scan_id'], resource_id)
+        if not match:
+            return jsonify({'error': 'Resource not found'}), 404
+        
+        return jsonify({
+            'resource_type': match['type'],
+            'resource': match['resource'],
+            'scan_file': scan['scan_id']
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/query')
+@limiter.limit("60 per minute")
+@conditional_on_latest_scan()
+def query_resources():
+    """
+    API endpoint to run an ad-hoc filter expression (see resource_query) over the latest scan,
+    across all types or within `type`. Paged in scan order with `limit` and `cursor`.
+    """
+    query = request.args.get('q', '')
+    resource_type = request.args.get('type')
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
+        
+        if resource_type:
+            type_filter = ('cmp', 'type', '=', RESOURCE_JSON_KEYS.get(resource_type, resource_type))
+            tree = ('and', type_filter, resource_query.parse(query)) if query.strip() else type_filter
+        else:
+            tree = resource_query.parse(query)
+        condition, params = resource_query.compile_query(tree, type_aliases=RESOURCE_JSON_KEYS)
+        limit = min(max(request.args.get('limit', DEFAULT_ORPHAN_PAGE_SIZE, type=int), 1), MAX_ORPHAN_PAGE_SIZE)
+        scan = ensure_scan_ingested(latest_file)
+        page = scan_store.query_resources(
+            app.config['SCAN_DB_PATH'], scan['scan_id'], condition, params,
+            cursor=request.args.get('cursor'), limit=limit
+        )
+        
+        return jsonify({
+            'query': query,
+            'count': page['count'],
+            'limit': limit,
+            'next_cursor': page['next_cursor'],
+            'resources': [{'resource_type': m['type'], 'resource': m['resource']} for m in page['resources']],
+            'scan_file': scan['scan_id'],
+            'scan_date': scan.get('timestamp') or 'Unknown'
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/search')
+@limiter.limit("600 per minute")  # Typeahead sends a request per keystroke
+@conditional_on_latest_scan()
+def search_resources():
+    """API endpoint for typeahead search over resource names and IDs in the latest scan"""
+    query = request.args.get('q', '')
+    resource_type = request.args.get('type')
+    if resource_type and resource_type in RESOURCE_JSON_KEYS:
+        resource_type = RESOURCE_JSON_KEYS[resource_type]
+    limit = min(max(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), 1), MAX_SEARCH_LIMIT)
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
+        
+        scan = ensure_scan_ingested(latest_file)
+        matches = scan_store.search_resources(
+            app.config['SCAN_DB_PATH'], scan['scan_id'], query, resource_type=resource_type, limit=limit
+        )
+        
+        return jsonify({
+            'query': query,
+            'results': [{'resource_type': m.pop('type'), **m} for m in matches],
+            'scan_file': scan['scan_id']
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/graph/propagated-orphans')
+@conditional_on_latest_scan()
+def get_propagated_orphans():
+    """
+    API endpoint listing resources of the latest scan that are orphaned through their users
+    (e.g. a NIC whose only VM is deallocated), with the orphaned users. Optionally within `type`.
+    """
+    resource_type = request.args.get('type')
+    if resource_type and resource_type in RESOURCE_JSON_KEYS:
+        resource_type = RESOURCE_JSON_KEYS[resource_type]
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
+        
+        graph, propagated = get_scan_graph(latest_file)
+        resources = []
+        for node, depth in propagated.items():
+            resource = graph.describe(node)
+            if resource_type and resource['resource_type'] != resource_type:
+                continue
+            resource['depth'] = depth
+            resource['orphaned_users'] = [graph.describe(user) for user in graph.used_by.get(node, [])]
+            resources.append(resource)
+        
+        return jsonify({
+            'count': len(resources),
+            'resources': resources,
+            'scan_file': os.path.basename(latest_file)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/graph/blast-radius')
+@conditional_on_latest_scan()
+def get_blast_radius():
+    """
+    API endpoint for the blast radius of a resource in the latest scan: what it uses,
+    everything that uses it directly or through other resources (up to `depth` hops), and
+    what removing it would leave orphaned.
+    """
+    resource_id = request.args.get('id')
+    if not resource_id:
+        return jsonify({'error': 'Missing id parameter'}), 400
+    max_depth = min(max(request.args.get('depth', resource_graph.MAX_BLAST_RADIUS_DEPTH, type=int), 1),
+                    resource_graph.MAX_BLAST_RADIUS_DEPTH)
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
+        
+        graph, propagated = get_scan_graph(latest_file)
+        node = graph.node(resource_id, add=False)
+        if node is None or (node not in graph.records and node not in graph.uses and node not in graph.used_by):
+            return jsonify({'error': 'Resource not found'}), 404
+        
+        reached, truncated = resource_graph.blast_radius(graph, node, max_depth)
+        resource = graph.describe(node)
+        resource['orphaned_through_users'] = node in propagated
+        
+        def with_depth(other, depth):
+            return {**graph.describe(other), 'depth': depth}
+        
+        return jsonify({
+            'resource': resource,
+            'uses': [graph.describe(used) for used in graph.uses.get(node, [])],
+            'blast_radius': [with_depth(user, depth) for user, depth in reached],
+            'count': len(reached),
+            'truncated': truncated,
+            'orphaned_by_removal': [with_depth(used, depth) for used, depth in resource_graph.orphaned_by_removal(graph, node)],
+            'scan_file': os.path.basename(latest_file)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def resolve_scan_path(filename):
+    """Get the path of a named scan in the current mode, or None if the name is invalid"""
+    prefix = DEV_FILE_PREFIX if is_demo_mode() else PROD_FILE_PREFIX
+    if not filename.startswith(prefix) or not filename.endswith('.json'):
+        return None
+    if '..' in filename or '/' in filename or '\\' in filename:
+        return None
+    
+    filepath = os.path.join(app.config['ENVIRONMENT_FOLDER'], filename)
+    return filepath if os.path.exists(filepath) else None
+
+def get_scan_diff():
+    """Diff the scans named in the request (default: the latest scan against the one before it)"""
+    to_path = resolve_scan_path(request.args['to']) if request.args.get('to') else get_latest_scan_path()
+    if not to_path:
+        return None
+    to_scan = os.path.basename(to_path)
+    
+    if request.args.get('from'):
+        from_path = resolve_scan_path(request.args['from'])
+    else:
+        prefix = DEV_FILE_PREFIX if is_demo_mode() else PROD_FILE_PREFIX
+        older = sorted(f for f in os.listdir(app.config['ENVIRONMENT_FOLDER'])
+                       if f.startswith(prefix) and f.endswith('.json') and f < to_scan)
+        from_path = os.path.join(app.config['ENVIRONMENT_FOLDER'], older[-1]) if older else None
+    if not from_path:
+        return None
+    
+    resource_types = sorted(set(scan_io.get_resource_types(from_path)) | set(scan_io.get_resource_types(to_path)))
+    requested = request.args.get('types')
+    if requested:
+        resource_types = [t for t in resource_types if t in requested.split(',')]
+    
+    data_dir = app.config['ENVIRONMENT_FOLDER']
+    return scan_diff.diff_scans(
+        os.path.basename(from_path), to_scan, resource_types,
+        lambda scan_id, resource_key: iter_diff_resources(os.path.join(data_dir, scan_id), resource_key),
+        count_resources=lambda scan_id, resource_key: count_scan_resources(os.path.join(data_dir, scan_id), resource_key),
+        versions=(get_scan_identity(from_path), get_scan_identity(to_path))
+    )
+
+def iter_diff_resources(filepath, resource_key):
+    """
+    One type of a scan for diffing. Ingested scans are streamed from the store with only the
+    normalized columns (the diff needs nothing else); others are read from the file.
+    """
+    db_path = app.config['SCAN_DB_PATH']
+    scan_id = os.path.basename(filepath)
+    if scan_store.get_scan(db_path, scan_id) is None:
+        return scan_io.read_resource_type(filepath, resource_key)
+    return (resource for _, resource in scan_store.iter_resources(db_path, scan_id, resource_key, normalized_only=True))
+
+def count_scan_resources(filepath, resource_key):
+    """Record count of one type from the scan's index"""
+    entry = scan_io.get_scan_index(filepath)['types'].get(resource_key)
+    # Indexes rebuilt from non-ASCII files carry no counts; the count only picks the side kept in memory
+    return (entry or {}).get('count') or 0
+
+@app.route('/api/diff')
+@limiter.limit("30 per minute")  # Limit analysis requests
+def get_diff():
+    """API endpoint to compare two scans: new orphans, cleaned-up orphans and state flips"""
+    try:
+        diff = get_scan_diff()
+        if diff is None:
+            return jsonify({'error': 'Two scans are needed to compute a diff'}), 404
+        return jsonify(diff)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+DIFF_EXPORT_FIELDS = ['resource_type', 'change', 'name', 'resource_group', 'location', 'id']
+
+@app.route('/api/diff/export')
+@limiter.limit("30 per minute")  # Limit export requests
+def export_diff():
+    """Stream the changed resources between two scans as CSV"""
+    try:
+        diff = get_scan_diff()
+        if diff is None:
+            return jsonify({'error': 'Two scans are needed to compute a diff'}), 404
+        
+        filename = f"scan_diff_{diff['from_scan'][:-5]}_to_{diff['to_scan'][:-5]}.csv"
+        return Response(scan_export.stream_rows(scan_diff.iter_diff_rows(diff), 'csv', DIFF_EXPORT_FIELDS),
+                        mimetype=scan_export.EXPORT_FORMATS['csv'],
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def iter_recommendation_rows(filepath, resource_types):
+    """Yield the recommendations of each resource type (URL slug), analyzing one type at a time"""
+    for resource_type in resource_types:
+        _, type_analysis = get_type_analysis(filepath, RESOURCE_JSON_KEYS[resource_type])
+        for recommendation in analyze_resource_type(resource_type, type_analysis).get('recommendations', []):
+            yield {'resource_type': resource_type, **recommendation}
+
+@app.route('/api/export/<dataset>')
+@app.route('/api/export/<dataset>/<resource_type>')
+@limiter.limit("30 per minute")  # Limit export requests
+def export_dataset(dataset, resource_type=None):
+    """
+    Stream an export of the latest scan: orphans, inventory or recommendations, as CSV or NDJSON
+    (?format=), for one resource type or all of them. Rows are generated and sent in chunks,
+    so large exports start downloading immediately.
+    """
+    export_format = request.args.get('format', 'csv')
+    if dataset not in ('orphans', 'inventory', 'recommendations'):
+        return jsonify({'error': 'Invalid export, expected orphans, inventory or recommendations'}), 404
+    if export_format not in scan_export.EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format: {export_format}'}), 400
+    if resource_type is not None and resource_type not in RESOURCE_JSON_KEYS:
+        return jsonify({'error': 'Invalid resource type'}), 400
+    
+    try:
+        latest_file = get_latest_scan_path()
+        if not latest_file:
+            return jsonify({'error': 'No environment data found. Please download environment first.'}), 404
+        
+        if dataset == 'recommendations':
+            rows = iter_recommendation_rows(latest_file, [resource_type] if resource_type else list(RESOURCE_JSON_KEYS))
+            fieldnames = scan_export.RECOMMENDATION_FIELDS
+        else:
+            # Streamed straight from the store cursor
+            scan = ensure_scan_ingested(latest_file)
+            resources = scan_store.iter_resources(
+                app.config['SCAN_DB_PATH'], scan['scan_id'],
+                RESOURCE_JSON_KEYS[resource_type] if resource_type else None,
+                is_orphaned=True if dataset == 'orphans' else None
+            )
+            if dataset == 'orphans':
+                rows, fieldnames = scan_export.orphan_rows(resources), scan_export.ORPHAN_FIELDS
+            else:
+                rows, fieldnames = scan_export.inventory_rows(resources), scan_export.INVENTORY_FIELDS
+        
+        filename = f"{dataset}_{resource_type or 'all'}_{os.path.basename(latest_file)[:-5]}.{export_format}"
+        return Response(scan_export.stream_rows(rows, export_format, fieldnames),
+                        mimetype=scan_export.EXPORT_FORMATS[export_format],
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def start_background_workers():
+    """Start the per-process background threads; call once in each server worker"""
+    # Compact old scans in the background so ENVIRONMENT_FOLDER stays bounded
+    if app.config['SCAN_RETENTION_ENABLED']:
+        retention.start_retention_worker(
+            lambda: app.logger.info('Scan retention: %s', apply_scan_retention()),
+            app.config['SCAN_RETENTION_INTERVAL_MINUTES'] * 60,
+            lock_path=os.path.join(app.config['ENVIRONMENT_FOLDER'], retention.LEADER_LOCK_NAME)
+        )
+
+def preload_latest_scans():
+    """
+    Ingest, parse and analyze the latest scan of each mode. Servers call this before forking
+    workers so they start with a warm analysis cache shared copy-on-write.
+    """
+    data_dir = app.config['ENVIRONMENT_FOLDER']
+    preloaded = []
+    for mode, prefix in (('demo', DEV_FILE_PREFIX), ('production', PROD_FILE_PREFIX)):
+        scan_id = latest_scan.resolve_latest(data_dir, mode, prefix)
+        if scan_id:
+            filepath = os.path.join(data_dir, scan_id)
+            ensure_scan_ingested(filepath)
+            get_scan_analysis(filepath)
+            preloaded.append(scan_id)
+    return preloaded
 
 if __name__ == '__main__':
+    # The debug reloader re-runs this module in a child process that serves the requests;
+    # only that child starts the background workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers()
     app.run(debug=True, host='0.0.0.0', port=5000)
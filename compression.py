@@ -0,0 +1,120 @@
+"""
+Response Compression
+Negotiated gzip/brotli compression of JSON and export responses. Buffered responses are
+compressed above a size threshold, streamed ones chunk by chunk, and compressed bodies of
+ETagged responses are cached so unchanged scan data is never compressed twice.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Preferred first; brotli is only offered when the module is installed
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+DEFAULT_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def variant_etag(etag, encoding):
+    """ETag of the encoded representation; encodings must not share a strong ETag"""
+    return f'{etag}-{encoding}'
+
+
+def etag_variants(etag, accept_encodings):
+    """
+    The ETags a client may revalidate with under its Accept-Encoding: the identity one (small
+    bodies are sent uncompressed) and the variant of the encoding negotiated for the request.
+    Variants of other encodings must not match, or the client would reuse a body it cannot decode.
+    """
+    encoding = negotiate(accept_encodings)
+    return [etag] if encoding is None else [etag, variant_etag(etag, encoding)]
+
+
+def negotiate(accept_encodings):
+    """Pick the preferred encoding the client accepts, or None"""
+    return accept_encodings.best_match(ENCODINGS) if accept_encodings else None
+
+
+def _compressor(encoding, config):
+    """Return (process, finish) functions of an incremental compressor"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESSION_BROTLI_QUALITY'])
+        return compressor.process, compressor.finish
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(config['COMPRESSION_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def compress(data, encoding, config):
+    process, finish = _compressor(encoding, config)
+    return process(data) + finish()
+
+
+def iter_compressed(chunks, encoding, config):
+    """Compress a streamed body incrementally, flushing whatever each chunk produced"""
+    process, finish = _compressor(encoding, config)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        compressed = process(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+def _get_cached(key, data, encoding, config):
+    with _cache_lock:
+        body = _cache.get(key)
+        if body is not None:
+            _cache.move_to_end(key)
+            return body
+
+    body = compress(data, encoding, config)
+    with _cache_lock:
+        _cache[key] = body
+        while len(_cache) > config['COMPRESSION_CACHE_SIZE']:
+            _cache.popitem(last=False)
+    return body
+
+
+def compress_response(response, accept_encodings, config):
+    """after_request hook body: compress a response in place when it is worth it"""
+    if response.mimetype not in config['COMPRESSION_MIMETYPES']:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if 'Content-Encoding' in response.headers or response.direct_passthrough:
+        return response
+    encoding = negotiate(accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.status_code != 200:
+        return response
+    etag, _ = response.get_etag()
+
+    if response.is_streamed:
+        response.response = iter_compressed(response.response, encoding, config)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESSION_MIN_SIZE']:
+            return response
+        if etag:
+            body = _get_cached((etag, encoding), data, encoding, config)
+        else:
+            body = compress(data, encoding, config)
+        response.set_data(body)
+
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(variant_etag(etag, encoding))
+    return response
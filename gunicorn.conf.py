@@ -0,0 +1,55 @@
+"""
+Gunicorn Configuration
+Production serving: `gunicorn app:app` picks this file up from the working directory.
+The app and the latest scans are loaded once in the master process, then workers are
+forked and share the parsed snapshots copy-on-write.
+
+Tunables (environment):
+  PORT                     - port to bind (default 8000)
+  WEB_CONCURRENCY          - worker processes (default 2 x CPUs + 1, at most 8)
+  GUNICORN_THREADS         - threads per worker (default 4)
+  GUNICORN_TIMEOUT         - worker timeout in seconds (default 600; scans are slow)
+  RATELIMIT_STORAGE_URI    - limiter storage shared by the workers
+                             (default sqlite:///data/environment/ratelimits.db)
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '600'))
+graceful_timeout = 30
+keepalive = 5
+preload_app = True
+accesslog = '-'
+errorlog = '-'
+
+# Read by app.py on import, which happens in the master before any worker is forked:
+# per-process memory:// limits would give each worker its own budget.
+os.environ.setdefault('RATELIMIT_STORAGE_URI', 'sqlite:///data/environment/ratelimits.db')
+
+
+def when_ready(server):
+    """Warm the analysis cache in the master, then freeze it so workers share its pages"""
+    import app
+
+    try:
+        preloaded = app.preload_latest_scans()
+        server.log.info('Preloaded latest scans: %s', ', '.join(preloaded) or 'none')
+    except Exception as e:
+        server.log.warning('Could not preload latest scans: %s', e)
+
+    # Move everything loaded so far out of the collector's generations, so collections in
+    # the workers do not write to (and un-share) the preloaded objects
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Background threads do not survive a fork, so each worker starts its own"""
+    import app
+
+    app.start_background_workers()
@@ -0,0 +1,236 @@
+"""
+History Store
+Deduplicated snapshot history: each distinct resource record is stored once, content-addressed by hash
+"""
+
+import hashlib
+import json
+import sqlite3
+import zlib
+from contextlib import closing
+from datetime import datetime
+
+HASH_SIZE = 16
+
+# Fetch records in batches to stay under SQLite's host parameter limit
+FETCH_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    hash BLOB PRIMARY KEY,
+    body TEXT NOT NULL,
+    refcount INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS manifests (
+    hash BLOB PRIMARY KEY,
+    record_count INTEGER NOT NULL,
+    body BLOB NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    scan_id TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    subscription_id TEXT,
+    timestamp TEXT,
+    meta TEXT NOT NULL DEFAULT '{}',
+    created_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS snapshot_manifests (
+    scan_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    manifest_hash BLOB NOT NULL,
+    PRIMARY KEY (scan_id, type)
+);
+
+CREATE INDEX IF NOT EXISTS idx_snapshot_manifests_hash
+    ON snapshot_manifests (manifest_hash);
+CREATE INDEX IF NOT EXISTS idx_snapshots_mode_timestamp
+    ON snapshots (mode, timestamp);
+"""
+
+
+def get_connection(db_path):
+    """Open a connection to the history store, creating the schema if needed"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=HASH_SIZE).digest()
+
+
+def canonical_record(resource):
+    """Serialize a record canonically so identical records always hash the same"""
+    return json.dumps(resource, sort_keys=True, separators=(',', ':'))
+
+
+def _store_manifest(conn, resources_list):
+    """Store one type's record list as a manifest of record hashes, returning the manifest hash"""
+    bodies = [canonical_record(r) for r in resources_list]
+    hashes = [_digest(body.encode('utf-8')) for body in bodies]
+    packed = b''.join(hashes)
+    manifest_hash = _digest(packed)
+
+    # Unchanged resource lists map to an existing manifest and cost nothing
+    if conn.execute('SELECT 1 FROM manifests WHERE hash = ?', (manifest_hash,)).fetchone():
+        return manifest_hash, 0
+
+    cursor = conn.executemany(
+        'INSERT OR IGNORE INTO records (hash, body) VALUES (?, ?)',
+        zip(hashes, bodies)
+    )
+    new_records = cursor.rowcount
+    conn.executemany('UPDATE records SET refcount = refcount + 1 WHERE hash = ?', ((h,) for h in hashes))
+    conn.execute(
+        'INSERT INTO manifests (hash, record_count, body) VALUES (?, ?, ?)',
+        (manifest_hash, len(hashes), zlib.compress(packed))
+    )
+    return manifest_hash, new_records
+
+
+def _release_manifest(conn, manifest_hash):
+    """Drop a manifest that is no longer referenced, along with records only it used"""
+    row = conn.execute('SELECT body FROM manifests WHERE hash = ?', (manifest_hash,)).fetchone()
+    if not row:
+        return
+    hashes = _unpack_hashes(row['body'])
+    conn.executemany('UPDATE records SET refcount = refcount - 1 WHERE hash = ?', ((h,) for h in hashes))
+    conn.executemany('DELETE FROM records WHERE hash = ? AND refcount <= 0', ((h,) for h in set(hashes)))
+    conn.execute('DELETE FROM manifests WHERE hash = ?', (manifest_hash,))
+
+
+def _unpack_hashes(body):
+    packed = zlib.decompress(body)
+    return [packed[i:i + HASH_SIZE] for i in range(0, len(packed), HASH_SIZE)]
+
+
+def record_snapshot(db_path, scan_id, scan_data, mode):
+    """Add a scan to the history, storing only records not already present"""
+    resources = scan_data.get('resources', {})
+    meta = {k: v for k, v in scan_data.items() if k != 'resources'}
+    stats = {'records': 0, 'new_records': 0}
+
+    with closing(get_connection(db_path)) as conn:
+        with conn:
+            if conn.execute('SELECT 1 FROM snapshots WHERE scan_id = ?', (scan_id,)).fetchone():
+                _delete_snapshot(conn, scan_id)
+
+            conn.execute(
+                'INSERT INTO snapshots (scan_id, mode, subscription_id, timestamp, meta, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (scan_id, mode, scan_data.get('subscription_id'), scan_data.get('timestamp'),
+                 json.dumps(meta), datetime.now().isoformat())
+            )
+            for position, (resource_type, resources_list) in enumerate(resources.items()):
+                if not isinstance(resources_list, list):
+                    continue
+                manifest_hash, new_records = _store_manifest(conn, resources_list)
+                conn.execute(
+                    'INSERT INTO snapshot_manifests (scan_id, type, position, manifest_hash) VALUES (?, ?, ?, ?)',
+                    (scan_id, resource_type, position, manifest_hash)
+                )
+                stats['records'] += len(resources_list)
+                stats['new_records'] += new_records
+    return stats
+
+
+def _delete_snapshot(conn, scan_id):
+    manifest_hashes = [row['manifest_hash'] for row in conn.execute(
+        'SELECT manifest_hash FROM snapshot_manifests WHERE scan_id = ?', (scan_id,)
+    )]
+    conn.execute('DELETE FROM snapshot_manifests WHERE scan_id = ?', (scan_id,))
+    conn.execute('DELETE FROM snapshots WHERE scan_id = ?', (scan_id,))
+    for manifest_hash in set(manifest_hashes):
+        still_used = conn.execute(
+            'SELECT 1 FROM snapshot_manifests WHERE manifest_hash = ? LIMIT 1', (manifest_hash,)
+        ).fetchone()
+        if not still_used:
+            _release_manifest(conn, manifest_hash)
+
+
+def delete_snapshot(db_path, scan_id):
+    """Remove a snapshot from the history and garbage-collect records no other snapshot uses"""
+    with closing(get_connection(db_path)) as conn:
+        with conn:
+            _delete_snapshot(conn, scan_id)
+
+
+def has_snapshot(db_path, scan_id):
+    """Check whether a scan is recorded in the history"""
+    with closing(get_connection(db_path)) as conn:
+        return conn.execute('SELECT 1 FROM snapshots WHERE scan_id = ?', (scan_id,)).fetchone() is not None
+
+
+def load_snapshot(db_path, scan_id, resource_types=None):
+    """Reconstruct a full scan (or only the given resource types) from the history, or None if unknown"""
+    with closing(get_connection(db_path)) as conn:
+        snapshot = conn.execute('SELECT meta FROM snapshots WHERE scan_id = ?', (scan_id,)).fetchone()
+        if not snapshot:
+            return None
+
+        scan_data = json.loads(snapshot['meta'])
+        scan_data['resources'] = {}
+
+        rows = conn.execute(
+            'SELECT type, manifest_hash FROM snapshot_manifests WHERE scan_id = ? ORDER BY position',
+            (scan_id,)
+        ).fetchall()
+        for row in rows:
+            if resource_types is not None and row['type'] not in resource_types:
+                continue
+            manifest = conn.execute('SELECT body FROM manifests WHERE hash = ?', (row['manifest_hash'],)).fetchone()
+            hashes = _unpack_hashes(manifest['body'])
+
+            bodies = {}
+            unique_hashes = list(set(hashes))
+            for i in range(0, len(unique_hashes), FETCH_BATCH_SIZE):
+                batch = unique_hashes[i:i + FETCH_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                for record in conn.execute(f'SELECT hash, body FROM records WHERE hash IN ({placeholders})', batch):
+                    bodies[record['hash']] = record['body']
+
+            scan_data['resources'][row['type']] = [json.loads(bodies[h]) for h in hashes]
+
+    return scan_data
+
+
+def list_snapshots(db_path, mode=None):
+    """List recorded snapshots, newest first"""
+    query = ('SELECT s.scan_id, s.mode, s.subscription_id, s.timestamp, '
+             'COALESCE(SUM(m.record_count), 0) AS resource_count '
+             'FROM snapshots s '
+             'LEFT JOIN snapshot_manifests sm ON sm.scan_id = s.scan_id '
+             'LEFT JOIN manifests m ON m.hash = sm.manifest_hash ')
+    params = []
+    if mode is not None:
+        query += 'WHERE s.mode = ? '
+        params.append(mode)
+    query += 'GROUP BY s.scan_id ORDER BY s.timestamp DESC'
+
+    with closing(get_connection(db_path)) as conn:
+        return [dict(row) for row in conn.execute(query, params)]
+
+
+def get_storage_stats(db_path):
+    """Get deduplication statistics for the whole history"""
+    with closing(get_connection(db_path)) as conn:
+        snapshots = conn.execute('SELECT COUNT(*) FROM snapshots').fetchone()[0]
+        unique_records = conn.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+        referenced_records = conn.execute(
+            'SELECT COALESCE(SUM(m.record_count), 0) FROM snapshot_manifests sm '
+            'JOIN manifests m ON m.hash = sm.manifest_hash'
+        ).fetchone()[0]
+
+    return {
+        'snapshots': snapshots,
+        'unique_records': unique_records,
+        'referenced_records': referenced_records,
+        'dedup_ratio': round(referenced_records / unique_records, 2) if unique_records else 0
+    }
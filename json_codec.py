@@ -0,0 +1,95 @@
+"""
+JSON Codec
+Pluggable JSON serializer for API responses and scan files. Uses orjson when it is
+installed, which encodes numpy and pandas values natively, and falls back to the stdlib
+"""
+
+import dataclasses
+import decimal
+import json
+import os
+import uuid
+from datetime import date, datetime, time
+
+import numpy as np
+import pandas as pd
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 'orjson' or 'json'; defaults to orjson when it is available
+BACKEND = os.environ.get('JSON_BACKEND', 'orjson' if orjson else 'json')
+if BACKEND == 'orjson' and orjson is None:
+    raise ImportError("JSON_BACKEND is 'orjson' but orjson is not installed")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    """Encode values neither backend handles on its own (for the stdlib, also numpy and datetimes)"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict('records')
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Timedelta):
+        return obj.isoformat()
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(obj, sort_keys=False, indent=False):
+    """Serialize to UTF-8 bytes; `indent` pretty-prints with two spaces like json.dump(indent=2)"""
+    if BACKEND == 'orjson':
+        options = _ORJSON_OPTIONS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=options)
+
+    if indent:
+        return json.dumps(obj, default=_default, sort_keys=sort_keys, indent=2).encode('utf-8')
+    return json.dumps(obj, default=_default, sort_keys=sort_keys, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """Deserialize from bytes, bytearray, memoryview or str"""
+    if BACKEND == 'orjson':
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by this codec; keys are sorted like Flask's default provider"""
+
+    sort_keys = True
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, sort_keys=self.sort_keys) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,126 @@
+"""
+Latest Scan Pointers
+Atomically updated pointers to the latest scan per mode and per subscription,
+so endpoints can resolve the current scan without listing the scan folder
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import scan_io
+
+POINTER_PREFIX = '.latest_'
+LOCK_NAME = '.latest.lock'
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def _pointer_lock(data_dir):
+    """
+    Serialize pointer updates across threads and, through an exclusive lock file, across
+    server worker processes, so a compare-and-replace never moves a pointer back to an older
+    scan. Without fcntl (Windows, single-process servers) only threads are serialized.
+    """
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(data_dir, LOCK_NAME), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def get_pointer_path(data_dir, mode, subscription_id=None):
+    name = POINTER_PREFIX + mode
+    if subscription_id:
+        name += '_' + re.sub(r'[^A-Za-z0-9-]', '_', subscription_id)
+    return os.path.join(data_dir, name)
+
+
+def read_pointer(data_dir, mode, subscription_id=None):
+    """Read a pointer, or None if it does not exist or is unreadable"""
+    try:
+        with open(get_pointer_path(data_dir, mode, subscription_id), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_pointer(data_dir, mode, scan_id, subscription_id=None):
+    """Atomically point a mode (and optionally a subscription) at a scan"""
+    pointer_path = get_pointer_path(data_dir, mode, subscription_id)
+    pointer = {'scan_id': scan_id, 'updated_at': datetime.now().isoformat()}
+    tmp_path = f'{pointer_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(pointer, f)
+    os.replace(tmp_path, pointer_path)
+    return pointer
+
+
+def remove_pointer(data_dir, mode, subscription_id=None):
+    try:
+        os.remove(get_pointer_path(data_dir, mode, subscription_id))
+    except FileNotFoundError:
+        pass
+
+
+def update_latest(data_dir, mode, scan_id, subscription_id=None):
+    """
+    Move the mode and subscription pointers to a newly saved scan. Scan filenames embed
+    their timestamp, so the latest scan is always the one with the greatest filename.
+    """
+    with _pointer_lock(data_dir):
+        for sub in (None, subscription_id) if subscription_id else (None,):
+            current = read_pointer(data_dir, mode, sub)
+            if current is None or scan_id >= current['scan_id']:
+                write_pointer(data_dir, mode, scan_id, sub)
+
+
+def rebuild_latest(data_dir, mode, prefix, subscription_id=None):
+    """Recompute a pointer by listing the folder once; used when it is missing or stale"""
+    with _pointer_lock(data_dir):
+        candidates = sorted(
+            (f for f in os.listdir(data_dir) if f.startswith(prefix) and f.endswith('.json')),
+            reverse=True
+        )
+        if subscription_id:
+            candidates = [
+                f for f in candidates
+                if scan_io.read_scan_metadata(os.path.join(data_dir, f)).get('subscription_id') == subscription_id
+            ]
+
+        if not candidates:
+            remove_pointer(data_dir, mode, subscription_id)
+            return None
+
+        write_pointer(data_dir, mode, candidates[0], subscription_id)
+        return candidates[0]
+
+
+def resolve_latest(data_dir, mode, prefix, subscription_id=None):
+    """Get the filename of the latest scan for a mode (and subscription), or None if there are none"""
+    pointer = read_pointer(data_dir, mode, subscription_id)
+    if pointer and os.path.exists(os.path.join(data_dir, pointer['scan_id'])):
+        return pointer['scan_id']
+    return rebuild_latest(data_dir, mode, prefix, subscription_id)
+
+
+def on_scan_deleted(data_dir, mode, prefix, scan_id, subscription_id=None):
+    """Repoint any pointer that referenced a deleted scan"""
+    for sub in (None, subscription_id) if subscription_id else (None,):
+        pointer = read_pointer(data_dir, mode, sub)
+        if pointer and pointer['scan_id'] == scan_id:
+            rebuild_latest(data_dir, mode, prefix, sub)
@@ -0,0 +1,102 @@
+"""
+Rate Limit Storage
+SQLite backend for the `limits` package, so rate limit counters are shared by every
+worker process on a host. Registered under the sqlite:// scheme, e.g.
+RATELIMIT_STORAGE_URI=sqlite:///data/environment/ratelimits.db
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from limits.storage import Storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limits (
+    key TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Expired counters are purged once every this many increments per connection
+PURGE_EVERY = 1000
+
+
+class SQLiteStorage(Storage):
+    """Fixed-window counters in one SQLite table; each increment is a single atomic upsert"""
+
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri, wrap_exceptions=False, **options):
+        # sqlite:///relative/path.db or sqlite:////absolute/path.db
+        self.db_path = uri.split('://', 1)[1][1:]
+        if not self.db_path:
+            raise ValueError(f'No database path in storage URI: {uri}')
+        self._local = threading.local()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        """One connection per thread and process; connections never cross a fork"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.increments = 0
+        return conn
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            """
+            INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END,
+                expires_at = CASE WHEN expires_at <= ? OR ? THEN excluded.expires_at ELSE expires_at END
+            RETURNING count
+            """,
+            (key, amount, now + expiry, now, now, bool(elastic_expiry))
+        ).fetchone()
+
+        self._local.increments += 1
+        if self._local.increments % PURGE_EVERY == 0:
+            conn.execute('DELETE FROM rate_limits WHERE expires_at <= ?', (now,))
+        return row[0]
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._connection().execute(
+            'SELECT expires_at FROM rate_limits WHERE key = ?', (key,)
+        ).fetchone()
+        return row[0] if row and row[0] > time.time() else time.time()
+
+    def check(self):
+        try:
+            self._connection().execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection().execute('DELETE FROM rate_limits').rowcount
+
+    def clear(self, key):
+        self._connection().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
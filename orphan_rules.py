@@ -0,0 +1,122 @@
+"""
+Orphan Rules
+Declarative orphan rules, one per resource type, written in the resource query language
+(see resource_query.py) over the raw properties the scanner keeps on each record.
+
+Rules compile to Python predicates, so saved scans can be re-evaluated offline after a rule
+changes instead of rescanning Azure. A rule only applies to records that carry every field
+it reads; older records keep the verdict stored with them. Bump RULESET_VERSION with any
+rule change so re-evaluated scans and cached analyses can tell the rulesets apart.
+"""
+
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import resource_query
+
+RULESET_VERSION = 2
+
+# `{scan_time}` is replaced with the scan's timestamp in UTC, so time-based rules judge a
+# snapshot as of when it was taken. Rules compare strings, so the dates they read must be
+# UTC isoformat too (see the scanner)
+ORPHAN_RULES = {
+    # Unattached disks, excluding ASR replica/seed disks and AKS PVC or backup disks
+    'disks': (
+        "not (name ~ '*-asrreplica' or name ~ 'ms-asr-*' or name ~ 'asrseeddisk-*') "
+        "and not (tags ~ '*kubernetes.io-created-for-pvc*' or tags ~ '*asr-replicadisk*' "
+        "or tags ~ '*asrseeddisk*' or tags ~ '*rsvaultbackup*') "
+        "and disk_state != 'ActiveSAS' and (managed_by = null or disk_state = 'Unattached')"
+    ),
+    'public_ips': 'ip_configuration_id = null and nat_gateway_id = null and public_ip_prefix_id = null',
+    # NetApp volumes, private endpoints and private link services have NICs without a VM
+    'network_interfaces': (
+        'virtual_machine_id = null and private_endpoint_id = null and private_link_service_id = null '
+        'and hosted_workloads_count = 0'
+    ),
+    'network_security_groups': 'network_interfaces_count = 0 and subnets_count = 0',
+    'route_tables': 'subnets_count = 0',
+    'load_balancers': 'backend_pools_count = 0 and inbound_nat_rules_count = 0',
+    'frontdoor_waf_policies': 'security_policy_links_count = 0',
+    'traffic_manager_profiles': 'endpoints_count = 0',
+    'application_gateways': 'backend_targets_count = 0',
+    'virtual_networks': 'subnets_count = 0',
+    'subnets': 'ip_configurations_count = 0 and private_endpoints_count = 0 and delegations_count = 0',
+    'ip_groups': 'firewalls_count = 0 and firewall_policies_count = 0',
+    'private_dns_zones': 'virtual_network_links_count = 0',
+    'private_endpoints': """not connection_states ~ '*"Approved"*'""",
+    'virtual_network_gateways': 'not vpn_client_configured and connections_count = 0',
+    'ddos_protection_plans': 'virtual_networks_count = 0',
+    # Simplified: any Logic App in the same resource group counts as a consumer
+    'api_connections': 'logic_apps_count = 0',
+    'certificates': "expiration_date < '{scan_time}'",
+    # Availability sets ending in -asr belong to Site Recovery
+    'availability_sets': "not name ~ '*-asr' and virtual_machines_count = 0",
+    'nat_gateways': 'subnets_count = 0',
+    'app_service_plans': 'num_apps = 0',
+    'virtual_machines': "power_state in ('VM deallocated', 'VM stopped')",
+    'sql_servers': 'databases_count = 0',
+    'resource_groups': 'resources_count = 0'
+}
+
+
+@lru_cache(maxsize=256)
+def compile_rule(resource_type, scan_time=''):
+    """Compile a type's rule into (fields it reads, predicate), or None for types without a rule"""
+    rule = ORPHAN_RULES.get(resource_type)
+    if rule is None:
+        return None
+    tree = resource_query.parse(rule.replace('{scan_time}', scan_time or ''))
+    return frozenset(resource_query.fields(tree)), resource_query.compile_predicate(tree)
+
+
+def utc_isoformat(timestamp):
+    """
+    An ISO timestamp in UTC, for string comparison with UTC dates. Scan timestamps are
+    naive server-local times (datetime.now()); unparseable values are returned unchanged.
+    """
+    if not timestamp:
+        return timestamp
+    try:
+        return datetime.fromisoformat(timestamp).astimezone(timezone.utc).isoformat()
+    except ValueError:
+        return timestamp
+
+
+def evaluate_type(resource_type, resources, scan_time=None):
+    """
+    Re-evaluate is_orphaned in place for the records of one type that carry the rule's fields.
+    Returns (evaluated, changed) counts.
+    """
+    compiled = compile_rule(resource_type, scan_time or '')
+    if compiled is None:
+        return 0, 0
+
+    required, predicate = compiled
+    evaluated = changed = 0
+    for resource in resources:
+        if not required.issubset(resource.keys()):
+            continue
+        evaluated += 1
+        is_orphaned = predicate(resource)
+        # A missing flag counts as not orphaned, so only verdict flips count as changes
+        if bool(resource.get('is_orphaned')) != is_orphaned:
+            changed += 1
+        resource['is_orphaned'] = is_orphaned
+    return evaluated, changed
+
+
+def apply_rules(scan_data):
+    """
+    Re-evaluate every type of a scan in place and stamp it with RULESET_VERSION.
+    Returns per-type counts of evaluated and changed records.
+    """
+    scan_time = utc_isoformat(scan_data.get('timestamp'))
+    results = {}
+    for resource_type, resources in scan_data.get('resources', {}).items():
+        if not isinstance(resources, list):
+            continue
+        evaluated, changed = evaluate_type(resource_type, resources, scan_time)
+        if evaluated:
+            results[resource_type] = {'evaluated': evaluated, 'changed': changed}
+    scan_data['ruleset_version'] = RULESET_VERSION
+    return results
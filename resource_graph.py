@@ -0,0 +1,236 @@
+"""
+Resource Graph
+An in-memory dependency graph over one scan, built from the resource IDs the scanner keeps
+on each record. Edges point from a resource to the resources it uses:
+
+    VM -> NIC -> subnet -> VNet,  NIC -> NSG,  subnet -> NSG/route table/NAT gateway,
+    NIC or load balancer -> public IP,  app -> App Service plan
+
+and are stored as adjacency lists in both directions, keyed by compact resource ID keys
+(see resource_ids.IdCodec), so joins and walks compare integers rather than ID strings.
+Resources that are referenced but not part of the scan (web apps, scale sets, gateways of
+unscanned types) are external nodes, which count as live users.
+
+Orphan rules judge each type on its own. `propagate_orphans` then finds, in one pass over
+the graph, the resources whose every user is an orphan - a NIC on a deallocated VM, a public
+IP whose only consumer is an orphaned load balancer - and the resources that only those use.
+"""
+
+from collections import Counter, deque
+
+from resource_ids import IdCodec
+from resource_table import ResourceTable
+
+USES = 'uses'
+USED_BY = 'used_by'
+
+# (scan key, field, direction): the field holds one resource ID or a list of them.
+# USES means the record uses the referenced resource, USED_BY that the referenced resource
+# uses the record. Child IDs (IP configurations, frontends) resolve to their parent resource.
+REFERENCES = (
+    ('disks', 'managed_by', USED_BY),
+    ('public_ips', 'ip_configuration_id', USED_BY),
+    ('public_ips', 'nat_gateway_id', USED_BY),
+    ('public_ips', 'public_ip_prefix_id', USES),
+    ('network_interfaces', 'virtual_machine_id', USED_BY),
+    ('network_interfaces', 'private_endpoint_id', USED_BY),
+    ('network_interfaces', 'private_link_service_id', USED_BY),
+    ('network_interfaces', 'network_security_group_id', USES),
+    ('network_interfaces', 'subnet_ids', USES),
+    ('subnets', 'network_security_group_id', USES),
+    ('subnets', 'route_table_id', USES),
+    ('subnets', 'nat_gateway_id', USES),
+    ('app_service_plans', 'app_ids', USED_BY),
+)
+
+# Types whose users the graph sees in full, so an orphan verdict can flow to them. Subnets
+# are left out: IP configurations of unscanned resources (scale sets, gateways) use them too.
+PROPAGATING_TYPES = frozenset((
+    'disks', 'public_ips', 'network_interfaces', 'network_security_groups', 'route_tables',
+    'nat_gateways', 'virtual_networks'
+))
+
+# Child resources that are nodes of their own rather than part of their parent
+_NODE_CHILDREN = ('subnets/',)
+
+MAX_BLAST_RADIUS_DEPTH = 10
+MAX_BLAST_RADIUS_NODES = 5000
+
+
+class ResourceGraph:
+    """
+    Dependency graph of one scan. `uses[a]` lists what `a` uses and `used_by[a]` what uses
+    `a`; `records[a]` is (scan key, position in `tables[scan key]`) for scanned resources and
+    missing for external nodes. `propagate_orphans` fills in `orphaned` and `live_users`.
+    """
+
+    def __init__(self):
+        self.codec = IdCodec()
+        self.tables = {}
+        self.nodes = {}
+        self.records = {}
+        self.uses = {}
+        self.used_by = {}
+        self.orphaned = set()
+        self.live_users = {}
+        self._edges = set()
+
+    def add_edge(self, user, used):
+        if user == used or (user, used) in self._edges:
+            return
+        self._edges.add((user, used))
+        self.uses.setdefault(user, []).append(used)
+        self.used_by.setdefault(used, []).append(user)
+
+    def node(self, resource_id, add=True):
+        """
+        The node of a resource ID, cut to the resource it names so an IP configuration's ID
+        is its NIC or load balancer. Subnets are nodes of their own. With add=False, IDs the
+        graph has never seen give None.
+        """
+        return self.codec.encode(resource_id, _NODE_CHILDREN, add)
+
+    def parent(self, node):
+        """The resource a child node belongs to (a subnet's VNet), or None for top-level nodes"""
+        parent = self.codec.parent(node)
+        return parent if parent != node else None
+
+    @property
+    def edge_count(self):
+        return len(self._edges)
+
+    def describe(self, node):
+        """A node as a small dict for API responses"""
+        resource_type, position = self.records.get(node, (None, None))
+        if resource_type is None:
+            return {'id': self.codec.decode(node), 'resource_type': None, 'external': True}
+        record = self.tables[resource_type][position]
+        return {
+            'id': record.get('id'),
+            'resource_type': resource_type,
+            'name': record.get('name'),
+            'resource_group': record.get('resource_group'),
+            'location': record.get('location'),
+            'is_orphaned': bool(record.get('is_orphaned'))
+        }
+
+
+def _ids(value):
+    if not value:
+        return ()
+    return value if isinstance(value, list) else (value,)
+
+
+def build_graph(resources_by_type):
+    """Build the graph of a scan from {scan key: ResourceTable or resources list}"""
+    graph = ResourceGraph()
+    for resource_type, resources in resources_by_type.items():
+        if not isinstance(resources, ResourceTable):
+            resources = ResourceTable.from_records(resources)
+        graph.tables[resource_type] = resources
+        graph.nodes[resource_type] = type_nodes = [
+            graph.node(resource_id) if resource_id else None for resource_id in resources.column('id').tolist()
+        ]
+        for position, node in enumerate(type_nodes):
+            if node is not None:
+                graph.records[node] = (resource_type, position)
+
+    references = {}
+    for resource_type, field, direction in REFERENCES:
+        references.setdefault(resource_type, []).append((field, direction))
+
+    for resource_type, type_nodes in graph.nodes.items():
+        table = graph.tables[resource_type]
+        columns = [(table.column(field).tolist(), direction) for field, direction in references.get(resource_type, ())]
+        for position, node in enumerate(type_nodes):
+            if node is None:
+                continue
+            if resource_type == 'subnets' and graph.parent(node):
+                graph.add_edge(node, graph.parent(node))
+            for values, direction in columns:
+                for other in _ids(values[position]):
+                    other = graph.node(other)
+                    if direction == USES:
+                        graph.add_edge(node, other)
+                    else:
+                        graph.add_edge(other, node)
+    return graph
+
+
+def propagate_orphans(graph):
+    """
+    Find resources orphaned through their users, in O(V + E): a propagating resource with at
+    least one user becomes an orphan once every user is. Starts from the rule verdicts and
+    walks each orphan's `uses` list once, counting down live users. Returns {node: depth} in
+    discovery order, depth 1 for resources whose users are all rule orphans, and leaves every
+    orphan in `graph.orphaned` and each node's count of users that are not in `graph.live_users`.
+    """
+    live_users = {node: len(users) for node, users in graph.used_by.items()}
+    flags = {t: table.column('is_orphaned', False, bool) for t, table in graph.tables.items()}
+    orphaned = {node for node, (t, position) in graph.records.items() if flags[t][position]}
+    queue = deque((node, 0) for node in orphaned)
+    propagated = {}
+
+    while queue:
+        node, depth = queue.popleft()
+        for used in graph.uses.get(node, ()):
+            live_users[used] -= 1
+            if live_users[used] or used in orphaned:
+                continue
+            if graph.records.get(used, (None,))[0] in PROPAGATING_TYPES:
+                orphaned.add(used)
+                propagated[used] = depth + 1
+                queue.append((used, depth + 1))
+
+    graph.orphaned = orphaned
+    graph.live_users = live_users
+    return propagated
+
+
+def orphaned_by_removal(graph, node):
+    """
+    What removing a resource would leave orphaned on top of today's orphans: the same
+    count-down as `propagate_orphans`, started from one node over the counts it left behind,
+    so it only walks what the node uses. Returns [(node, depth)] in discovery order.
+    """
+    if node in graph.orphaned:
+        return []
+
+    removed_users = Counter()
+    gone = {node}
+    reached = []
+    queue = deque([(node, 0)])
+    while queue:
+        current, depth = queue.popleft()
+        for used in graph.uses.get(current, ()):
+            removed_users[used] += 1
+            if used in gone or used in graph.orphaned or graph.live_users[used] - removed_users[used]:
+                continue
+            if graph.records.get(used, (None,))[0] in PROPAGATING_TYPES:
+                gone.add(used)
+                reached.append((used, depth + 1))
+                queue.append((used, depth + 1))
+    return reached
+
+
+def blast_radius(graph, node, max_depth=MAX_BLAST_RADIUS_DEPTH, max_nodes=MAX_BLAST_RADIUS_NODES):
+    """
+    Everything that depends on a resource, directly or through other resources: a
+    breadth-first walk of `used_by`. Returns ([(node, depth)] in walk order, truncated).
+    """
+    seen = {node}
+    reached = []
+    queue = deque([(node, 0)])
+    while queue:
+        current, depth = queue.popleft()
+        if depth >= max_depth:
+            continue
+        for user in graph.used_by.get(current, ()):
+            if user in seen:
+                continue
+            if len(reached) >= max_nodes:
+                return reached, True
+            seen.add(user)
+            reached.append((user, depth + 1))
+            queue.append((user, depth + 1))
+    return reached, False
@@ -0,0 +1,130 @@
+"""
+Resource IDs
+One parser for Azure resource IDs (/subscriptions/<sub>/resourceGroups/<rg>/providers/
+<namespace>/<type>/<name>[/<child type>/<child name>...]) instead of positional splits at
+every call site. Parses are cached and their segments interned, so the records of a scan
+share one string per subscription, resource group and provider.
+
+IdCodec turns IDs into compact keys for joins: subscription, resource group, provider
+namespace, type, name and child path become integer codes packed into a single int,
+compared the way Azure compares IDs (case-insensitively).
+"""
+
+import struct
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+PARSE_CACHE_SIZE = 65536
+
+# Fields are None when the ID does not have them; child is the path below the named
+# resource, e.g. 'subnets/default' or 'ipConfigurations/ipconfig1'
+ResourceId = namedtuple('ResourceId', ['subscription', 'resource_group', 'provider', 'name', 'child'])
+
+_EMPTY = ResourceId(None, None, None, None, None)
+
+# Bits per packed code; codes are per codec, so this bounds distinct segments, not resources
+_CODE_BITS = 32
+_PACK = struct.Struct('>6I').pack
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse(resource_id):
+    """Parse a resource ID into a ResourceId with interned segments (original case)"""
+    if not resource_id:
+        return _EMPTY
+    parts = resource_id.split('/')
+    count = len(parts)
+    if count < 3 or parts[0] or parts[1].lower() != 'subscriptions':
+        return _EMPTY
+
+    subscription = sys.intern(parts[2])
+    resource_group = provider = name = child = None
+    if count > 4 and parts[3].lower() == 'resourcegroups':
+        resource_group = sys.intern(parts[4])
+        if count > 8 and parts[5].lower() == 'providers':
+            provider = sys.intern(f'{parts[6]}/{parts[7]}')
+            name = parts[8]
+            if count > 9:
+                child = '/'.join(parts[9:])
+    return ResourceId(subscription, resource_group, provider, name, child)
+
+
+def resource_group(resource_id):
+    """The resource group named in a resource ID, or None"""
+    return parse(resource_id).resource_group
+
+
+class IdCodec:
+    """
+    Integer codes for ID segments, folded to lower case. `encode` packs a resource ID's
+    subscription, resource group, provider namespace, type, name and child path codes into
+    one int; two IDs get the same key exactly when they are equal ignoring case. Codes are
+    only comparable within one codec, so a codec lives as long as the join or graph using it.
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._segments = [None]  # code 0 stands for a missing segment
+
+    def _add(self, segment):
+        code = len(self._segments)
+        self._segments.append(segment)
+        self._codes[segment] = code
+        return code
+
+    def encode(self, resource_id, child=True, add=True):
+        """
+        The compact key of a resource ID. `child=False` keys the named resource itself, so
+        `.../networkInterfaces/nic1/ipConfigurations/ipconfig1` and `.../nic1` match; a tuple
+        keeps only child paths starting with one of its (lower-case) prefixes. With add=False,
+        IDs with a segment the codec has never seen give None.
+        """
+        folded = (resource_id or '').lower()
+        parts = folded.split('/', 9)
+        get = self._codes.get
+        if len(parts) < 9 or parts[0] or parts[1] != 'subscriptions' or parts[3] != 'resourcegroups' \
+                or parts[5] != 'providers':
+            # Not a resource ID: the whole string is one segment, told apart by the low bit
+            code = get(folded) or (self._add(folded) if add else None)
+            return None if code is None else code << 1
+
+        segments = [parts[2], parts[4], parts[6], parts[7], parts[8]]
+        if len(parts) == 10 and (parts[9].startswith(child) if isinstance(child, tuple) else child):
+            segments.append(parts[9])
+        codes = [get(segment) for segment in segments]
+        if None in codes:
+            if not add:
+                return None
+            codes = [code or self._add(segment) for code, segment in zip(codes, segments)]
+        if len(codes) == 5:
+            codes.append(0)
+        return (int.from_bytes(_PACK(*codes), 'big') << 1) | 1
+
+    def find(self, resource_id, child=True):
+        """The key of a resource ID if every segment already has a code, else None"""
+        return self.encode(resource_id, child, add=False)
+
+    def decode(self, key):
+        """The lower-cased ID behind a key"""
+        if not key & 1:
+            return self._segments[key >> 1]
+        key >>= 1
+        mask = (1 << _CODE_BITS) - 1
+        codes = []
+        for _ in range(6):
+            codes.append(key & mask)
+            key >>= _CODE_BITS
+        child, name, resource_type, namespace, group, subscription = (self._segments[c] for c in codes)
+        resource_id = f'/subscriptions/{subscription}/resourcegroups/{group}/providers/{namespace}/{resource_type}/{name}'
+        return f'{resource_id}/{child}' if child is not None else resource_id
+
+    def parent(self, key):
+        """The key of the resource a child ID belongs to (the key itself for top-level IDs)"""
+        if not key & 1:
+            return key
+        return ((key >> (_CODE_BITS + 1)) << (_CODE_BITS + 1)) | 1
+
+    def child(self, key):
+        """The lower-cased child path of a key, e.g. 'subnets/default', or None"""
+        return self._segments[(key >> 1) & ((1 << _CODE_BITS) - 1)] if key & 1 else None
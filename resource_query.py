@@ -0,0 +1,339 @@
+"""
+Resource Query
+A small filter language over resource records, compiled to a WHERE clause on the scan
+store's resources table. For example:
+
+    type = public_ips and is_orphaned and sku = Standard
+        and location in (westeurope, northeurope) and resource_group ~ '*-dev'
+
+Operators: = != < <= > >= ~ (glob, * and ?) !~ in, combined with and/or/not and parentheses.
+String comparisons are case-insensitive like Azure names. Indexed columns (type, is_orphaned,
+location, resource_group, sku, name, id) are compared directly, so selective queries only
+touch matching rows; any other field is read from the stored record.
+
+Queries can also be compiled to Python predicates over resource dicts, with the same
+semantics as the SQL (missing fields compare like NULL, objects and lists as JSON text).
+"""
+
+import operator
+import re
+
+import json_codec
+
+MAX_QUERY_LENGTH = 2000
+
+# Fields stored as columns of the resources table
+COLUMNS = ('type', 'id', 'name', 'resource_group', 'location', 'sku', 'is_orphaned')
+
+KEYWORDS = ('and', 'or', 'not', 'in', 'true', 'false', 'null')
+
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<op>!=|<=|>=|!~|=|<|>|~)
+      | (?P<punct>[(),])
+      | '(?P<single>(?:[^'\\]|\\.)*)'
+      | "(?P<double>(?:[^"\\]|\\.)*)"
+      | (?P<word>[^\s()=!<>~,'"]+)
+    )""", re.VERBOSE)
+_FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_NUMBER_PATTERN = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+class QueryError(ValueError):
+    """A query that does not parse or uses an unknown construct"""
+
+
+def _tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f'Unexpected character at position {position}: {text[position]!r}')
+        position = match.end()
+        kind = match.lastgroup
+        if kind in ('single', 'double'):
+            tokens.append(('string', re.sub(r'\\(.)', r'\1', match.group(kind))))
+        elif kind == 'word' and match.group(kind).lower() in KEYWORDS:
+            tokens.append(('keyword', match.group(kind).lower()))
+        else:
+            tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+def _literal(token):
+    """Turn a value token into a Python value; only bare words can be numbers, booleans or null"""
+    kind, value = token
+    if kind == 'string':
+        return value
+    if kind == 'keyword' and value in ('true', 'false'):
+        return value == 'true'
+    if kind == 'keyword' and value == 'null':
+        return None
+    if kind == 'word':
+        if _NUMBER_PATTERN.match(value):
+            return float(value) if '.' in value else int(value)
+        return value
+    raise QueryError(f'Expected a value, got {value!r}')
+
+
+class _Parser:
+    """Recursive descent parser producing nested tuples:
+    ('or', a, b) | ('and', a, b) | ('not', a) | ('cmp', field, op, value) | ('in', field, values)"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        if token[0] is None:
+            raise QueryError('Unexpected end of query')
+        self.position += 1
+        return token
+
+    def expect(self, kind, value):
+        token = self.take()
+        if token != (kind, value):
+            raise QueryError(f'Expected {value!r}, got {token[1]!r}')
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] is not None:
+            raise QueryError(f'Unexpected {self.peek()[1]!r}')
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ('keyword', 'or'):
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ('keyword', 'and'):
+            self.take()
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ('keyword', 'not'):
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_atom()
+
+    def parse_atom(self):
+        if self.peek() == ('punct', '('):
+            self.take()
+            node = self.parse_or()
+            self.expect('punct', ')')
+            return node
+
+        kind, field = self.take()
+        if kind != 'word' or not _FIELD_PATTERN.match(field):
+            raise QueryError(f'Expected a field name, got {field!r}')
+
+        kind, op = self.peek()
+        if kind == 'op':
+            self.take()
+            return ('cmp', field, op, _literal(self.take()))
+        if (kind, op) == ('keyword', 'in'):
+            self.take()
+            self.expect('punct', '(')
+            values = [_literal(self.take())]
+            while self.peek() == ('punct', ','):
+                self.take()
+                values.append(_literal(self.take()))
+            self.expect('punct', ')')
+            return ('in', field, values)
+        # A bare field is a truthiness test, e.g. `is_orphaned`
+        return ('cmp', field, '=', True)
+
+
+def parse(text):
+    """Parse a query into a tree of tuples; raises QueryError"""
+    if not text or not text.strip():
+        raise QueryError('Empty query')
+    if len(text) > MAX_QUERY_LENGTH:
+        raise QueryError(f'Query is longer than {MAX_QUERY_LENGTH} characters')
+    return _Parser(_tokenize(text)).parse()
+
+
+def _glob_to_like(pattern):
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+def _column(field, params):
+    if field in COLUMNS:
+        return field
+    params.append(f'$.{field}')
+    return 'json_extract(extra, ?)'
+
+
+def _value(field, value, type_aliases):
+    if field == 'type' and isinstance(value, str):
+        return type_aliases.get(value, value)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _compile(node, params, type_aliases):
+    kind = node[0]
+    if kind in ('and', 'or'):
+        return f'({_compile(node[1], params, type_aliases)} {kind.upper()} {_compile(node[2], params, type_aliases)})'
+    if kind == 'not':
+        # NULL comparisons are false here, so `not` keeps rows that lack the field
+        return f'NOT COALESCE({_compile(node[1], params, type_aliases)}, 0)'
+
+    field = node[1]
+    column = _column(field, params)
+    # The type column holds exact scan keys; text elsewhere compares case-insensitively
+    collate = '' if field == 'type' else ' COLLATE NOCASE'
+
+    if kind == 'in':
+        values = [_value(field, v, type_aliases) for v in node[2]]
+        params.extend(values)
+        return f'{column}{collate} IN ({", ".join("?" * len(values))})'
+
+    op, value = node[2], _value(field, node[3], type_aliases)
+    if op in ('~', '!~'):
+        if not isinstance(value, str):
+            raise QueryError(f'{op} needs a text pattern')
+        params.append(_glob_to_like(value))
+        condition = f"{column} LIKE ? ESCAPE '\\'"
+        return condition if op == '~' else f'NOT COALESCE({condition}, 0)'
+    if value is None:
+        if op not in ('=', '!='):
+            raise QueryError('null can only be compared with = or !=')
+        return f'{column} IS {"NOT " if op == "!=" else ""}NULL'
+
+    params.append(value)
+    text_collate = collate if isinstance(value, str) else ''
+    if op == '!=':
+        # IS NOT keeps rows where the field is missing
+        return f'{column} IS NOT ?{text_collate}'
+    return f'{column} {op} ?{text_collate}'
+
+
+def compile_query(tree, type_aliases=None):
+    """
+    Compile a parsed query into (sql, params) for a WHERE clause on the resources table.
+    `type_aliases` maps alternative type names (e.g. dashboard slugs) to scan keys.
+    """
+    params = []
+    return _compile(tree, params, type_aliases or {}), params
+
+
+def compile_text(text, type_aliases=None):
+    return compile_query(parse(text), type_aliases)
+
+
+def fields(tree):
+    """The set of field names a parsed query reads"""
+    kind = tree[0]
+    if kind in ('and', 'or'):
+        return fields(tree[1]) | fields(tree[2])
+    if kind == 'not':
+        return fields(tree[1])
+    return {tree[1]}
+
+
+_ORDERING = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+def _as_sql_value(value):
+    """A record value as SQLite sees it through json_extract: booleans are 0/1, objects JSON text"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json_codec.dumps(value).decode('utf-8')
+    return value
+
+
+def _folder(field):
+    if field == 'type':
+        return lambda value: value
+    return lambda value: value.lower() if isinstance(value, str) else value
+
+
+def _glob_to_regex(pattern):
+    """Compile a glob for re.search; leading and trailing * become unanchored ends"""
+    body = pattern.strip('*')
+    regex = ''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c) for c in body)
+    if not pattern.startswith('*') or not pattern:
+        regex = r'\A' + regex
+    if not pattern.endswith('*') or not pattern:
+        regex += r'\Z'
+    return re.compile(regex, re.IGNORECASE | re.DOTALL)
+
+
+def _predicate(node):
+    kind = node[0]
+    if kind in ('and', 'or'):
+        left, right = _predicate(node[1]), _predicate(node[2])
+        if kind == 'and':
+            return lambda record: left(record) and right(record)
+        return lambda record: left(record) or right(record)
+    if kind == 'not':
+        inner = _predicate(node[1])
+        return lambda record: not inner(record)
+
+    field = node[1]
+    fold = _folder(field)
+
+    def get(record):
+        value = record.get(field)
+        return None if value is None else fold(_as_sql_value(value))
+
+    if kind == 'in':
+        values = {fold(_as_sql_value(v)) for v in node[2]}
+        return lambda record: get(record) in values
+
+    op, value = node[2], node[3]
+    if op in ('~', '!~'):
+        if not isinstance(value, str):
+            raise QueryError(f'{op} needs a text pattern')
+        pattern = _glob_to_regex(value)
+
+        def matches(record):
+            text = record.get(field)
+            if text is None:
+                return False
+            if type(text) is not str:
+                text = str(_as_sql_value(text))
+            return pattern.search(text) is not None
+        return matches if op == '~' else lambda record: not matches(record)
+    if value is None:
+        if op not in ('=', '!='):
+            raise QueryError('null can only be compared with = or !=')
+        if op == '=':
+            return lambda record: record.get(field) is None
+        return lambda record: record.get(field) is not None
+
+    value = fold(_as_sql_value(value))
+    if op == '=':
+        return lambda record: get(record) == value
+    if op == '!=':
+        return lambda record: get(record) != value
+
+    compare = _ORDERING[op]
+
+    def ordered(record):
+        current = get(record)
+        try:
+            return current is not None and compare(current, value)
+        except TypeError:
+            return False
+    return ordered
+
+
+def compile_predicate(tree):
+    """Compile a parsed query into a function of a resource dict that returns True when it matches"""
+    return _predicate(tree)
@@ -0,0 +1,206 @@
+"""
+Resource Table
+Compact columnar storage for the records of one resource type, used by the memoized scan
+analysis in place of a list of dicts. Each field is a column:
+
+    - text fields with few distinct values (always location and resource_group) are
+      dictionary-encoded: one int32 code per record and one string per distinct value
+    - fields holding only booleans (is_orphaned) are packed bitsets
+    - anything else is a plain list
+
+Records are rebuilt on demand with their original keys in their original order, so a
+table can stand in for the list it was built from: len(), iteration, indexing and slicing
+yield the same dicts.
+"""
+
+import numpy as np
+
+# Stands in for a missing field in dictionary-encoded columns
+MISSING = object()
+
+# Always dictionary-encoded when they only hold text
+DICTIONARY_FIELDS = ('location', 'resource_group')
+
+# Unique per record, so never worth encoding
+PLAIN_FIELDS = ('id', 'name')
+
+# Other text fields are encoded when at most this share of their values are distinct
+MAX_DISTINCT_SHARE = 0.5
+
+_CODES = 'codes'
+_BITS = 'bits'
+_VALUES = 'values'
+
+
+def _encode(values, limit):
+    """Dictionary-encode text (or missing) values; None when a value is not text or there are too many"""
+    index = {}
+    codes = []
+    append = codes.append
+    for value in values:
+        if type(value) is not str and value is not None and value is not MISSING:
+            return None
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(index)
+            if code >= limit:
+                return None
+        append(code)
+    return np.array(codes, dtype=np.int32), list(index)
+
+
+class ResourceTable:
+    """The records of one resource type as columns; build one with from_records()"""
+
+    __slots__ = ('_length', '_fields', '_shapes', '_shape_codes', '_columns')
+
+    def __init__(self, length, fields, shapes, shape_codes, columns):
+        self._length = length
+        self._fields = fields            # field names in first-seen order
+        self._shapes = shapes            # distinct key tuples of the records
+        self._shape_codes = shape_codes  # per record: index into _shapes
+        self._columns = columns          # field -> (kind, data)
+
+    @classmethod
+    def from_records(cls, records):
+        records = records if isinstance(records, list) else list(records)
+        length = len(records)
+
+        shape_index = {}
+        shape_codes = np.fromiter(
+            (shape_index.setdefault(tuple(record), len(shape_index)) for record in records),
+            dtype=np.int32, count=length
+        )
+        shapes = list(shape_index)
+        fields = list(dict.fromkeys(field for shape in shapes for field in shape))
+
+        columns = {}
+        for field in fields:
+            complete = all(field in shape for shape in shapes)
+            values = [record[field] for record in records] if complete else \
+                [record.get(field, MISSING) for record in records]
+
+            encoded = None
+            if field in DICTIONARY_FIELDS:
+                encoded = _encode(values, length + 1)
+            elif field not in PLAIN_FIELDS:
+                encoded = _encode(values, max(int(length * MAX_DISTINCT_SHARE), 1))
+            if encoded is not None:
+                columns[field] = (_CODES, encoded)
+            elif all(type(value) is bool or value is MISSING for value in values):
+                flags = np.fromiter((value is True for value in values), dtype=bool, count=length)
+                columns[field] = (_BITS, np.packbits(flags))
+            else:
+                columns[field] = (_VALUES, values)
+        return cls(length, tuple(fields), shapes, shape_codes, columns)
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        return self._length > 0
+
+    def _getter(self, field, many):
+        """Value lookup by position; `many` converts columns up front for reading many records"""
+        kind, data = self._columns[field]
+        if kind == _CODES:
+            codes, categories = data
+            if many:
+                return [categories[code] for code in codes.tolist()].__getitem__
+            return lambda i: categories[codes[i]]
+        if kind == _BITS:
+            if many:
+                return np.unpackbits(data, count=self._length).astype(bool).tolist().__getitem__
+            return lambda i: bool((data[i >> 3] >> (7 - (i & 7))) & 1)
+        return data.__getitem__
+
+    def _records(self, positions, many=True):
+        getters = {field: self._getter(field, many) for field in self._fields}
+        shapes = [[(field, getters[field]) for field in shape] for shape in self._shapes]
+        shape_codes = self._shape_codes.tolist() if many else self._shape_codes
+        for i in positions:
+            yield {field: get(i) for field, get in shapes[shape_codes[i]]}
+
+    def __iter__(self):
+        return self._records(range(self._length))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return list(self._records(range(*item.indices(self._length))))
+        if item < 0:
+            item += self._length
+        if not 0 <= item < self._length:
+            raise IndexError('ResourceTable index out of range')
+        return next(self._records((item,), many=False))
+
+    @property
+    def fields(self):
+        return self._fields
+
+    def _present(self, field):
+        """Mask of records that have the field, or None when they all do"""
+        holding = [code for code, shape in enumerate(self._shapes) if field in shape]
+        if len(holding) == len(self._shapes):
+            return None
+        return np.isin(self._shape_codes, holding)
+
+    def column(self, field, default=None, dtype=object):
+        """One field of every record as a NumPy array; records without the field get `default`"""
+        if field not in self._columns:
+            return np.full(self._length, default, dtype=dtype)
+
+        kind, data = self._columns[field]
+        if kind == _CODES:
+            codes, categories = data
+            lookup = np.empty(len(categories), dtype=object)
+            lookup[:] = [default if value is MISSING else value for value in categories]
+            column = lookup[codes]
+            return column if dtype is object else column.astype(dtype)
+        if kind == _BITS:
+            column = np.unpackbits(data, count=self._length).astype(bool)
+            if dtype is not bool:
+                column = column.astype(dtype)
+            present = self._present(field)
+            if present is not None:
+                column[~present] = default
+            return column
+
+        column = np.empty(self._length, dtype=object)
+        column[:] = [default if value is MISSING else value for value in data]
+        return column if dtype is object else column.astype(dtype)
+
+    def categories(self, field):
+        """(codes, distinct values in first-seen order) of a dictionary-encoded field, else None.
+        Records without the field share a code whose value is MISSING."""
+        column = self._columns.get(field)
+        if column is None:
+            return np.zeros(self._length, dtype=np.int32), [MISSING] if self._length else []
+        return column[1] if column[0] == _CODES else None
+
+    def take(self, positions):
+        """A table of the records at `positions` (ascending), e.g. the orphans of a type"""
+        positions = np.asarray(positions, dtype=np.intp)
+        shape_codes = self._shape_codes[positions]
+        used_shapes = np.unique(shape_codes)
+        if len(used_shapes) < len(self._shapes):
+            remap = np.full(len(self._shapes), -1, dtype=np.int32)
+            remap[used_shapes] = np.arange(len(used_shapes), dtype=np.int32)
+            shapes = [self._shapes[code] for code in used_shapes.tolist()]
+            shape_codes = remap[shape_codes]
+        else:
+            shapes = self._shapes
+        fields = tuple(field for field in self._fields if any(field in shape for shape in shapes))
+
+        listed = positions.tolist()
+        columns = {}
+        for field in fields:
+            kind, data = self._columns[field]
+            if kind == _CODES:
+                codes, categories = data
+                columns[field] = (_CODES, (codes[positions], categories))
+            elif kind == _BITS:
+                flags = np.unpackbits(data, count=self._length).astype(bool)[positions]
+                columns[field] = (_BITS, np.packbits(flags))
+            else:
+                columns[field] = (_VALUES, [data[i] for i in listed])
+        return ResourceTable(len(listed), fields, shapes, shape_codes, columns)
@@ -0,0 +1,191 @@
+"""
+Scan Retention
+Tiered retention policy for scan files, compacting expired scans into rollups
+"""
+
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Keep everything for 48 hours, then one scan per day for 90 days, then one per week
+DEFAULT_RETENTION_TIERS = '48h:all,90d:1d,*:1w'
+
+# Lock files in the scan folder: the background leader holds the first for the life of its
+# process, and each retention run (background or manual) holds the second while it compacts
+LEADER_LOCK_NAME = '.retention.lock'
+RUN_LOCK_NAME = '.retention.run.lock'
+
+_DURATION_PATTERN = re.compile(r'^(\d+)\s*([hdw])$')
+_DURATION_UNITS = {'h': 1, 'd': 24, 'w': 24 * 7}
+_SCAN_TIMESTAMP_PATTERN = re.compile(r'_(\d{8}_\d{6})\.json$')
+
+_run_lock = threading.Lock()
+
+
+def parse_duration_hours(value):
+    """Parse a duration like '48h', '90d' or '1w' into hours"""
+    match = _DURATION_PATTERN.match(value.strip().lower())
+    if not match:
+        raise ValueError(f'Invalid duration: {value}')
+    return int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+
+def parse_retention_tiers(spec):
+    """
+    Parse a retention spec like '48h:all,90d:1d,*:1w' into a list of tiers.
+    Each tier is 'max_age:granularity'; '*' means no age limit and 'all' keeps every scan.
+    """
+    tiers = []
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        max_age, _, keep_every = part.partition(':')
+        max_age = max_age.strip()
+        keep_every = keep_every.strip().lower() or 'all'
+        tiers.append({
+            'max_age_hours': None if max_age == '*' else parse_duration_hours(max_age),
+            'keep_every_hours': 0 if keep_every == 'all' else parse_duration_hours(keep_every)
+        })
+
+    if not tiers:
+        raise ValueError('Retention spec must define at least one tier')
+    return sorted(tiers, key=lambda t: float('inf') if t['max_age_hours'] is None else t['max_age_hours'])
+
+
+def parse_scan_timestamp(filename):
+    """Get the scan time encoded in a scan filename, or None for unrecognized names"""
+    match = _SCAN_TIMESTAMP_PATTERN.search(filename)
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+
+
+def _period_start(timestamp, period_hours):
+    """Start of the fixed-size period (aligned to the epoch) that contains the timestamp"""
+    period_seconds = period_hours * 3600
+    return datetime.fromtimestamp(int(timestamp.timestamp() // period_seconds) * period_seconds)
+
+
+def plan_retention(scans, tiers, now=None):
+    """
+    Decide which scans to keep. `scans` is a list of dicts with 'scan_id' and 'timestamp'.
+    Returns (keep, expire); each expired entry carries the rollup period it belongs to.
+    The newest scan is always kept so the dashboards never lose their data.
+    """
+    now = now or datetime.now()
+    ordered = sorted(scans, key=lambda s: s['timestamp'], reverse=True)
+    keep, expire = [], []
+    kept_periods = set()
+
+    # Period used for rollups of scans older than the last tier
+    fallback_hours = tiers[-1]['keep_every_hours'] or 24
+
+    for index, scan in enumerate(ordered):
+        age_hours = (now - scan['timestamp']).total_seconds() / 3600
+        tier_index = next(
+            (i for i, t in enumerate(tiers) if t['max_age_hours'] is None or age_hours < t['max_age_hours']),
+            None
+        )
+
+        if index == 0:
+            keep.append(scan)
+            if tier_index is not None and tiers[tier_index]['keep_every_hours']:
+                period_hours = tiers[tier_index]['keep_every_hours']
+                kept_periods.add((tier_index, _period_start(scan['timestamp'], period_hours)))
+            continue
+
+        if tier_index is None:
+            expire.append({**scan, 'period_start': _period_start(scan['timestamp'], fallback_hours),
+                           'period_hours': fallback_hours})
+            continue
+
+        period_hours = tiers[tier_index]['keep_every_hours']
+        if not period_hours:
+            keep.append(scan)
+            continue
+
+        # Newest scan in each period wins, older ones in the same period are compacted
+        period = (tier_index, _period_start(scan['timestamp'], period_hours))
+        if period in kept_periods:
+            expire.append({**scan, 'period_start': period[1], 'period_hours': period_hours})
+        else:
+            kept_periods.add(period)
+            keep.append(scan)
+
+    return keep, expire
+
+
+def _acquire_leader_lock(lock_path):
+    """
+    Try to take an exclusive lock on `lock_path` without blocking. Returns the open lock file
+    (held until the process exits) or None if another process holds it. Without fcntl
+    (Windows, single-process servers) the lock is always granted.
+    """
+    if fcntl is None:
+        return True
+    lock_file = open(lock_path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+@contextmanager
+def run_lock(lock_path):
+    """
+    Try to take the lock for one retention run without blocking; yields whether it was
+    taken. Serializes runs across threads and, through an exclusive lock file, across server
+    worker processes, so a manual run never compacts alongside the background one.
+    """
+    if not _run_lock.acquire(blocking=False):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            yield True
+            return
+        with open(lock_path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        _run_lock.release()
+
+
+def start_retention_worker(run_once, interval_seconds, lock_path=None):
+    """
+    Run `run_once` every `interval_seconds` on a daemon thread. With `lock_path`, only the
+    process holding the lock runs it, so several server workers do not compact concurrently;
+    the others retry each interval and take over if the holder exits.
+    """
+    stop_event = threading.Event()
+
+    def worker():
+        lock = None
+        while not stop_event.wait(interval_seconds):
+            if lock_path and lock is None:
+                lock = _acquire_leader_lock(lock_path)
+                if lock is None:
+                    continue
+            try:
+                run_once()
+            except Exception as e:
+                print(f"Warning: Scan retention run failed: {e}")
+
+    thread = threading.Thread(target=worker, name='scan-retention', daemon=True)
+    thread.start()
+    return stop_event
@@ -0,0 +1,311 @@
+"""
+Scan Analysis
+One pass over a snapshot produces every per-type view (totals, orphans, per-RG and
+per-location counts); endpoints are projections of the memoized result. The memoized
+records are kept as compact columnar ResourceTables rather than lists of dicts.
+
+Type analyses are also cached by (scan key, content hash, ruleset version), so a new scan
+only reads and analyzes the types whose content changed; the others are shared with the
+earlier scans that had the same content.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+import orphan_rules
+import resource_graph
+from resource_table import MISSING, ResourceTable
+
+ANALYSIS_CACHE_SIZE = 4
+# Enough for every type of the cached scans plus the types they no longer share
+TYPE_CACHE_SIZE = 128
+
+# The single mapping between scan JSON keys and the keys each view exposes:
+#   slug          - dashboard URL slug (None when the type has no dashboard)
+#   orphan_key    - key in the orphan counts view
+#   complete_key  - key in the complete resource view
+ResourceKey = namedtuple('ResourceKey', ['scan_key', 'slug', 'orphan_key', 'complete_key'])
+
+RESOURCE_KEYS = (
+    ResourceKey('app_service_plans', 'app-service', 'app_service_plans', 'app_service_plans'),
+    ResourceKey('sql_servers', 'sql-databases', 'sql_elastic_pools', 'sql_elastic_pools'),
+    ResourceKey('virtual_machines', 'virtual-machines', None, None),
+    ResourceKey('public_ips', 'public-ips', 'public_ips', 'public_ips'),
+    ResourceKey('disks', 'disks', 'disks', 'disks'),
+    ResourceKey('network_interfaces', 'nics', 'network_interfaces', 'network_interfaces'),
+    ResourceKey('load_balancers', 'load-balancers', 'load_balancers', 'load_balancers'),
+    ResourceKey('availability_sets', 'availability-sets', 'availability_sets', 'availability_sets'),
+    ResourceKey('route_tables', 'route-tables', 'route_tables', 'route_tables'),
+    ResourceKey('nat_gateways', 'nat-gateways', 'nat_gateways', 'nat_gateways'),
+    ResourceKey('frontdoor_waf_policies', 'frontdoor-waf', 'frontdoor_waf_policies', 'frontdoor_waf_policies'),
+    ResourceKey('traffic_manager_profiles', 'traffic-manager', 'traffic_manager_profiles', 'traffic_manager_profiles'),
+    ResourceKey('subnets', 'subnets', 'subnets', 'subnets'),
+    ResourceKey('ip_groups', 'ip-groups', 'ip_groups', 'ip_groups'),
+    ResourceKey('private_dns_zones', 'private-dns', 'private_dns_zones', 'private_dns_zones'),
+    ResourceKey('private_endpoints', 'private-endpoints', 'private_endpoints', 'private_endpoints'),
+    ResourceKey('virtual_network_gateways', 'vnet-gateways', 'virtual_network_gateways', 'virtual_network_gateways'),
+    ResourceKey('ddos_protection_plans', 'ddos-plans', 'ddos_protection_plans', 'ddos_protection_plans'),
+    ResourceKey('api_connections', 'api-connections', 'api_connections', None),
+    ResourceKey('certificates', 'certificates', 'certificates', 'certificates'),
+    ResourceKey('storage_accounts', 'storage-accounts', None, None),
+    ResourceKey('network_security_groups', 'nsgs', 'network_security_groups', 'network_security_groups'),
+    ResourceKey('application_gateways', None, 'application_gateways', 'application_gateways'),
+    ResourceKey('virtual_networks', None, 'virtual_networks', 'virtual_networks'),
+    # The complete view uses resource groups as a proxy for storage accounts
+    ResourceKey('resource_groups', None, 'resource_groups', 'storage_accounts'),
+)
+
+# Dashboard URL slug -> scan JSON key
+SLUG_KEYS = {k.slug: k.scan_key for k in RESOURCE_KEYS if k.slug}
+
+_cache = OrderedDict()
+_type_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _column(resources_list, field, default=None, dtype=object):
+    """One field of every record as a NumPy array; records without the field get `default`"""
+    if isinstance(resources_list, ResourceTable):
+        return resources_list.column(field, default, dtype)
+    try:
+        return np.fromiter(map(itemgetter(field), resources_list), dtype=dtype, count=len(resources_list))
+    except KeyError:
+        return np.fromiter((r.get(field, default) for r in resources_list), dtype=dtype, count=len(resources_list))
+
+
+def field_values(resources_list, field, default=None):
+    """One field of every record as an object Series, for vectorized filters"""
+    return pd.Series(_column(resources_list, field, default), dtype=object)
+
+
+def _group_counts(table, field, orphaned, default):
+    """
+    Group records by one field. Both counts are bincounts over the field's dictionary codes
+    (MISSING stands in for records without the field, so it stays distinct from any stored
+    value); fields the table does not encode are factorized first. Returns ({value: [total,
+    orphaned]} in first-seen order with MISSING replaced by `default`, the distinct raw
+    values in first-seen order).
+    """
+    encoded = table.categories(field)
+    if encoded is not None:
+        codes, keys = encoded
+    else:
+        codes, keys = pd.factorize(table.column(field, MISSING), use_na_sentinel=False)
+        # factorize reports a None key as NaN
+        keys = [None if isinstance(key, float) and key != key else key for key in keys]
+    totals = np.bincount(codes, minlength=len(keys))
+    orphans = np.bincount(codes, weights=orphaned, minlength=len(keys)).astype(np.int64)
+
+    groups = {}
+    for key, total, orphan_count in zip(keys, totals.tolist(), orphans.tolist()):
+        group = groups.setdefault(default if key is MISSING else key, [0, 0])
+        group[0] += total
+        group[1] += orphan_count
+    return groups, keys
+
+
+def analyze_type(resources_list):
+    """
+    Collect one type's totals, orphans and per-RG/per-location counts in one vectorized pass.
+    The records are kept as a ResourceTable ('resources'), the orphans as a table of theirs.
+    """
+    table = resources_list if isinstance(resources_list, ResourceTable) else ResourceTable.from_records(resources_list)
+    orphaned = table.column('is_orphaned', dtype=bool)
+    orphans = table.take(np.flatnonzero(orphaned))
+    locations, location_values = _group_counts(table, 'location', orphaned, 'Unknown')
+    resource_groups, _ = _group_counts(table, 'resource_group', orphaned, 'Unknown')
+
+    return {
+        'resources': table,
+        'total': len(table),
+        'orphaned': len(orphans),
+        'orphans': orphans,
+        'locations': locations,              # location -> [total, orphaned], in first-seen order
+        'resource_groups': resource_groups,  # resource group -> [total, orphaned], in first-seen order
+        'location_values': location_values   # distinct raw locations, MISSING for records without one
+    }
+
+
+def _get_entry(identity):
+    with _cache_lock:
+        entry = _cache.get(identity)
+        if entry is not None:
+            _cache.move_to_end(identity)
+        return entry
+
+
+def _put_entry(identity, entry):
+    with _cache_lock:
+        _cache[identity] = entry
+        _cache.move_to_end(identity)
+        while len(_cache) > ANALYSIS_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _get_type(resource_type, content_hash):
+    if content_hash is None:
+        return None
+    key = (resource_type, content_hash, orphan_rules.RULESET_VERSION)
+    with _cache_lock:
+        type_analysis = _type_cache.get(key)
+        if type_analysis is not None:
+            _type_cache.move_to_end(key)
+        return type_analysis
+
+
+def _put_type(resource_type, content_hash, type_analysis):
+    if content_hash is None:
+        return
+    with _cache_lock:
+        key = (resource_type, content_hash, orphan_rules.RULESET_VERSION)
+        _type_cache[key] = type_analysis
+        _type_cache.move_to_end(key)
+        while len(_type_cache) > TYPE_CACHE_SIZE:
+            _type_cache.popitem(last=False)
+
+
+def get_scan_analysis(identity, load_scan, load_index=None, load_type=None):
+    """
+    Get the analysis of every type in a snapshot. `identity` identifies one version of a
+    snapshot (scan ID plus file size and mtime); `load_scan()` returns the parsed scan and
+    is only called on a cache miss. Returns {'timestamp', 'types': {scan key: type analysis}}.
+
+    When the snapshot has an index, `load_index()` returns (timestamp, {scan key: content
+    hash}); types whose content was already analyzed are reused, and only the others are
+    read, one at a time with `load_type(scan key)`.
+    """
+    entry = _get_entry(identity)
+    if entry is not None and entry['complete']:
+        return entry
+
+    if load_index is None:
+        scan_data = load_scan()
+        timestamp = scan_data.get('timestamp')
+        types = {
+            resource_type: analyze_type(resources_list)
+            for resource_type, resources_list in scan_data.get('resources', {}).items()
+            if isinstance(resources_list, list)
+        }
+    else:
+        timestamp, hashes = load_index()
+        types = {}
+        for resource_type, content_hash in hashes.items():
+            type_analysis = _get_type(resource_type, content_hash)
+            if type_analysis is None:
+                resources_list = load_type(resource_type)
+                if not isinstance(resources_list, list):
+                    continue
+                type_analysis = analyze_type(resources_list)
+                _put_type(resource_type, content_hash, type_analysis)
+            types[resource_type] = type_analysis
+
+    entry = {'timestamp': timestamp, 'types': types, 'complete': True}
+    _put_entry(identity, entry)
+    return entry
+
+
+def get_scan_graph(identity, load_scan):
+    """
+    Get the dependency graph of a snapshot, built once per cached analysis. Returns
+    (graph, {node: depth} of resources orphaned through their users).
+    """
+    entry = get_scan_analysis(identity, load_scan)
+    cached = entry.get('graph')
+    if cached is None:
+        graph = resource_graph.build_graph({t: a['resources'] for t, a in entry['types'].items()})
+        cached = entry['graph'] = (graph, resource_graph.propagate_orphans(graph))
+    return cached
+
+
+def get_type_analysis(identity, resource_type, load_type, load_hash=None):
+    """
+    Get the analysis of one type. Served from the snapshot's cached analysis when there is
+    one, or from an earlier scan with the same content when `load_hash()` returns (timestamp,
+    content hash); otherwise `load_type()` returns (timestamp, resources_list) for just that
+    type. The result is added to a partial entry for the snapshot.
+    """
+    entry = _get_entry(identity)
+    if entry is not None and (entry['complete'] or resource_type in entry['types']):
+        return entry['timestamp'], entry['types'].get(resource_type) or analyze_type([])
+
+    content_hash = None
+    type_analysis = None
+    if load_hash is not None:
+        timestamp, content_hash = load_hash()
+        type_analysis = _get_type(resource_type, content_hash)
+    if type_analysis is None:
+        timestamp, resources_list = load_type()
+        type_analysis = analyze_type(resources_list)
+        _put_type(resource_type, content_hash, type_analysis)
+
+    with _cache_lock:
+        entry = _cache.get(identity)
+        if entry is None:
+            entry = {'timestamp': timestamp, 'types': {}, 'complete': False}
+        if not entry['complete']:
+            entry['types'][resource_type] = type_analysis
+    _put_entry(identity, entry)
+    return timestamp, type_analysis
+
+
+def invalidate(scan_id):
+    """Drop every cached version of a snapshot"""
+    with _cache_lock:
+        for identity in [i for i in _cache if i[0] == scan_id]:
+            del _cache[identity]
+
+
+# Projections of a snapshot analysis ({scan key: type analysis}) into the API views
+
+def _get(types, scan_key):
+    return types.get(scan_key) or {'total': 0, 'orphaned': 0, 'orphans': []}
+
+
+def orphan_counts(types):
+    return {k.orphan_key: _get(types, k.scan_key)['orphaned'] for k in RESOURCE_KEYS if k.orphan_key}
+
+
+def complete_resources(types):
+    return {k.complete_key: {'total': _get(types, k.scan_key)['total']} for k in RESOURCE_KEYS if k.complete_key}
+
+
+def availability(types):
+    return {
+        k.slug: {
+            'has_data': _get(types, k.scan_key)['total'] > 0,
+            'count': _get(types, k.scan_key)['total'],
+            'orphaned_count': _get(types, k.scan_key)['orphaned']
+        }
+        for k in RESOURCE_KEYS if k.slug
+    }
+
+
+# Fields of each resource in orphan listings
+ORPHAN_LISTING_FIELDS = ('name', 'resource_group', 'location', 'id')
+
+
+def orphan_details(types, resource_types=None, sections=('count', 'resources'), fields=ORPHAN_LISTING_FIELDS):
+    """
+    Orphan listing per type: {scan key: {'count', 'resources'}}. `resource_types` limits the
+    scan keys, `sections` the per-type keys and `fields` the fields of each listed resource;
+    resources are only listed when 'resources' is requested.
+    """
+    defaults = {'name': 'N/A', 'resource_group': 'N/A', 'location': 'N/A', 'id': ''}
+    details = {}
+    for resource_type, type_analysis in types.items():
+        if not type_analysis['orphaned'] or (resource_types is not None and resource_type not in resource_types):
+            continue
+        detail = {}
+        if 'count' in sections:
+            detail['count'] = type_analysis['orphaned']
+        if 'resources' in sections:
+            detail['resources'] = [
+                {field: r.get(field, defaults[field]) for field in fields}
+                for r in type_analysis['orphans']
+            ]
+        details[resource_type] = detail
+    return details
@@ -0,0 +1,147 @@
+"""
+Scan Diff
+Compares two snapshots per resource type: new orphans, cleaned-up orphans and state flips
+"""
+
+import threading
+from collections import OrderedDict
+
+DIFF_CACHE_SIZE = 32
+
+# Change kinds reported for each resource
+NEW_ORPHAN = 'new_orphan'              # added since the older scan and already orphaned
+BECAME_ORPHANED = 'became_orphaned'    # present in both, active -> orphaned
+DELETED_ORPHAN = 'deleted_orphan'      # orphaned in the older scan and gone now
+REATTACHED = 'reattached'              # present in both, orphaned -> active
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _entry(resource, change):
+    return {
+        'id': resource.get('id', ''),
+        'name': resource.get('name', 'N/A'),
+        'resource_group': resource.get('resource_group', 'N/A'),
+        'location': resource.get('location', 'N/A'),
+        'change': change
+    }
+
+
+def diff_resource_lists(old_resources, new_resources, old_is_build_side=None):
+    """
+    Hash-join the records of one resource type in two scans on lower-cased resource ID in a
+    single pass. The hash table is built on the smaller side and the other side is streamed
+    against it, so either side may be an iterator. Without `old_is_build_side`, both sides
+    must be lists and their lengths decide.
+    """
+    if old_is_build_side is None:
+        old_is_build_side = len(old_resources) <= len(new_resources)
+    build_side, probe_side = (old_resources, new_resources) if old_is_build_side else (new_resources, old_resources)
+    table = {r.get('id', '').lower(): r for r in build_side}
+
+    result = {'new_orphans': [], 'cleaned_up': [], 'flipped': []}
+    added = removed = 0
+
+    for probe in probe_side:
+        match = table.pop(probe.get('id', '').lower(), None)
+        old, new = (match, probe) if old_is_build_side else (probe, match)
+
+        if old is None:
+            added += 1
+            if new.get('is_orphaned'):
+                result['new_orphans'].append(_entry(new, NEW_ORPHAN))
+        elif new is None:
+            removed += 1
+            if old.get('is_orphaned'):
+                result['cleaned_up'].append(_entry(old, DELETED_ORPHAN))
+        elif bool(old.get('is_orphaned')) != bool(new.get('is_orphaned')):
+            if new.get('is_orphaned'):
+                entry = _entry(new, BECAME_ORPHANED)
+                result['new_orphans'].append(entry)
+            else:
+                entry = _entry(new, REATTACHED)
+                result['cleaned_up'].append(entry)
+            result['flipped'].append(entry)
+
+    # Whatever is left in the table exists only on the build side
+    for leftover in table.values():
+        if old_is_build_side:
+            removed += 1
+            if leftover.get('is_orphaned'):
+                result['cleaned_up'].append(_entry(leftover, DELETED_ORPHAN))
+        else:
+            added += 1
+            if leftover.get('is_orphaned'):
+                result['new_orphans'].append(_entry(leftover, NEW_ORPHAN))
+
+    result['summary'] = {
+        'new_orphans': len(result['new_orphans']),
+        'cleaned_up': len(result['cleaned_up']),
+        'flipped': len(result['flipped']),
+        'added': added,
+        'removed': removed
+    }
+    return result
+
+
+def diff_scans(from_scan_id, to_scan_id, resource_types, load_resources, count_resources=None, versions=None):
+    """
+    Diff two scans type by type. `load_resources(scan_id, resource_type)` returns one type's
+    records as a list or an iterator. With `count_resources(scan_id, resource_type)`, only the
+    smaller side of each type is held in memory and the other is streamed; without it, both
+    sides are loaded as lists. Results are cached per pair and `versions` (e.g. the size and
+    mtime of both scans), so a rewritten scan is never answered from the cache.
+    """
+    cache_key = (from_scan_id, to_scan_id, tuple(resource_types), versions)
+    with _cache_lock:
+        if cache_key in _cache:
+            _cache.move_to_end(cache_key)
+            return _cache[cache_key]
+
+    summary = {'new_orphans': 0, 'cleaned_up': 0, 'flipped': 0, 'added': 0, 'removed': 0}
+    types = {}
+    for resource_type in resource_types:
+        if count_resources is None:
+            type_diff = diff_resource_lists(
+                list(load_resources(from_scan_id, resource_type)),
+                list(load_resources(to_scan_id, resource_type))
+            )
+        else:
+            type_diff = diff_resource_lists(
+                load_resources(from_scan_id, resource_type),
+                load_resources(to_scan_id, resource_type),
+                count_resources(from_scan_id, resource_type) <= count_resources(to_scan_id, resource_type)
+            )
+        for key in summary:
+            summary[key] += type_diff['summary'][key]
+        if any(type_diff['summary'].values()):
+            types[resource_type] = type_diff
+
+    result = {
+        'from_scan': from_scan_id,
+        'to_scan': to_scan_id,
+        'summary': summary,
+        'types': types
+    }
+
+    with _cache_lock:
+        _cache[cache_key] = result
+        while len(_cache) > DIFF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def invalidate(scan_id):
+    """Drop every cached diff involving a scan"""
+    with _cache_lock:
+        for key in [k for k in _cache if scan_id in (k[0], k[1])]:
+            del _cache[key]
+
+
+def iter_diff_rows(diff):
+    """Flatten a scan diff into one row per changed resource (for CSV export)"""
+    for resource_type, type_diff in diff['types'].items():
+        for section in ('new_orphans', 'cleaned_up'):
+            for entry in type_diff[section]:
+                yield {'resource_type': resource_type, **entry}
@@ -0,0 +1,81 @@
+"""
+Scan Export
+Streaming CSV and NDJSON writers for orphan lists, inventories and recommendations
+"""
+
+import csv
+import io
+
+import json_codec
+
+# Export format -> mimetype
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+# Rows are buffered and sent in chunks of this size
+CHUNK_ROWS = 1000
+
+# CSV columns per dataset; NDJSON rows carry the full record
+ORPHAN_FIELDS = ['resource_type', 'name', 'resource_group', 'location', 'id']
+INVENTORY_FIELDS = ['resource_type', 'name', 'resource_group', 'location', 'is_orphaned', 'id']
+RECOMMENDATION_FIELDS = ['resource_type', 'priority', 'type', 'resource', 'current_state',
+                         'suggestion', 'potential_saving', 'impact']
+
+
+def orphan_rows(resources):
+    """Turn (type, resource) pairs of orphaned resources into export rows"""
+    for resource_type, resource in resources:
+        yield {
+            'resource_type': resource_type,
+            'name': resource.get('name', 'N/A'),
+            'resource_group': resource.get('resource_group', 'N/A'),
+            'location': resource.get('location', 'N/A'),
+            'id': resource.get('id', '')
+        }
+
+
+def inventory_rows(resources):
+    """Turn (type, resource) pairs into export rows keeping every property"""
+    for resource_type, resource in resources:
+        yield {'resource_type': resource_type, **resource}
+
+
+def iter_csv(rows, fieldnames):
+    """Encode rows as CSV, yielding one chunk per CHUNK_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(rows):
+    """Encode rows as newline-delimited JSON, yielding one chunk per CHUNK_ROWS rows"""
+    lines = []
+    for row in rows:
+        lines.append(json_codec.dumps(row))
+        if len(lines) == CHUNK_ROWS:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+
+def stream_rows(rows, export_format, fieldnames):
+    """Encode rows in the requested export format"""
+    if export_format == 'csv':
+        return iter_csv(rows, fieldnames)
+    if export_format == 'ndjson':
+        return iter_ndjson(rows)
+    raise ValueError(f'Invalid export format: {export_format}')
@@ -0,0 +1,283 @@
+"""
+Scan I/O
+Writes scan JSON files with a byte-offset index so a single resource type can be
+read without parsing the whole scan. The index also holds a content hash of each type's
+array, so a type that did not change between scans can be recognized without reading it.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+from functools import lru_cache
+
+import json_codec
+
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 2
+HASH_SIZE = 16
+
+# Strings (with escapes) and structural characters; everything else is skipped
+_TOKEN_PATTERN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}:]')
+_WHITESPACE_PATTERN = re.compile(r'\s*')
+_decoder = json.JSONDecoder()
+
+
+def get_index_path(filepath):
+    return filepath + INDEX_SUFFIX
+
+
+def content_hash(data):
+    """Hash of one resource type array as stored in the scan file"""
+    return hashlib.blake2b(data, digest_size=HASH_SIZE).hexdigest()
+
+
+def _indent(text, level):
+    """Re-indent a pretty-printed JSON fragment so it nests at the given level"""
+    return text.replace(b'\n', b'\n' + b'  ' * level)
+
+
+def write_scan_file(filepath, scan_data):
+    """
+    Write a scan as pretty-printed JSON (the layout of json.dump(indent=2)) along with the
+    offsets and content hash of each resource type array. Encoding goes through json_codec,
+    so numpy and pandas values are written without a conversion pass.
+    """
+    index = {'version': INDEX_VERSION, 'meta': {}, 'types': {}}
+    items = list(scan_data.items())
+
+    with open(filepath, 'wb') as f:
+        f.write(b'{')
+        for position, (key, value) in enumerate(items):
+            f.write(b'\n  ' + json_codec.dumps(key) + b': ')
+
+            if key == 'resources' and isinstance(value, dict):
+                f.write(b'{')
+                for type_position, (resource_type, resources_list) in enumerate(value.items()):
+                    f.write(b'\n    ' + json_codec.dumps(resource_type) + b': ')
+                    start = f.tell()
+                    data = _indent(json_codec.dumps(resources_list, indent=True), 2)
+                    f.write(data)
+                    index['types'][resource_type] = {
+                        'start': start,
+                        'end': f.tell(),
+                        'count': len(resources_list) if isinstance(resources_list, list) else None,
+                        'hash': content_hash(data)
+                    }
+                    if type_position < len(value) - 1:
+                        f.write(b',')
+                f.write(b'\n  }' if value else b'}')
+            else:
+                index['meta'][key] = value
+                f.write(_indent(json_codec.dumps(value, indent=True), 1))
+
+            if position < len(items) - 1:
+                f.write(b',')
+        f.write(b'\n}')
+        index['size'] = f.tell()
+
+    _write_index(filepath, index)
+    return index
+
+
+def replace_scan_file(filepath, scan_data):
+    """Rewrite an existing scan through a temporary file, so readers never see a partial scan"""
+    tmp_path = filepath + '.tmp'
+    index = write_scan_file(tmp_path, scan_data)
+    # The index goes first: a reader that pairs it with the old file sees a size mismatch and rebuilds
+    os.replace(get_index_path(tmp_path), get_index_path(filepath))
+    os.replace(tmp_path, filepath)
+    return index
+
+
+def _write_index(filepath, index):
+    """Atomically write the offset index next to the scan file"""
+    index_path = get_index_path(filepath)
+    tmp_path = index_path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(json_codec.dumps(index))
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"Warning: Could not write scan index for {filepath}: {e}")
+
+
+def _skip(text, pos, expected=None):
+    """Skip whitespace and optionally one expected character"""
+    pos = _WHITESPACE_PATTERN.match(text, pos).end()
+    if expected is not None:
+        if text[pos:pos + 1] != expected:
+            raise ValueError(f'Expected {expected!r} at offset {pos}')
+        pos += 1
+    return pos
+
+
+def _index_ascii_text(text, index):
+    """
+    Walk the top-level object with the C JSON scanner. Character offsets equal byte
+    offsets because the text is pure ASCII (the default for json.dump).
+    """
+    pos = _skip(text, _skip(text, 0, '{'))
+    if text[pos] == '}':
+        return
+
+    while True:
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _skip(text, _skip(text, pos, ':'))
+
+        if key == 'resources' and text[pos] == '{':
+            pos = _skip(text, pos + 1)
+            while text[pos] != '}':
+                resource_type, pos = _decoder.raw_decode(text, pos)
+                start = _skip(text, _skip(text, pos, ':'))
+                resources_list, pos = _decoder.raw_decode(text, start)
+                index['types'][resource_type] = {
+                    'start': start,
+                    'end': pos,
+                    'count': len(resources_list) if isinstance(resources_list, list) else None
+                }
+                del resources_list
+                pos = _skip(text, pos)
+                if text[pos] == ',':
+                    pos = _skip(text, pos + 1)
+            pos += 1
+        else:
+            value, pos = _decoder.raw_decode(text, pos)
+            if not isinstance(value, (dict, list)):
+                index['meta'][key] = value
+
+        pos = _skip(text, pos)
+        if text[pos] == '}':
+            return
+        pos = _skip(text, _skip(text, pos, ','))
+
+
+def _index_with_tokenizer(mm, index):
+    """Find the resource type arrays by tokenizing strings and brackets (works for any encoding)"""
+    depth = 0
+    last_string = None
+    top_key = None
+    type_key = None
+    type_start = None
+
+    for match in _TOKEN_PATTERN.finditer(mm):
+        token = match.group()
+        first = token[0]
+
+        if first == 0x22:  # string
+            last_string = token
+        elif first == 0x3A:  # ':' - the last string was a key
+            key = json.loads(last_string)
+            if depth == 1:
+                top_key = key
+                if key != 'resources':
+                    text = mm[match.end():match.end() + 4096].decode('utf-8', 'ignore').lstrip()
+                    if text[:1] not in ('{', '['):
+                        index['meta'][key] = _decoder.raw_decode(text)[0]
+            elif depth == 2 and top_key == 'resources':
+                type_key = key
+        elif first in (0x7B, 0x5B):  # '{' or '['
+            depth += 1
+            if depth == 3 and top_key == 'resources' and type_key is not None:
+                type_start = match.start()
+        else:  # '}' or ']'
+            if depth == 3 and type_start is not None:
+                index['types'][type_key] = {'start': type_start, 'end': match.end(), 'count': None}
+                type_key = None
+                type_start = None
+            depth -= 1
+
+
+def build_scan_index(filepath):
+    """
+    Index an existing scan file once (files written before indexes existed, or whose
+    index was lost) so later reads can jump straight to a resource type.
+    """
+    index = {'version': INDEX_VERSION, 'meta': {}, 'types': {}}
+
+    with open(filepath, 'rb') as f:
+        index['size'] = os.fstat(f.fileno()).st_size
+        if index['size'] == 0:
+            return index
+
+        data = f.read()
+        try:
+            text = data.decode('ascii')
+        except UnicodeDecodeError:
+            text = None
+        del data
+
+        is_ascii = text is not None
+        if is_ascii:
+            _index_ascii_text(text, index)
+        del text
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if not is_ascii:
+                _index_with_tokenizer(mm, index)
+            for entry in index['types'].values():
+                entry['hash'] = content_hash(mm[entry['start']:entry['end']])
+
+    _write_index(filepath, index)
+    return index
+
+
+@lru_cache(maxsize=128)
+def _load_index(filepath, size, mtime_ns):
+    index_path = get_index_path(filepath)
+    try:
+        with open(index_path, 'rb') as f:
+            index = json_codec.loads(f.read())
+        if index.get('version') == INDEX_VERSION and index.get('size') == size:
+            return index
+    except (OSError, ValueError):
+        pass
+    return build_scan_index(filepath)
+
+
+def get_scan_index(filepath):
+    """Get the offset index of a scan file, building it if missing or stale"""
+    stat = os.stat(filepath)
+    return _load_index(filepath, stat.st_size, stat.st_mtime_ns)
+
+
+def read_scan_metadata(filepath):
+    """Get the top-level fields of a scan (subscription_id, timestamp...) without reading resources"""
+    return dict(get_scan_index(filepath)['meta'])
+
+
+def get_resource_types(filepath):
+    """List the resource types present in a scan file"""
+    return list(get_scan_index(filepath)['types'])
+
+
+def get_type_hashes(filepath):
+    """Get {resource type: content hash} of a scan file"""
+    return {resource_type: entry['hash'] for resource_type, entry in get_scan_index(filepath)['types'].items()}
+
+
+def read_resource_type(filepath, resource_type):
+    """Decode only one resource type array from a scan file"""
+    entry = get_scan_index(filepath)['types'].get(resource_type)
+    if entry is None:
+        return []
+
+    with open(filepath, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return json_codec.loads(mm[entry['start']:entry['end']])
+
+
+def iter_resource_types(filepath):
+    """Yield (resource_type, resources) one type at a time, keeping peak memory to the largest type"""
+    for resource_type in get_resource_types(filepath):
+        yield resource_type, read_resource_type(filepath, resource_type)
+
+
+def delete_scan_file(filepath):
+    """Remove a scan file and its offset index"""
+    for path in (filepath, get_index_path(filepath)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
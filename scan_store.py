@@ -0,0 +1,632 @@
+"""
+Scan Store
+SQLite-backed storage for Azure scans with normalized, indexed resource rows
+"""
+
+import base64
+import hashlib
+import json
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+# Columns promoted out of each resource record; everything else is kept in `extra`
+NORMALIZED_FIELDS = ('id', 'name', 'resource_group', 'location', 'is_orphaned')
+
+# Typeahead search needs at least this many characters for substring (trigram) matches
+MIN_SUBSTRING_SEARCH = 3
+
+# Sort keys for paged orphan listings; 'scan' keeps the order resources had in the scan file
+SORT_COLUMNS = {
+    'scan': None,
+    'name': 'name',
+    'resource_group': 'resource_group',
+    'location': 'location'
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    subscription_id TEXT,
+    timestamp TEXT,
+    resource_count INTEGER NOT NULL DEFAULT 0,
+    ingested_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS resources (
+    scan_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    id TEXT,
+    name TEXT,
+    resource_group TEXT,
+    location TEXT,
+    is_orphaned INTEGER,
+    extra TEXT NOT NULL DEFAULT '{}',
+    sku TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_resources_scan_id
+    ON resources (scan_id, id COLLATE NOCASE);
+
+-- Keyset pagination of orphan listings, one index per sort key; also serve (scan, type[, orphaned]) lookups
+CREATE INDEX IF NOT EXISTS idx_resources_page_name
+    ON resources (scan_id, type, is_orphaned, name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_resources_page_rg
+    ON resources (scan_id, type, is_orphaned, resource_group COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_resources_page_location
+    ON resources (scan_id, type, is_orphaned, location COLLATE NOCASE);
+
+-- Filters across types: listings and ad-hoc queries (see resource_query). Resource groups and
+-- locations compare case-insensitively, like Azure names
+CREATE INDEX IF NOT EXISTS idx_resources_query_orphaned
+    ON resources (scan_id, is_orphaned);
+CREATE INDEX IF NOT EXISTS idx_resources_query_rg
+    ON resources (scan_id, resource_group COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_resources_query_location
+    ON resources (scan_id, location COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_resources_query_sku
+    ON resources (scan_id, type, sku COLLATE NOCASE);
+
+-- Typeahead search: name prefixes, then the per-scan trigram index (see search_resources)
+CREATE INDEX IF NOT EXISTS idx_resources_search_name
+    ON resources (scan_id, name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS search_indexes (
+    scan_id TEXT PRIMARY KEY,
+    table_name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS scan_rollups (
+    mode TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    period_hours INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    scan_count INTEGER NOT NULL,
+    total_sum INTEGER NOT NULL,
+    total_min INTEGER NOT NULL,
+    total_max INTEGER NOT NULL,
+    orphaned_sum INTEGER NOT NULL,
+    orphaned_min INTEGER NOT NULL,
+    orphaned_max INTEGER NOT NULL,
+    PRIMARY KEY (mode, period_start, period_hours, type)
+);
+
+-- Scans already folded into scan_rollups, so a repeated compaction never counts one twice
+CREATE TABLE IF NOT EXISTS compacted_scans (
+    scan_id TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    period_hours INTEGER NOT NULL
+);
+"""
+
+
+# Indexes of older versions that the current ones make redundant
+DROPPED_INDEXES = (
+    'idx_resources_scan_type_orphaned',  # prefix of the idx_resources_page_* indexes
+    'idx_resources_scan_rg',             # binary-collation copies of idx_resources_query_rg/location
+    'idx_resources_scan_location',
+)
+
+
+def _migrate(conn):
+    """Bring stores created by older versions up to the current schema"""
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(resources)')}
+    if columns and 'sku' not in columns:
+        with conn:
+            conn.execute('ALTER TABLE resources ADD COLUMN sku TEXT')
+            conn.execute(
+                "UPDATE resources SET sku = COALESCE(json_extract(extra, '$.sku'), json_extract(extra, '$.sku_name'))"
+            )
+
+    dropped = [row['name'] for row in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'index' AND name IN ({', '.join('?' * len(DROPPED_INDEXES))})",
+        DROPPED_INDEXES
+    )]
+    if dropped:
+        with conn:
+            for name in dropped:
+                conn.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def get_connection(db_path):
+    """Open a connection to the scan store, creating the schema if needed"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    _migrate(conn)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _to_row(scan_id, resource_type, resource):
+    """Split a resource record into normalized columns and the extra JSON blob"""
+    extra = {}
+    for key, value in resource.items():
+        # Keep explicit nulls for normalized fields in extra so they round-trip
+        if key not in NORMALIZED_FIELDS or value is None:
+            extra[key] = value
+
+    is_orphaned = resource.get('is_orphaned')
+    return (
+        scan_id,
+        resource_type,
+        resource.get('id'),
+        resource.get('name'),
+        resource.get('resource_group'),
+        resource.get('location'),
+        None if is_orphaned is None else int(bool(is_orphaned)),
+        json.dumps(extra, separators=(',', ':')),
+        # Indexed copy of the SKU for queries; the record keeps its own field in `extra`
+        resource.get('sku') or resource.get('sku_name')
+    )
+
+
+def _from_row(row):
+    """Rebuild the original resource record from a stored row"""
+    resource = {}
+    for key in ('id', 'name', 'resource_group', 'location'):
+        if row[key] is not None:
+            resource[key] = row[key]
+    resource.update(json.loads(row['extra']))
+    if row['is_orphaned'] is not None:
+        resource['is_orphaned'] = bool(row['is_orphaned'])
+    return resource
+
+
+def ingest_scan(db_path, scan_id, metadata, resources, mode):
+    """
+    Store every resource of a scan as normalized rows, replacing any previous copy.
+    `resources` is an iterable of (resource_type, resources_list) pairs so large scans
+    can be streamed in one type at a time.
+    """
+    resource_count = 0
+
+    with closing(get_connection(db_path)) as conn:
+        with conn:
+            _drop_search_index(conn, scan_id)
+            conn.execute('DELETE FROM resources WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM scans WHERE scan_id = ?', (scan_id,))
+            for resource_type, resources_list in resources:
+                if not isinstance(resources_list, list):
+                    continue
+                conn.executemany(
+                    'INSERT INTO resources (scan_id, type, id, name, resource_group, location, is_orphaned, extra, sku) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (_to_row(scan_id, resource_type, r) for r in resources_list)
+                )
+                resource_count += len(resources_list)
+            conn.execute(
+                'INSERT INTO scans (scan_id, mode, subscription_id, timestamp, resource_count, ingested_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (scan_id, mode, metadata.get('subscription_id'), metadata.get('timestamp'),
+                 resource_count, datetime.now().isoformat())
+            )
+    return resource_count
+
+
+def get_scan(db_path, scan_id):
+    """Get catalog metadata for an ingested scan, or None if it was never ingested"""
+    with closing(get_connection(db_path)) as conn:
+        row = conn.execute('SELECT * FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def delete_scan(db_path, scan_id):
+    """Remove a scan, its resource rows and its search index"""
+    with closing(get_connection(db_path)) as conn:
+        with conn:
+            _drop_search_index(conn, scan_id)
+            conn.execute('DELETE FROM resources WHERE scan_id = ?', (scan_id,))
+            conn.execute('DELETE FROM scans WHERE scan_id = ?', (scan_id,))
+
+
+def get_resources(db_path, scan_id, resource_type, is_orphaned=None, resource_group=None, location=None):
+    """
+    Get the resources of one type from a scan, optionally filtered on indexed columns.
+    Resource group and location match case-insensitively, like Azure names.
+    """
+    query = 'SELECT * FROM resources WHERE scan_id = ? AND type = ?'
+    params = [scan_id, resource_type]
+
+    if is_orphaned is not None:
+        query += ' AND is_orphaned = ?'
+        params.append(int(bool(is_orphaned)))
+    if resource_group is not None:
+        query += ' AND resource_group = ? COLLATE NOCASE'
+        params.append(resource_group)
+    if location is not None:
+        query += ' AND location = ? COLLATE NOCASE'
+        params.append(location)
+
+    # Keep the order resources had in the scan file
+    query += ' ORDER BY rowid'
+
+    with closing(get_connection(db_path)) as conn:
+        return [_from_row(row) for row in conn.execute(query, params)]
+
+
+def _from_normalized_row(row):
+    """A record of only the normalized fields of a plain (type, id, name, resource_group,
+    location, is_orphaned) tuple, without decoding `extra`"""
+    _, resource_id, name, resource_group, location, is_orphaned = row
+    resource = {}
+    if resource_id is not None:
+        resource['id'] = resource_id
+    if name is not None:
+        resource['name'] = name
+    if resource_group is not None:
+        resource['resource_group'] = resource_group
+    if location is not None:
+        resource['location'] = location
+    if is_orphaned is not None:
+        resource['is_orphaned'] = bool(is_orphaned)
+    return resource
+
+
+def iter_resources(db_path, scan_id, resource_type=None, is_orphaned=None, batch_size=1000, normalized_only=False):
+    """
+    Stream (type, resource) pairs of a scan in scan-file order, fetching `batch_size` rows
+    at a time so exports never hold a whole scan in memory. With normalized_only, records
+    only carry NORMALIZED_FIELDS and the `extra` JSON of each row is never read.
+    """
+    columns = 'type, id, name, resource_group, location, is_orphaned' + ('' if normalized_only else ', extra')
+    query = f'SELECT {columns} FROM resources WHERE scan_id = ?'
+    params = [scan_id]
+    if resource_type is not None:
+        query += ' AND type = ?'
+        params.append(resource_type)
+    if is_orphaned is not None:
+        query += ' AND is_orphaned = ?'
+        params.append(int(bool(is_orphaned)))
+    query += ' ORDER BY rowid'
+
+    with closing(get_connection(db_path)) as conn:
+        cursor = conn.cursor()
+        if normalized_only:
+            # Plain tuples: the rows are unpacked positionally
+            cursor.row_factory = None
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if normalized_only:
+                for row in rows:
+                    yield row[0], _from_normalized_row(row)
+            else:
+                for row in rows:
+                    yield row['type'], _from_row(row)
+
+
+def encode_cursor(sort, value, rowid):
+    """Opaque cursor pointing just past the last row of a page"""
+    payload = json.dumps([sort, value, rowid], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Decode a cursor into (value, rowid); raises ValueError for cursors of another sort"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, rowid = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort or not isinstance(rowid, int):
+        raise ValueError('Cursor does not match the requested sort')
+    return value, rowid
+
+
+def _keyset_segments(column, descending, value, rowid):
+    """
+    WHERE clauses that resume after (value, rowid) in ORDER BY column, rowid. SQLite sorts
+    NULLs first, so the rest of the listing can span a non-NULL range and the NULL rows;
+    each segment is a plain index range and they are read in order until the page is full.
+    """
+    if column is None:
+        return [(f'rowid {"<" if descending else ">"} ?', [rowid])]
+    if value is None:
+        if descending:
+            return [(f'{column} IS NULL AND rowid < ?', [rowid])]
+        return [(f'{column} IS NULL AND rowid > ?', [rowid]), (f'{column} IS NOT NULL', [])]
+    if descending:
+        return [
+            (f'{column} <= ? COLLATE NOCASE AND ({column} COLLATE NOCASE, rowid) < (?, ?)', [value, value, rowid]),
+            (f'{column} IS NULL', [])
+        ]
+    return [(f'{column} >= ? COLLATE NOCASE AND ({column} COLLATE NOCASE, rowid) > (?, ?)', [value, value, rowid])]
+
+
+def get_orphan_page(db_path, scan_id, resource_type, resource_group=None, location=None, name_prefix=None,
+                    sort='name', cursor=None, limit=100):
+    """
+    Get one page of a type's orphaned resources using keyset pagination over the page
+    indexes, so a page costs O(limit) no matter how deep it is. `sort` is a key of
+    SORT_COLUMNS, prefixed with '-' for descending order.
+    Returns {'resources', 'count' (all matching rows), 'next_cursor' (None on the last page)}.
+    """
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    if sort_key not in SORT_COLUMNS:
+        raise ValueError(f'Invalid sort: {sort}')
+    column = SORT_COLUMNS[sort_key]
+
+    where = ['scan_id = ?', 'type = ?', 'is_orphaned = 1']
+    params = [scan_id, resource_type]
+    if resource_group is not None:
+        where.append('resource_group = ? COLLATE NOCASE')
+        params.append(resource_group)
+    if location is not None:
+        where.append('location = ? COLLATE NOCASE')
+        params.append(location)
+    if name_prefix:
+        # Range scan on the NOCASE name index instead of LIKE
+        where.append('name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE')
+        params.extend([name_prefix, name_prefix + '\U0010ffff'])
+
+    segments = _keyset_segments(column, descending, *decode_cursor(cursor, sort)) if cursor else [('1', [])]
+    direction = 'DESC' if descending else 'ASC'
+    order_by = f'rowid {direction}' if column is None else f'{column} COLLATE NOCASE {direction}, rowid {direction}'
+
+    rows = []
+    with closing(get_connection(db_path)) as conn:
+        count = conn.execute(f'SELECT COUNT(*) FROM resources WHERE {" AND ".join(where)}', params).fetchone()[0]
+        for condition, condition_params in segments:
+            if len(rows) > limit:
+                break
+            rows.extend(conn.execute(
+                f'SELECT rowid, * FROM resources WHERE {" AND ".join(where)} AND {condition} '
+                f'ORDER BY {order_by} LIMIT ?',
+                params + condition_params + [limit + 1 - len(rows)]
+            ).fetchall())
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, None if column is None else last[sort_key], last['rowid'])
+
+    return {
+        'resources': [_from_row(row) for row in rows],
+        'count': count,
+        'next_cursor': next_cursor
+    }
+
+
+def query_resources(db_path, scan_id, condition, params, cursor=None, limit=100):
+    """
+    Get one page of a scan's resources matching a compiled query condition (see
+    resource_query), in scan-file order across types.
+    Returns {'resources': [{'type', 'resource'}], 'count', 'next_cursor'}.
+    """
+    where = f'scan_id = ? AND ({condition})'
+    page_where = where
+    page_params = [scan_id] + params
+    if cursor:
+        page_where += ' AND rowid > ?'
+        page_params.append(decode_cursor(cursor, 'scan')[1])
+
+    with closing(get_connection(db_path)) as conn:
+        count = conn.execute(f'SELECT COUNT(*) FROM resources WHERE {where}', [scan_id] + params).fetchone()[0]
+        rows = conn.execute(
+            f'SELECT rowid, * FROM resources WHERE {page_where} ORDER BY rowid LIMIT ?',
+            page_params + [limit + 1]
+        ).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor('scan', None, rows[-1]['rowid'])
+
+    return {
+        'resources': [{'type': row['type'], 'resource': _from_row(row)} for row in rows],
+        'count': count,
+        'next_cursor': next_cursor
+    }
+
+
+def _search_table(scan_id):
+    return 'search_' + hashlib.blake2b(scan_id.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _build_search_index(conn, scan_id):
+    """
+    Build the trigram index of a scan's names and IDs in its own write transaction, unless
+    another connection built it first. Each scan gets its own FTS5 table, so matching never
+    touches other scans and dropping a scan is a DROP TABLE. The table is external-content
+    over `resources`: it holds only the trigrams, and matches are joined back to their rows.
+    Without FTS5 trigram support (SQLite < 3.34) the catalog records no table and search
+    falls back to LIKE scans.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if conn.execute('SELECT 1 FROM search_indexes WHERE scan_id = ?', (scan_id,)).fetchone() is None:
+            table = _search_table(scan_id)
+            try:
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                    f"name, id, content='resources', content_rowid='rowid', tokenize='trigram')"
+                )
+            except sqlite3.OperationalError:
+                table = None
+            else:
+                conn.execute(
+                    f'INSERT INTO {table} (rowid, name, id) SELECT rowid, name, id FROM resources WHERE scan_id = ?',
+                    (scan_id,)
+                )
+            conn.execute('INSERT OR REPLACE INTO search_indexes (scan_id, table_name) VALUES (?, ?)', (scan_id, table))
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def build_search_index(db_path, scan_id, mode=None):
+    """
+    Build a scan's search index ahead of its first search, e.g. once a new scan has been
+    saved. With `mode`, the indexes of the mode's other scans are dropped, since search only
+    looks at the latest scan; older scans are indexed again if they ever become the latest.
+    """
+    with closing(get_connection(db_path)) as conn:
+        if mode is not None:
+            older = [row['scan_id'] for row in conn.execute(
+                'SELECT s.scan_id FROM search_indexes s JOIN scans USING (scan_id) WHERE scans.mode = ? AND s.scan_id != ?',
+                (mode, scan_id)
+            )]
+            if older:
+                with conn:
+                    for other in older:
+                        _drop_search_index(conn, other)
+        _build_search_index(conn, scan_id)
+
+
+def _drop_search_index(conn, scan_id):
+    conn.execute(f'DROP TABLE IF EXISTS {_search_table(scan_id)}')
+    conn.execute('DELETE FROM search_indexes WHERE scan_id = ?', (scan_id,))
+
+
+def _search_match(row):
+    return {
+        'type': row['type'],
+        'name': row['name'],
+        'id': row['id'],
+        'resource_group': row['resource_group'],
+        'location': row['location'],
+        'is_orphaned': None if row['is_orphaned'] is None else bool(row['is_orphaned'])
+    }
+
+
+def search_resources(db_path, scan_id, text, resource_type=None, limit=10):
+    """
+    Typeahead search over a scan's resource names and IDs. Name prefix matches come first
+    (alphabetical, from the NOCASE name index), then names or IDs containing the text (scan
+    order, from the scan's trigram index). Scans ingested before search existed are indexed
+    on first use.
+    """
+    text = text.strip()
+    if not text:
+        return []
+
+    type_filter = ' AND type = ?' if resource_type else ''
+    joined_type_filter = ' AND r.type = ?' if resource_type else ''
+    type_params = [resource_type] if resource_type else []
+
+    with closing(get_connection(db_path)) as conn:
+        matches = [_search_match(row) for row in conn.execute(
+            f'SELECT type, name, id, resource_group, location, is_orphaned FROM resources '
+            f'WHERE scan_id = ? AND name >= ? COLLATE NOCASE AND name < ? COLLATE NOCASE{type_filter} '
+            f'ORDER BY name COLLATE NOCASE LIMIT ?',
+            [scan_id, text, text + '\U0010ffff'] + type_params + [limit]
+        )]
+        if len(matches) >= limit or len(text) < MIN_SUBSTRING_SEARCH:
+            return matches
+
+        catalog = conn.execute('SELECT table_name FROM search_indexes WHERE scan_id = ?', (scan_id,)).fetchone()
+        if catalog is None:
+            _build_search_index(conn, scan_id)
+            catalog = conn.execute('SELECT table_name FROM search_indexes WHERE scan_id = ?', (scan_id,)).fetchone()
+
+        seen = {m['id'] for m in matches}
+        # Enough extra rows to skip the prefix matches found above
+        remaining = limit - len(matches) + len(seen)
+        if catalog['table_name']:
+            table = catalog['table_name']
+            rows = conn.execute(
+                f'SELECT r.type, r.name, r.id, r.resource_group, r.location, r.is_orphaned FROM {table} '
+                f'JOIN resources r ON r.rowid = {table}.rowid WHERE {table} MATCH ?{joined_type_filter} LIMIT ?',
+                # A quoted phrase is a plain substring match for the trigram tokenizer
+                ['"' + text.replace('"', '""') + '"'] + type_params + [remaining]
+            )
+        else:
+            pattern = '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            rows = conn.execute(
+                f"SELECT type, name, id, resource_group, location, is_orphaned FROM resources "
+                f"WHERE scan_id = ? AND (name LIKE ? ESCAPE '\\' OR id LIKE ? ESCAPE '\\'){type_filter} "
+                f"ORDER BY rowid LIMIT ?",
+                [scan_id, pattern, pattern] + type_params + [remaining]
+            )
+        for row in rows:
+            if row['id'] not in seen and len(matches) < limit:
+                seen.add(row['id'])
+                matches.append(_search_match(row))
+    return matches
+
+
+def get_resource_by_id(db_path, scan_id, resource_id):
+    """Look up a single resource in a scan by its Azure resource ID (case-insensitive)"""
+    with closing(get_connection(db_path)) as conn:
+        row = conn.execute(
+            'SELECT * FROM resources WHERE scan_id = ? AND id = ? COLLATE NOCASE',
+            (scan_id, resource_id)
+        ).fetchone()
+    if not row:
+        return None
+    return {'type': row['type'], 'resource': _from_row(row)}
+
+
+def get_type_counts(db_path, scan_id):
+    """Get total and orphaned counts for every resource type in a scan"""
+    with closing(get_connection(db_path)) as conn:
+        rows = conn.execute(
+            'SELECT type, COUNT(*) AS total, COALESCE(SUM(is_orphaned), 0) AS orphaned '
+            'FROM resources WHERE scan_id = ? GROUP BY type',
+            (scan_id,)
+        ).fetchall()
+    return {row['type']: {'total': row['total'], 'orphaned': row['orphaned']} for row in rows}
+
+
+def add_rollup(db_path, mode, scan_id, period_start, period_hours, type_counts):
+    """
+    Fold the per-type counts of a compacted scan into the rollup for its period. A scan is
+    only folded in once: returns False, changing nothing, if it already was.
+    """
+    with closing(get_connection(db_path)) as conn:
+        with conn:
+            # Claimed in the same transaction as the rollup update, so concurrent or repeated
+            # compactions of one scan cannot both add it
+            claimed = conn.execute(
+                'INSERT OR IGNORE INTO compacted_scans (scan_id, mode, period_start, period_hours) '
+                'VALUES (?, ?, ?, ?)',
+                (scan_id, mode, period_start, period_hours)
+            ).rowcount
+            if not claimed:
+                return False
+
+            conn.executemany(
+                'INSERT INTO scan_rollups (mode, period_start, period_hours, type, scan_count, '
+                'total_sum, total_min, total_max, orphaned_sum, orphaned_min, orphaned_max) '
+                'VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (mode, period_start, period_hours, type) DO UPDATE SET '
+                'scan_count = scan_count + 1, '
+                'total_sum = total_sum + excluded.total_sum, '
+                'total_min = MIN(total_min, excluded.total_min), '
+                'total_max = MAX(total_max, excluded.total_max), '
+                'orphaned_sum = orphaned_sum + excluded.orphaned_sum, '
+                'orphaned_min = MIN(orphaned_min, excluded.orphaned_min), '
+                'orphaned_max = MAX(orphaned_max, excluded.orphaned_max)',
+                [
+                    (mode, period_start, period_hours, resource_type,
+                     counts['total'], counts['total'], counts['total'],
+                     counts['orphaned'], counts['orphaned'], counts['orphaned'])
+                    for resource_type, counts in type_counts.items()
+                ]
+            )
+        return True
+
+
+def get_rollups(db_path, mode):
+    """Get the rollups of compacted scans for a mode, oldest period first"""
+    with closing(get_connection(db_path)) as conn:
+        rows = conn.execute(
+            'SELECT * FROM scan_rollups WHERE mode = ? ORDER BY period_start, type', (mode,)
+        ).fetchall()
+
+    rollups = []
+    for row in rows:
+        rollup = dict(row)
+        rollup['total_avg'] = round(row['total_sum'] / row['scan_count'], 1)
+        rollup['orphaned_avg'] = round(row['orphaned_sum'] / row['scan_count'], 1)
+        rollups.append(rollup)
+    return rollups
@@ -0,0 +1,96 @@
+"""
+App Service Plan Analysis Benchmark
+Times the App Service dashboard analysis on a synthetic scan, next to the per-row pandas
+approach it replaced (Series per pricing tier, iterrows for density and list building).
+
+    python -m scripts.benchmark_app_service [--plans 100000] [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+
+import pandas as pd
+
+import app
+from scripts.demo_data_generator import AZURE_REGIONS, RESOURCE_GROUPS
+
+SKUS = [
+    ('F1', 'Free', ''), ('B1', 'Basic', 'Small'), ('S1', 'Standard', 'Small'),
+    ('P1v3', 'PremiumV3', 'Small'), ('P2v3', 'PremiumV3', 'Medium')
+]
+
+
+def generate_plans(count, seed=42):
+    rnd = random.Random(seed)
+    plans = []
+    for i in range(count):
+        sku_name, tier, size = rnd.choice(SKUS)
+        plans.append({
+            'name': f'asp-{i:06d}',
+            'resource_group': rnd.choice(RESOURCE_GROUPS),
+            'location': rnd.choice(AZURE_REGIONS),
+            'sku_name': sku_name,
+            'sku_tier': tier,
+            'sku_size': size,
+            'sku_capacity': rnd.randint(1, 10),
+            'kind': rnd.choice(['app', 'linux', 'functionapp']),
+            'num_apps': rnd.choice([0, 0, 1, 1, 2, 3, 5, 12])
+        })
+    return plans
+
+
+def per_row_analysis(plans_data):
+    """The row-at-a-time steps of the previous implementation, for comparison"""
+    df = app.convert_json_to_app_service_dataframe(plans_data)
+    df[['TIER_NAME', 'SKU', 'INSTANCES']] = df['PRICING TIER'].apply(
+        lambda x: pd.Series(app.parse_pricing_tier(x))
+    )
+    density = []
+    for _, row in df.iterrows():
+        apps_per_instance = row['APPS'] / row['INSTANCES'] if row['INSTANCES'] > 0 else 0
+        density.append({'plan_name': row['NAME'], 'density': round(apps_per_instance, 2)})
+    orphaned = []
+    for _, plan in df[df['APPS'] == 0].iterrows():
+        orphaned.append({
+            'name': plan['NAME'],
+            'resource_group': plan['RESOURCE GROUP'],
+            'location': plan['LOCATION'],
+            'id': plan.get('ID', '')
+        })
+    return density, orphaned
+
+
+def vectorized_analysis(plans_data):
+    df = app.parse_pricing_tiers(app.convert_json_to_app_service_dataframe(plans_data))
+    return app.calculate_app_service_density(df), app.analyze_app_service_scan(plans_data)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--plans', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    plans = generate_plans(args.plans)
+    print(f'{args.plans:,} App Service Plans, best of {args.repeat}')
+
+    per_row = best_of(lambda: per_row_analysis(plans), args.repeat)
+    print(f'  per-row parse + density + orphans:  {per_row:8.3f}s')
+    vectorized = best_of(lambda: vectorized_analysis(plans), args.repeat)
+    print(f'  vectorized (incl. full analysis):   {vectorized:8.3f}s  ({per_row / vectorized:.1f}x)')
+    full = best_of(lambda: app.analyze_app_service_scan(plans), args.repeat)
+    print(f'  analyze_app_service_scan:           {full:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
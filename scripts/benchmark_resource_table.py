@@ -0,0 +1,75 @@
+"""
+Resource Table Memory Benchmark
+Measures how much memory a parsed demo scan holds as lists of dicts (the decoded JSON) and
+as the columnar ResourceTables the scan analysis keeps, and times the per-type analysis.
+
+    python -m scripts.benchmark_resource_table [--resources 200000] [--repeat 3]
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+import json_codec
+import scan_analysis
+from resource_table import ResourceTable
+from scripts.demo_data_generator import generate_wasteful_environment
+
+
+def traced(build):
+    """(result of build(), bytes it still holds once built)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--resources', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(42)
+    scan = generate_wasteful_environment(args.resources)
+    # Decode from JSON so records hold their own strings, as they do when a scan file is loaded
+    blob = json_codec.dumps(scan['resources'])
+    del scan
+
+    dicts, dict_bytes = traced(lambda: json_codec.loads(blob))
+    count = sum(len(records) for records in dicts.values())
+    # Built from a decode of their own, so they are not credited with strings the dicts hold
+    tables, table_bytes = traced(
+        lambda: {t: ResourceTable.from_records(records) for t, records in json_codec.loads(blob).items()}
+    )
+
+    print(f'{count:,} resources in {len(dicts)} types')
+    print(f'  lists of dicts:   {dict_bytes / 2**20:8.1f} MiB  ({dict_bytes / count:6.0f} B/resource)')
+    print(f'  resource tables:  {table_bytes / 2**20:8.1f} MiB  ({table_bytes / count:6.0f} B/resource, '
+          f'{dict_bytes / table_bytes:.1f}x smaller)')
+
+    print(f'analysis of every type, best of {args.repeat}')
+    build = best_of(lambda: [ResourceTable.from_records(records) for records in dicts.values()], args.repeat)
+    print(f'  build tables:              {build:8.3f}s')
+    analyze = best_of(lambda: [scan_analysis.analyze_type(table) for table in tables.values()], args.repeat)
+    print(f'  analyze_type over tables:  {analyze:8.3f}s')
+    rebuild = best_of(lambda: [list(table) for table in tables.values()], args.repeat)
+    print(f'  rebuild every record:      {rebuild:8.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -624,8 +624,50 @@ def generate_wasteful_environment(target_resources=1000):
     
     data['resources']['resource_groups'] = resource_groups
     
+    link_resources(data['resources'])
+    
     return data
 
+def link_resources(resources):
+    """
+    Wire up the references the production scanner records (VM <- NIC <- public IP, disks,
+    subnets, NSGs, route tables, plan apps), consistent with each resource's orphan flag,
+    so the dependency graph has edges to follow in demo mode
+    """
+    vms = resources['virtual_machines']
+    nics = resources['network_interfaces']
+    load_balancers = resources['load_balancers']
+    used_subnets = [s['id'] for s in resources['subnets'] if not s['is_orphaned']]
+    used_nsgs = [n['id'] for n in resources['network_security_groups'] if not n['is_orphaned']]
+    route_tables = [r['id'] for r in resources['route_tables']]
+    
+    for disk in resources['disks']:
+        disk['managed_by'] = random.choice(vms)['id'] if vms and not disk['is_orphaned'] else None
+    
+    for nic in nics:
+        nic['virtual_machine_id'] = random.choice(vms)['id'] if vms and not nic['is_orphaned'] else None
+        nic['subnet_ids'] = [random.choice(used_subnets)] if used_subnets and not nic['is_orphaned'] else []
+        nic['network_security_group_id'] = random.choice(used_nsgs) if used_nsgs and random.random() < 0.3 else None
+    
+    # Attached public IPs sit on a NIC or a load balancer frontend, whether or not that is in use
+    for pip in resources['public_ips']:
+        if pip['is_orphaned'] or not (nics or load_balancers):
+            pip['ip_configuration_id'] = None
+        elif load_balancers and (not nics or random.random() < 0.4):
+            pip['ip_configuration_id'] = random.choice(load_balancers)['id'] + '/frontendIPConfigurations/LoadBalancerFrontEnd'
+        else:
+            pip['ip_configuration_id'] = random.choice(nics)['id'] + '/ipConfigurations/ipconfig1'
+    
+    for subnet in resources['subnets']:
+        subnet['network_security_group_id'] = random.choice(used_nsgs) if used_nsgs and random.random() < 0.5 else None
+        subnet['route_table_id'] = random.choice(route_tables) if route_tables and random.random() < 0.3 else None
+    
+    for plan in resources['app_service_plans']:
+        plan['app_ids'] = [
+            generate_resource_id('Microsoft.Web/sites', plan['resource_group'], f"{plan['name']}-app-{n}")
+            for n in range(plan['number_of_sites'])
+        ]
+
 def save_demo_data(data, filename=None):
     """Save demo data to JSON file"""
     import os
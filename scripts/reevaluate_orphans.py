@@ -0,0 +1,36 @@
+"""
+Re-evaluate Orphan Rules
+Re-applies the current orphan rules (orphan_rules.py) to every saved scan, offline, from the
+raw properties stored with each record. Scans whose verdicts change are rewritten in the
+scan files, the SQLite store, the snapshot history and the trend series.
+
+    python -m scripts.reevaluate_orphans [--mode demo|production] [--dry-run]
+"""
+
+import argparse
+import time
+
+import app
+import orphan_rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=['demo', 'production'], help='only scans of this mode (default: all)')
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing them')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = app.reevaluate_scans(args.mode, write=not args.dry_run)
+    elapsed = time.perf_counter() - start
+
+    print(f'Ruleset version {orphan_rules.RULESET_VERSION}{" (dry run)" if args.dry_run else ""}')
+    for result in results:
+        evaluated = sum(counts['evaluated'] for counts in result['types'].values())
+        status = 'updated' if result['updated'] else 'unchanged'
+        print(f"  {result['scan_id']}: {evaluated:,} evaluated, {result['changed']:,} changed ({status})")
+    print(f'{len(results)} scan(s) in {elapsed:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+"""
+Production server for platforms without fork (Windows): one process served by waitress
+with a thread pool. On Linux, prefer gunicorn (see gunicorn.conf.py).
+
+Tunables (environment):
+  PORT              - port to bind (default 8000)
+  WAITRESS_THREADS  - request threads (default 8)
+"""
+
+import os
+
+from waitress import serve
+
+from app import app, preload_latest_scans, start_background_workers
+
+if __name__ == '__main__':
+    preload_latest_scans()
+    start_background_workers()
+    serve(app, host='0.0.0.0', port=int(os.environ.get('PORT', '8000')),
+          threads=int(os.environ.get('WAITRESS_THREADS', '8')))
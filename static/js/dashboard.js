@@ -844,19 +844,7 @@ function populateDensityMetrics(data) {
     });
 }
 
-// Export functionality (for future use)
+// Export recommendations as CSV (streamed by the server)
 function exportRecommendations() {
-    fetch('/api/export/recommendations')
-        .then(response => response.json())
-        .then(data => {
-            const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
-            const url = URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = 'cost-optimization-recommendations.json';
-            document.body.appendChild(a);
-            a.click();
-            document.body.removeChild(a);
-            URL.revokeObjectURL(url);
-        });
+    window.location.href = `/api/export/recommendations/${resourceType}?format=csv`;
 }
@@ -0,0 +1,155 @@
+"""
+Trend Store
+Append-only time series of per-type, per-resource-group and per-location counts,
+recorded once per saved scan
+"""
+
+import sqlite3
+from contextlib import closing
+
+DIMENSIONS = ('type', 'resource_group', 'location')
+
+# SQLite expressions that map a scan time onto the start of its bucket
+BUCKETS = {
+    'hourly': "strftime('%Y-%m-%dT%H:00:00', scan_time)",
+    'daily': 'date(scan_time)',
+    'weekly': "date(scan_time, '-6 days', 'weekday 1')"
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trend_points (
+    scan_time TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    subscription_id TEXT,
+    scan_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    orphaned INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_trend_points_series
+    ON trend_points (mode, dimension, type, scan_time);
+CREATE INDEX IF NOT EXISTS idx_trend_points_scan
+    ON trend_points (scan_id);
+"""
+
+
+def get_connection(db_path):
+    """Open a connection to the trend store, creating the schema if needed"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def count_scan(resources):
+    """Count totals and orphans per type, and per resource group and location within each type"""
+    counts = {}
+    for resource_type, resources_list in resources.items():
+        if not isinstance(resources_list, list):
+            continue
+        for resource in resources_list:
+            orphaned = 1 if resource.get('is_orphaned') else 0
+            for dimension, key in (('type', ''),
+                                   ('resource_group', resource.get('resource_group') or 'Unknown'),
+                                   ('location', resource.get('location') or 'Unknown')):
+                point = counts.setdefault((resource_type, dimension, key), [0, 0])
+                point[0] += 1
+                point[1] += orphaned
+    return counts
+
+
+def record_scan(db_path, scan_id, scan_data, mode):
+    """Append the counts of a saved scan; re-recording a scan replaces its points"""
+    scan_time = (scan_data.get('timestamp') or '')[:19]
+    counts = count_scan(scan_data.get('resources', {}))
+
+    with closing(get_connection(db_path)) as conn:
+        with conn:
+            conn.execute('DELETE FROM trend_points WHERE scan_id = ?', (scan_id,))
+            conn.executemany(
+                'INSERT INTO trend_points (scan_time, mode, subscription_id, scan_id, type, dimension, key, total, orphaned) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (scan_time, mode, scan_data.get('subscription_id'), scan_id, resource_type, dimension, key, total, orphaned)
+                    for (resource_type, dimension, key), (total, orphaned) in counts.items()
+                ]
+            )
+    return len(counts)
+
+
+def has_scan(db_path, scan_id):
+    with closing(get_connection(db_path)) as conn:
+        return conn.execute('SELECT 1 FROM trend_points WHERE scan_id = ? LIMIT 1', (scan_id,)).fetchone() is not None
+
+
+def get_type_counts(db_path, scan_id):
+    """Get total and orphaned counts for every resource type of a recorded scan"""
+    with closing(get_connection(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT type, total, orphaned FROM trend_points WHERE scan_id = ? AND dimension = 'type'",
+            (scan_id,)
+        ).fetchall()
+    return {row['type']: {'total': row['total'], 'orphaned': row['orphaned']} for row in rows}
+
+
+def get_trend(db_path, mode, bucket='daily', since=None, resource_type=None, dimension='type', key=None):
+    """
+    Get a downsampled series. Counts are levels, so each bucket reports the last scan in it
+    along with the bucket's peak orphan count. Without a resource type, all types are summed.
+    Returns {key: [points]}; for the 'type' dimension the only key is ''.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f'Invalid bucket: {bucket}')
+    if dimension not in DIMENSIONS:
+        raise ValueError(f'Invalid dimension: {dimension}')
+
+    where = ['mode = ?', 'dimension = ?']
+    params = [mode, dimension]
+    if resource_type:
+        where.append('type = ?')
+        params.append(resource_type)
+    if since:
+        where.append('scan_time >= ?')
+        params.append(since)
+    if key is not None:
+        where.append('key = ?')
+        params.append(key)
+
+    query = f"""
+        WITH per_scan AS (
+            SELECT scan_id, scan_time, key, SUM(total) AS total, SUM(orphaned) AS orphaned
+            FROM trend_points
+            WHERE {' AND '.join(where)}
+            GROUP BY scan_id, key
+        ),
+        bucketed AS (
+            SELECT key, {BUCKETS[bucket]} AS bucket, scan_time, total, orphaned,
+                   ROW_NUMBER() OVER w_latest AS position,
+                   MAX(orphaned) OVER w_bucket AS peak_orphaned,
+                   COUNT(*) OVER w_bucket AS scans
+            FROM per_scan
+            WINDOW w_bucket AS (PARTITION BY key, {BUCKETS[bucket]}),
+                   w_latest AS (PARTITION BY key, {BUCKETS[bucket]} ORDER BY scan_time DESC)
+        )
+        SELECT key, bucket, scan_time, total, orphaned, peak_orphaned, scans
+        FROM bucketed
+        WHERE position = 1
+        ORDER BY key, bucket
+    """
+
+    series = {}
+    with closing(get_connection(db_path)) as conn:
+        for row in conn.execute(query, params):
+            series.setdefault(row['key'], []).append({
+                'bucket': row['bucket'],
+                'scan_time': row['scan_time'],
+                'total': row['total'],
+                'orphaned': row['orphaned'],
+                'peak_orphaned': row['peak_orphaned'],
+                'scans': row['scans']
+            })
+    return series